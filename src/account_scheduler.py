@@ -0,0 +1,148 @@
+# E:\BaiduSyncdisk\数据库\1-城投公司\QYYJTScraper\src\account_scheduler.py
+
+import time
+import threading
+from collections import deque
+from . import config
+
+class AccountScheduler:
+    """
+    账号健康度调度器。
+    为每个账号记录健康分 (0~1)、近期 206 限流次数和冷却截止时间：
+    - 被限流的账号进入冷却，冷却时长随近期限流次数指数增长，冷却结束后自动重新加入；
+    - 连续登录失败的账号同样冷却，超过 ACCOUNT_MAX_LOGIN_FAILURES 次才彻底停用；
+    - acquire() 总是交出当前可用账号中健康分最高的一个，分数相同时优先最久未使用的，
+      因此账号仍会像原来一样轮流工作。
+    线程安全，可供并行模式下的多个工作线程共同使用。
+    """
+    def __init__(self, accounts: list):
+        self._lock = threading.Lock()
+        self._states = {}
+        for order, account in enumerate(accounts):
+            self._states[account['phone']] = {
+                "account": account,
+                "health": 1.0,
+                "rate_limits": deque(),  # 近期 206 的时间戳
+                "cooldown_until": 0.0,
+                "login_failures": 0,
+                "disabled": False,
+                "in_use": False,
+                "last_released": float(order) - len(accounts),  # 初始按配置文件中的顺序轮换
+            }
+
+    def _is_available(self, state: dict, now: float) -> bool:
+        return not state["disabled"] and not state["in_use"] and state["cooldown_until"] <= now
+
+    def _ranked(self, now: float, exclude=()):
+        candidates = [
+            state for phone, state in self._states.items()
+            if phone not in exclude and self._is_available(state, now)
+        ]
+        return sorted(candidates, key=lambda state: (-state["health"], state["last_released"]))
+
+    def acquire(self):
+        """取出当前最健康的可用账号并标记为使用中；没有可用账号时返回 None。"""
+        with self._lock:
+            ranked = self._ranked(time.time())
+            if not ranked:
+                return None
+            state = ranked[0]
+            state["in_use"] = True
+            return state["account"]
+
+    def peek(self, count: int, exclude=()) -> list:
+        """按 acquire 的顺序预览接下来可能被分配的账号（不会标记为使用中），用于后台预登录。"""
+        with self._lock:
+            return [state["account"] for state in self._ranked(time.time(), exclude)[:count]]
+
+    def release(self, phone: str):
+        """归还账号，使其可以再次被分配。"""
+        with self._lock:
+            state = self._states[phone]
+            state["in_use"] = False
+            state["last_released"] = time.time()
+
+    def report_success(self, phone: str, count: int = 1):
+        """报告成功处理了 count 个债券，健康分缓慢恢复。"""
+        with self._lock:
+            state = self._states[phone]
+            state["health"] = min(1.0, state["health"] + config.ACCOUNT_HEALTH_RECOVERY * count)
+
+    def report_login_success(self, phone: str):
+        """登录成功后清零连续登录失败次数。"""
+        with self._lock:
+            self._states[phone]["login_failures"] = 0
+
+    def _start_cooldown(self, state: dict, seconds: float):
+        seconds = min(seconds, config.ACCOUNT_COOLDOWN_MAX)
+        state["cooldown_until"] = max(state["cooldown_until"], time.time() + seconds)
+        return seconds
+
+    def report_rate_limited(self, phone: str) -> float:
+        """
+        报告账号被限流：健康分减半，并按近期限流次数指数延长冷却时间。
+        :return: 本次冷却的秒数
+        """
+        with self._lock:
+            state = self._states[phone]
+            now = time.time()
+            recent = state["rate_limits"]
+            recent.append(now)
+            while recent and recent[0] < now - config.ACCOUNT_RATE_LIMIT_WINDOW:
+                recent.popleft()
+            state["health"] *= 0.5
+            return self._start_cooldown(state, config.ACCOUNT_COOLDOWN_BASE * (2 ** (len(recent) - 1)))
+
+    def report_login_failure(self, phone: str) -> bool:
+        """
+        报告一次登录失败：账号进入冷却；连续失败达到 ACCOUNT_MAX_LOGIN_FAILURES 次后彻底停用。
+        :return: 账号是否已被停用
+        """
+        with self._lock:
+            state = self._states[phone]
+            state["login_failures"] += 1
+            state["health"] *= 0.5
+            if state["login_failures"] >= config.ACCOUNT_MAX_LOGIN_FAILURES:
+                state["disabled"] = True
+            else:
+                self._start_cooldown(state, config.ACCOUNT_COOLDOWN_BASE * state["login_failures"])
+            return state["disabled"]
+
+    def cooldown_remaining(self, phone: str) -> float:
+        """账号剩余的冷却秒数。"""
+        with self._lock:
+            return max(0.0, self._states[phone]["cooldown_until"] - time.time())
+
+    def is_disabled(self, phone: str) -> bool:
+        with self._lock:
+            return self._states[phone]["disabled"]
+
+    def has_usable_accounts(self) -> bool:
+        """是否还有未被停用的账号（冷却中的账号之后还会重新加入）。"""
+        with self._lock:
+            return any(not state["disabled"] for state in self._states.values())
+
+    def next_available_in(self) -> float:
+        """距离最早一个冷却中的账号恢复可用还需等待的秒数。"""
+        with self._lock:
+            now = time.time()
+            waits = [
+                state["cooldown_until"] - now for state in self._states.values()
+                if not state["disabled"] and not state["in_use"]
+            ]
+        return max(0.0, min(waits)) if waits else 0.0
+
+    def summary(self) -> str:
+        """各账号状态的简要描述，用于日志输出。"""
+        with self._lock:
+            now = time.time()
+            parts = []
+            for phone, state in self._states.items():
+                if state["disabled"]:
+                    status = "已停用"
+                elif state["cooldown_until"] > now:
+                    status = f"冷却 {state['cooldown_until'] - now:.0f}s"
+                else:
+                    status = "可用"
+                parts.append(f"{phone}(健康 {state['health']:.2f}, {status})")
+        return "; ".join(parts)
@@ -0,0 +1,76 @@
+# E:\BaiduSyncdisk\数据库\1-城投公司\QYYJTScraper\src\bond_list.py
+
+import csv
+import os
+
+# 读取 Parquet 时每批的行数
+PARQUET_BATCH_SIZE = 65536
+
+def _iter_xlsx(path: str, column: str):
+    """以 openpyxl 只读模式逐行读取，内存占用与行数无关。"""
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None) or ()
+        names = [str(name).strip() if name is not None else '' for name in header]
+        if column not in names:
+            raise KeyError(column)
+        index = names.index(column)
+        for row in rows:
+            if index < len(row):
+                yield row[index]
+    finally:
+        workbook.close()
+
+def _iter_csv(path: str, column: str):
+    # utf-8-sig 兼容 Excel 另存为 CSV 时写入的 BOM
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f)
+        header = [name.strip() for name in next(reader, [])]
+        if column not in header:
+            raise KeyError(column)
+        index = header.index(column)
+        for row in reader:
+            if index < len(row):
+                yield row[index]
+
+def _iter_parquet(path: str, column: str):
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    if column not in parquet_file.schema_arrow.names:
+        raise KeyError(column)
+    # 只读取需要的一列
+    for batch in parquet_file.iter_batches(batch_size=PARQUET_BATCH_SIZE, columns=[column]):
+        yield from batch.column(0).to_pylist()
+
+_READERS = {
+    '.xlsx': _iter_xlsx,
+    '.xlsm': _iter_xlsx,
+    '.csv': _iter_csv,
+    '.parquet': _iter_parquet,
+}
+
+def iter_unique_terms(path: str, column: str):
+    """
+    [新增] 流式读取债券列表文件中的一列，按首次出现的顺序逐个产出去重后的搜索词，不构建 DataFrame。
+    支持 .xlsx（第一个工作表）、.csv 与 .parquet；空值与空白单元格被跳过，首尾空格被去除。
+    :param path: 债券列表文件路径
+    :param column: 列名（第一行表头）
+    :yield: 搜索词字符串
+    :raises ValueError: 文件格式不受支持
+    :raises KeyError: 文件中找不到该列
+    """
+    reader = _READERS.get(os.path.splitext(path)[1].lower())
+    if reader is None:
+        raise ValueError(f"不支持的债券列表格式: {path}（支持 {', '.join(sorted(_READERS))}）")
+    seen = set()
+    for value in reader(path, column):
+        if value is None:
+            continue
+        term = str(value).strip()
+        if term and term not in seen:
+            seen.add(term)
+            yield term
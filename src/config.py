@@ -3,7 +3,7 @@
 # -- 文件路径 --
 
 ACCOUNTS_FILE_PATH = "data/accounts.json"
-BONDS_LIST_PATH = "data/bonds_list.xlsx"
+BONDS_LIST_PATH = "data/bonds_list.xlsx" # [修改] 也可以是 .csv 或 .parquet 文件
 BONDS_LIST_COLUMN_NAME = "债券简称" # [新增] 定义要读取的列名
 
 # -- 爬虫行为设置 --
@@ -11,11 +11,93 @@ REQUESTS_PER_ACCOUNT = 50  # 每个账号连续爬取50次后切换
 DELAY_BETWEEN_PAGES = (1, 3) # 爬取公告时，每页之间的随机延迟秒数范围
 DELAY_BETWEEN_BONDS = (3, 7) # 完成一个债券后，开始下一个之前的随机延迟秒数范围
 
+# --- [新增] 公告分页大小 ---
+NOTICE_PAGE_SIZE = 10  # 每次请求公告列表的条数（网页端使用的默认值）。每页越大，每个债券所需的请求数越少
+NOTICE_PAGE_SIZE_PROBE = True  # 首次运行时自动探测接口可接受的最大分页大小，并缓存在数据库中，之后覆盖 NOTICE_PAGE_SIZE
+NOTICE_PAGE_SIZE_CANDIDATES = (20, 50, 100)  # 探测时依次尝试的分页大小（从小到大）
+
+# --- [新增] 自适应限速 (AIMD 令牌桶) ---
+# 开启后，每个账号的请求节奏由令牌桶控制：响应正常时逐步提速，遇到 206 限流或慢响应时大幅降速，
+# 取代上面两项固定的随机延迟。同一账号的所有工作线程/协程共享同一个限速器。
+ADAPTIVE_RATE_LIMIT = True
+RATE_LIMIT_INITIAL_RATE = 0.5  # 初始速率（次/秒），与原先每页平均 2 秒的延迟相当
+RATE_LIMIT_MIN_RATE = 0.1  # 速率下限（次/秒）
+RATE_LIMIT_MAX_RATE = 3.0  # 速率上限（次/秒）
+RATE_LIMIT_BURST = 2  # 令牌桶容量，即允许的短时突发请求数
+RATE_LIMIT_INCREASE_STEP = 0.02  # 每次正常响应后速率增加的量（次/秒）
+RATE_LIMIT_DECREASE_FACTOR = 0.5  # 被限流或响应过慢时速率乘以的系数
+RATE_LIMIT_SLOW_RESPONSE = 5.0  # 响应时间超过该秒数视为慢响应
+RATE_LIMIT_RETRIES = 2  # 收到 206 后降速重试的次数，仍被限流才将账号视为受限
+
+# --- [新增] 多账号并行 ---
+PARALLEL_ACCOUNTS = False  # 设置为 True 时，每个账号一个工作线程，同时从共享队列领取债券（工作线程使用同步 Scraper）
+PARALLEL_ACCOUNT_REST = 60  # 并行模式下，账号用满 REQUESTS_PER_ACCOUNT 后休息的秒数，之后重新登录继续
+PARALLEL_LOGIN_STAGGER = 3  # 启动各工作线程之间的间隔秒数，错开浏览器登录
+
+# --- [新增] 账号健康度调度 ---
+# 被限流或登录失败的账号不再永久移出任务池，而是冷却一段时间后重新加入；调度器总是优先分配健康分最高的账号。
+ACCOUNT_COOLDOWN_BASE = 600  # 被限流后的基础冷却秒数；窗口期内每多一次限流，冷却时间翻倍
+ACCOUNT_COOLDOWN_MAX = 6 * 3600  # 冷却秒数上限
+ACCOUNT_RATE_LIMIT_WINDOW = 3600  # 统计"近期限流次数"的时间窗口（秒）
+ACCOUNT_HEALTH_RECOVERY = 0.05  # 每成功处理一个债券，健康分回升的量（满分 1.0，每次限流减半）
+ACCOUNT_MAX_LOGIN_FAILURES = 3  # 连续登录失败达到该次数后才彻底停用账号
+
+# --- [新增] 异步引擎 ---
+ASYNC_BONDS_IN_FLIGHT = 1  # 每个账号同时在途的债券数。大于 1 时启用 AsyncScraper 异步引擎，等于 1 则保持逐个同步爬取
+ASYNC_MIN_REQUEST_INTERVAL = 0.5  # 异步引擎下，同一账号任意两次请求之间的最小间隔秒数（并发不会放大请求速率）
+REQUEST_TIMEOUT = 30  # 单次 HTTP 请求的超时秒数
+
+# --- [新增] HTTP 连接池与重试 ---
+HTTP_POOL_SIZE = 4  # 每个账号连接池保留的最大长连接数（异步引擎下应不小于 ASYNC_BONDS_IN_FLIGHT）
+HTTP_MAX_RETRIES = 3  # 连接被重置、超时或服务器返回 5xx 时的最大重试次数
+HTTP_RETRY_BACKOFF = 1.0  # 重试的指数退避基数（秒），重试间隔按 2 的幂次递增
+
+# --- [新增] 增量刷新 ---
+REFRESH_MODE = False  # 设置为 True 时不跳过已爬取的债券，只从最新一页往后翻，遇到已入库的公告即停止（适合每日更新）
+
+# --- [新增] 发行人级去重 ---
+ISSUER_DEDUP = True  # 公告按发行人维度返回：若某债券第一页公告已由同一发行人的其他债券完整抓取，则只记录对应关系，不再重复翻页
+
+# --- [新增] 搜索结果缓存 ---
+NEGATIVE_RESOLUTION_TTL_HOURS = 72  # "搜索无结果"的缓存有效期（小时），过期后会重新搜索；找到的结果长期有效
+
+# --- [新增] 任务状态与失败重试 ---
+JOB_MAX_ATTEMPTS = 5  # 处理失败的债券最多尝试的次数，达到后不再自动重试（把 jobs 表中的 status 改回 pending 即可重新处理）
+JOB_RETRY_BACKOFF = 300  # 第一次失败后等待多少秒再重试，之后每失败一次翻倍
+JOB_RETRY_BACKOFF_MAX = 6 * 3600  # 重试等待时间的上限（秒）
+JOB_RETRY_WAIT_MAX = 900  # 主任务完成后，若最早一次重试在该秒数内到期，则等待并在本次运行中重试；否则留给下次运行
+
 # --- [新增] 开发与测试 ---
 TEST_MODE = False  # 设置为 True 开启测试模式，False 则运行完整任务
 TEST_MODE_BOND_COUNT = 5 # 在测试模式下，只爬取列表中的前 N 个债券
 
 
+# --- [新增] 会话缓存 ---
+SESSION_CACHE_ENABLED = True  # 缓存登录得到的会话，重启或轮换账号时直接复用，直到 Token 过期
+SESSION_CACHE_PATH = "data/session_cache.json"  # 会话缓存文件（包含 Token，权限为仅当前用户可读写）
+
+# --- [新增] 后台预登录 ---
+READY_SESSION_POOL_SIZE = 2  # 当前账号工作时，提前在后台准备会话的后续账号数（0 表示不预登录）
+PRELOGIN_WORKERS = 1  # 同时进行的后台登录数（每个登录会启动一个浏览器）
+
+# --- [新增] 浏览器池 ---
+BROWSER_HEADLESS = True  # 以无头模式运行 Chrome（调试登录流程时可改为 False 观察浏览器）
+BROWSER_POOL_SIZE = 2  # 长期存活的浏览器数量，即可同时进行的登录数
+
+# --- [新增] 运行指标 ---
+METRICS_ENABLED = True  # 记录请求数、各接口耗时分布、206/104 次数、登录耗时、入库行数与写入队列长度等指标
+METRICS_HTTP_PORT = None  # 设为端口号（如 9108）时在本机提供 Prometheus 文本格式的 /metrics 端点；None 表示不开启
+METRICS_HTTP_HOST = "127.0.0.1"  # 指标端点监听的地址
+METRICS_JSON_PATH = "output/metrics.json"  # 定期把指标写入该 JSON 文件；None 表示不写
+METRICS_FLUSH_INTERVAL = 30  # 写入 JSON 文件的间隔秒数（运行结束时还会再写一次）
+
+# --- [新增] 性能追踪 ---
+TRACE_ENABLED = False  # 记录登录、搜索、翻页、JSON 解析、限速等待、刻意暂停与数据库写入等阶段的耗时
+TRACE_OUTPUT_PATH = "output/trace.json"  # Chrome trace 格式，可在 chrome://tracing 或 https://ui.perfetto.dev 打开
+PROFILE_ENABLED = False  # 运行期间定期采样所有线程的调用栈，结束时写出折叠栈文件（用于生成火焰图）
+PROFILE_INTERVAL = 0.01  # 采样间隔（秒）
+PROFILE_OUTPUT_PATH = "output/profile.folded"
+
 # -- 网站URL --
 LOGIN_URL = "https://www.qyyjt.cn/user/login"
 SEARCH_API_URL = "https://www.qyyjt.cn/finchinaAPP/v1/finchina-search/v1/multipleSearch"
@@ -33,3 +115,5 @@ LOGIN_XPATHS = {
 
 # -- 数据库 --
 DATABASE_NAME = "qyyjt_data.db"
+DB_WRITER_QUEUE_SIZE = 100  # [新增] 后台写入队列的容量（一项为一个债券或一页公告），队列满时爬取线程会等待
+DB_WRITER_BATCH_SIZE = 20  # [新增] 写入线程单个事务最多合并的写入项数
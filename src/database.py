@@ -1,47 +1,633 @@
 import sqlite3
+import collections
+import contextlib
 import datetime
-from . import config
+import re
+import threading
+import queue
+import time
+from . import config, metrics # [新增] 运行指标
+from . import tracing # [新增] 性能追踪
+
+# [新增] 多个线程直接调用 save_announcements 时，用进程内的锁串行化写入，避免 "database is locked"
+_write_lock = threading.Lock()
+
+def _connect(db_path: str = None):
+    """[新增] 打开数据库连接并应用 WAL 等写入优化设置。"""
+    conn = sqlite3.connect(db_path or config.DATABASE_NAME, timeout=30)
+    # WAL 模式下读写互不阻塞，且每次提交只追加日志，不必重写整个数据页
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA cache_size=-65536')  # 约 64MB 页缓存
+    return conn
+
+# [新增] 每个线程复用一个只读查询用的连接（按数据库路径区分），PRAGMA 只在建立连接时执行一次
+_local = threading.local()
+
+@contextlib.contextmanager
+def _reader():
+    """[新增] 取得当前线程的查询连接。连接长期保留、不在此关闭；查询不开启事务，WAL 模式下总能读到最新提交的数据。"""
+    path = config.DATABASE_NAME
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(path)
+    if conn is None:
+        conn = connections[path] = _connect(path)
+    yield conn
+
+@contextlib.contextmanager
+def _transaction(db_path: str = None):
+    """[新增] 为不经过后台写入线程的少量写入打开一个连接：成功时提交、出错时回滚，结束后关闭连接。"""
+    conn = _connect(db_path)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+# [新增] SQLite 默认最多允许 999 个绑定参数（SQLITE_MAX_VARIABLE_NUMBER），IN 列表按此大小分批查询
+_IN_CHUNK_SIZE = 500
+
+def _query_in(conn, sql: str, values: list) -> list:
+    """
+    [新增] 把 values 分批代入 sql 中的 IN ({placeholders}) 执行查询，合并返回所有批次的结果行。
+    :param sql: 含 {placeholders} 占位的查询语句，其中不能有其他绑定参数
+    """
+    rows = []
+    for start in range(0, len(values), _IN_CHUNK_SIZE):
+        chunk = values[start:start + _IN_CHUNK_SIZE]
+        rows.extend(conn.execute(sql.format(placeholders=','.join('?' * len(chunk))), chunk).fetchall())
+    return rows
+
+# [新增] jobs 表中每个搜索词的处理状态
+JOB_PENDING = "pending"      # 尚未处理
+JOB_DONE = "done"            # 公告已全部入库（或已复用同一发行人的公告）
+JOB_NOT_FOUND = "not_found"  # 搜索无结果
+JOB_EMPTY = "empty"          # 找到债券，但没有任何公告
+JOB_FAILED = "failed"        # 处理失败，按 next_retry_at 退避重试
+
+# [新增] 数据库结构版本，记录在 PRAGMA user_version 中。
+# 0: 单表 announcements（每个文件一行，重复存放债券信息）；1: 规范化为 bonds / notices / files 三张表；
+# 2: 增加公告标题的 FTS5 全文索引；3: files 的 id 改为 AUTOINCREMENT，并记录每个文件的入库时间；
+# 4: files 记录抓取该文件时使用的搜索词
+SCHEMA_VERSION = 4
+
+# [新增] 规范化后的公告存储：债券只存一次，公告（标题 + 日期）挂在债券下，文件挂在公告下。
+# publish_date 为 ISO 格式的日期时间，未知时为空串；file_size 为字节数。
+# files.id 为 AUTOINCREMENT（删除后也不会被复用），files.scraped_at 为该文件的入库时间，二者都可作为增量导出的水位；
+# notices.scraped_at 只是公告第一次入库的时间，之后补充到同一公告下的文件不会改变它。
+# files.search_term 是抓取该文件时使用的搜索词；同一债券可能有多个搜索词，视图中的 search_term 优先取这一列，
+# 版本 4 之前已规范化的记录没有保存该信息（为 NULL），视图退回该债券按字典序最小的搜索词。
+# 搜索结果没有债券代码时 bonds.bond_code 存为空串（UNIQUE 约束不能用于 NULL），视图中还原为 NULL。
+# 原来的 announcements 表保留为同名视图，列与旧表一致，供 tools/ 下的脚本和临时查询继续使用。
+_SCHEMA_SQL = '''
+    CREATE TABLE IF NOT EXISTS bonds (
+        id INTEGER PRIMARY KEY,
+        bond_code TEXT NOT NULL UNIQUE,
+        bond_name TEXT
+    );
+    CREATE TABLE IF NOT EXISTS search_terms (
+        search_term TEXT PRIMARY KEY,
+        bond_id INTEGER NOT NULL REFERENCES bonds(id)
+    );
+    CREATE INDEX IF NOT EXISTS idx_search_terms_bond_id ON search_terms (bond_id);
+    CREATE TABLE IF NOT EXISTS notices (
+        id INTEGER PRIMARY KEY,
+        bond_id INTEGER NOT NULL REFERENCES bonds(id),
+        title TEXT NOT NULL,
+        publish_date TEXT NOT NULL DEFAULT '',
+        scraped_at TIMESTAMP NOT NULL,
+        UNIQUE (bond_id, publish_date, title)
+    );
+    CREATE INDEX IF NOT EXISTS idx_notices_publish_date ON notices (publish_date);
+    CREATE INDEX IF NOT EXISTS idx_notices_scraped_at ON notices (scraped_at);
+    CREATE TABLE IF NOT EXISTS files (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        notice_id INTEGER NOT NULL REFERENCES notices(id),
+        file_url TEXT NOT NULL UNIQUE,
+        file_size INTEGER,
+        scraped_at TIMESTAMP NOT NULL,
+        search_term TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_files_notice_id ON files (notice_id);
+    CREATE INDEX IF NOT EXISTS idx_files_scraped_at ON files (scraped_at);
+    CREATE VIEW IF NOT EXISTS announcements AS
+        SELECT f.id AS id,
+               COALESCE(f.search_term,
+                        (SELECT MIN(st.search_term) FROM search_terms st WHERE st.bond_id = b.id)) AS search_term,
+               b.bond_name AS bond_name,
+               NULLIF(b.bond_code, '') AS bond_code,
+               n.title AS announcement_title,
+               f.file_url AS file_url,
+               f.file_size AS file_size,
+               NULLIF(n.publish_date, '') AS publish_date,
+               f.scraped_at AS scraped_at
+        FROM files f
+        JOIN notices n ON n.id = f.notice_id
+        JOIN bonds b ON b.id = n.bond_id;
+'''
+
+# [新增] 从版本 0 原地迁移：把旧表改名，按债券 / 公告 / 文件拆分写入新表后删除旧表。
+# 日期与文件大小的转换由注册到连接上的 Python 函数完成，整个迁移在一个事务中进行。
+_MIGRATE_V0_SQL = '''
+    BEGIN;
+    ALTER TABLE announcements RENAME TO announcements_v0;
+''' + _SCHEMA_SQL + '''
+    INSERT OR IGNORE INTO bonds (bond_code, bond_name)
+        SELECT COALESCE(bond_code, ''), MAX(bond_name) FROM announcements_v0 GROUP BY COALESCE(bond_code, '');
+    INSERT OR IGNORE INTO search_terms (search_term, bond_id)
+        SELECT a.search_term, b.id FROM announcements_v0 a JOIN bonds b ON b.bond_code = COALESCE(a.bond_code, '');
+    INSERT OR IGNORE INTO notices (bond_id, title, publish_date, scraped_at)
+        SELECT b.id, a.announcement_title, COALESCE(normalize_date(a.publish_date), ''), MIN(a.scraped_at)
+        FROM announcements_v0 a JOIN bonds b ON b.bond_code = COALESCE(a.bond_code, '')
+        GROUP BY b.id, a.announcement_title, COALESCE(normalize_date(a.publish_date), '');
+    INSERT OR IGNORE INTO files (id, notice_id, file_url, file_size, scraped_at, search_term)
+        SELECT a.id, n.id, a.file_url, parse_file_size(a.file_size), COALESCE(a.scraped_at, n.scraped_at), a.search_term
+        FROM announcements_v0 a
+        JOIN bonds b ON b.bond_code = COALESCE(a.bond_code, '')
+        JOIN notices n ON n.bond_id = b.id AND n.publish_date = COALESCE(normalize_date(a.publish_date), '')
+                      AND n.title = a.announcement_title
+        ORDER BY a.id;
+    DROP TABLE announcements_v0;
+    COMMIT;
+'''
+
+# [新增] 从版本 1、2 迁移：SQLite 不能给已有的表加上 AUTOINCREMENT，因此重建 files 表并保留原有 id，
+# 已有文件的入库时间取其所属公告的 scraped_at。视图依赖 files，先删除，随 _SCHEMA_SQL 重新创建
+_MIGRATE_V2_SQL = '''
+    BEGIN;
+    DROP VIEW IF EXISTS announcements;
+    ALTER TABLE files RENAME TO files_v2;
+    DROP INDEX IF EXISTS idx_files_notice_id;
+''' + _SCHEMA_SQL + '''
+    INSERT INTO files (id, notice_id, file_url, file_size, scraped_at)
+        SELECT f.id, f.notice_id, f.file_url, f.file_size, n.scraped_at
+        FROM files_v2 f JOIN notices n ON n.id = f.notice_id
+        ORDER BY f.id;
+    DROP TABLE files_v2;
+    COMMIT;
+'''
+
+# [新增] 从版本 3 迁移：给 files 增加 search_term 列并重建依赖它的视图。已有记录的原始搜索词无法恢复，保持为 NULL
+_MIGRATE_V3_SQL = '''
+    BEGIN;
+    DROP VIEW IF EXISTS announcements;
+    ALTER TABLE files ADD COLUMN search_term TEXT;
+''' + _SCHEMA_SQL + '''
+    COMMIT;
+'''
+
+# [新增] 公告标题的全文索引（外部内容表，不重复存放标题），由触发器与 notices 保持同步。
+# trigram 分词器按连续三个字符建索引，适合没有空格分词的中文标题（需要 SQLite 3.34 及以上）
+_TITLE_INDEX_SQL = '''
+    BEGIN;
+    CREATE VIRTUAL TABLE IF NOT EXISTS notices_fts USING fts5(
+        title, content='notices', content_rowid='id', tokenize='trigram'
+    );
+    CREATE TRIGGER IF NOT EXISTS notices_fts_insert AFTER INSERT ON notices BEGIN
+        INSERT INTO notices_fts (rowid, title) VALUES (new.id, new.title);
+    END;
+    CREATE TRIGGER IF NOT EXISTS notices_fts_delete AFTER DELETE ON notices BEGIN
+        INSERT INTO notices_fts (notices_fts, rowid, title) VALUES ('delete', old.id, old.title);
+    END;
+    CREATE TRIGGER IF NOT EXISTS notices_fts_update AFTER UPDATE OF title ON notices BEGIN
+        INSERT INTO notices_fts (notices_fts, rowid, title) VALUES ('delete', old.id, old.title);
+        INSERT INTO notices_fts (rowid, title) VALUES (new.id, new.title);
+    END;
+    INSERT INTO notices_fts (notices_fts) VALUES ('rebuild');
+    COMMIT;
+'''
+
+_DATE_PATTERN = re.compile(r'^(\d{4})[-/.]?(\d{1,2})[-/.]?(\d{1,2})(?:[ T]?(\d{2}):?(\d{2}):?(\d{2}))?')
+_SIZE_PATTERN = re.compile(r'^\s*([\d.]+)\s*([kmgt]?)', re.IGNORECASE)
+_SIZE_UNITS = {'': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3, 't': 1024 ** 4}
+
+def normalize_date(value):
+    """
+    [新增] 把接口返回的日期统一为 ISO 格式：YYYY-MM-DD，带时间时为 YYYY-MM-DD HH:MM:SS。
+    支持 20231026110255 / 2023-10-26 11:02:55 / 2023/10/26 / 20231026 以及秒或毫秒时间戳；无法识别时原样返回。
+    """
+    if value is None or value == '':
+        return None
+    text = str(value).strip()
+    if text.isdigit() and len(text) in (10, 13):
+        seconds = int(text) / 1000 if len(text) == 13 else int(text)
+        return datetime.datetime.fromtimestamp(seconds).isoformat(sep=' ')
+    match = _DATE_PATTERN.match(text)
+    if match:
+        parts = [int(part) for part in match.groups() if part is not None]
+        try:
+            if len(parts) == 3:
+                return datetime.date(*parts).isoformat()
+            return datetime.datetime(*parts).isoformat(sep=' ')
+        except ValueError:
+            pass
+    return text
+
+def parse_file_size(value):
+    """[新增] 把 "1.5MB"、"320KB"、"2048" 之类的文件大小转换为字节数，无法识别时返回 None。"""
+    if value is None or value == '':
+        return None
+    match = _SIZE_PATTERN.match(str(value))
+    if not match:
+        return None
+    try:
+        number = float(match.group(1))
+    except ValueError:
+        return None
+    return int(number * _SIZE_UNITS[match.group(2).lower()])
+
+def _migrate(conn):
+    """[新增] 按 PRAGMA user_version 把数据库结构升级到 SCHEMA_VERSION。"""
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return
+    if version < 1:
+        legacy = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'announcements'"
+        ).fetchone()
+        if legacy:
+            count = conn.execute('SELECT COUNT(*) FROM announcements').fetchone()[0]
+            print(f"检测到旧版数据库结构，正在迁移 {count} 条公告记录（只需进行一次）...")
+            conn.create_function('normalize_date', 1, normalize_date, deterministic=True)
+            conn.create_function('parse_file_size', 1, parse_file_size, deterministic=True)
+            conn.executescript(_MIGRATE_V0_SQL)
+            print("数据库结构迁移完成。")
+        else:
+            conn.executescript(_SCHEMA_SQL)
+
+    if version < 2:
+        try:
+            conn.executescript(_TITLE_INDEX_SQL)
+            print("已建立公告标题的全文索引。")
+        except sqlite3.OperationalError as e:
+            # 当前 SQLite 不支持 FTS5 或 trigram 分词器时不建索引，tools/query_db.py 会退回 LIKE 查询
+            conn.rollback()
+            print(f"当前 SQLite 不支持全文索引 (FTS5 trigram)，将跳过: {e}")
+
+    if 1 <= version < 3:
+        conn.executescript(_MIGRATE_V2_SQL)
+        print("已为文件记录启用自增 id 与入库时间。")
+    elif version == 3:
+        # 从版本 1、2 重建的 files 表已包含 search_term 列
+        conn.executescript(_MIGRATE_V3_SQL)
+    conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
 
 def init_db():
     """初始化数据库，创建表（如果表不存在）。"""
-    with sqlite3.connect(config.DATABASE_NAME) as conn:
+    with _transaction() as conn:
+        # [修改] 公告存储已规范化，旧版数据库会在此原地迁移
+        _migrate(conn)
         cursor = conn.cursor()
+        # [新增] 每个债券的翻页进度，用于中断后从最后一个成功的页继续
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS announcements (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
+            CREATE TABLE IF NOT EXISTS page_cursors (
+                bond_code TEXT PRIMARY KEY,
                 search_term TEXT NOT NULL,
+                next_skip INTEGER NOT NULL,
+                completed INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP NOT NULL
+            )
+        ''')
+        # [新增] 债券与发行人的对应关系。同一发行人的多只债券共享同一份公司公告列表，
+        # 只由第一只债券（issuer_code）实际抓取，其余债券在此记录对应关系即可
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS bond_issuers (
+                search_term TEXT PRIMARY KEY,
+                bond_code TEXT,
                 bond_name TEXT,
+                issuer_code TEXT NOT NULL,
+                recorded_at TIMESTAMP NOT NULL
+            )
+        ''')
+        # [新增] 搜索词 -> 债券代码的解析结果缓存，重跑或刷新时可以跳过搜索请求
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS bond_resolutions (
+                search_term TEXT PRIMARY KEY,
                 bond_code TEXT,
-                announcement_title TEXT NOT NULL,
-                file_url TEXT NOT NULL UNIQUE,
-                file_size TEXT,
-                publish_date TEXT,
-                scraped_at TIMESTAMP NOT NULL
+                bond_name TEXT,
+                found INTEGER NOT NULL,
+                resolved_at TIMESTAMP NOT NULL
+            )
+        ''')
+        # [新增] 每个搜索词的处理状态。续跑时按状态查询待处理的债券，不再与公告表做差集；
+        # 搜索无结果、没有公告或出错的债券也有记录，不会在每次运行时重复搜索与翻页
+        jobs_exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'jobs'"
+        ).fetchone()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                search_term TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                next_retry_at TIMESTAMP,
+                updated_at TIMESTAMP NOT NULL
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, next_retry_at)')
+        if not jobs_exists:
+            _backfill_jobs(conn)
+        # [新增] 运行过程中探测得到、需要跨次运行保留的参数（如公告接口可接受的最大分页大小）
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS settings (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                updated_at TIMESTAMP NOT NULL
             )
         ''')
         print("数据库初始化完成。")
 
-def get_scraped_bonds() -> set:
+def _backfill_jobs(conn):
     """
-    从数据库中获取所有已经爬取过的债券简称 (search_term)。
-    :return: 一个包含所有已爬取债券简称的集合 (set)，用于快速查找。
+    [新增] 首次创建 jobs 表时，把已有数据库中完整爬取过的债券记为 done，
+    判断规则与原来的续跑逻辑相同：有公告且翻页已完成，或复用了同一发行人的公告。
     """
-    scraped_bonds = set()
-    try:
-        with sqlite3.connect(config.DATABASE_NAME) as conn:
-            cursor = conn.cursor()
-            # 查询所有不重复的 search_term
-            cursor.execute('SELECT DISTINCT search_term FROM announcements')
-            results = cursor.fetchall()
-            # 将结果 (元组) 转换为集合中的字符串
-            scraped_bonds = {row[0] for row in results}
-            if scraped_bonds:
-                print(f"数据库中已存在 {len(scraped_bonds)} 个债券的数据。")
-    except sqlite3.OperationalError:
-        # 如果表还不存在，会报错，这时返回空集合即可
-        print("数据库或表不存在，将从头开始爬取。")
-    return scraped_bonds
+    now = datetime.datetime.now().isoformat(sep=' ')
+    conn.execute('''
+        INSERT OR IGNORE INTO jobs (search_term, status, attempts, updated_at)
+        SELECT search_term, ?, 1, ? FROM (
+            SELECT st.search_term FROM search_terms st
+            WHERE EXISTS (SELECT 1 FROM notices n WHERE n.bond_id = st.bond_id)
+              AND st.search_term NOT IN (SELECT search_term FROM page_cursors WHERE completed = 0)
+            UNION
+            SELECT search_term FROM bond_issuers
+        )
+    ''', (JOB_DONE, now))
+    count = conn.execute('SELECT COUNT(*) FROM jobs').fetchone()[0]
+    if count:
+        print(f"已根据现有数据把 {count} 个债券记为已完成。")
+
+def sync_jobs(search_terms: list):
+    """[新增] 把债券列表中尚无记录的搜索词登记为 pending，已有的记录保持不变。"""
+    now = datetime.datetime.now().isoformat(sep=' ')
+    with _write_lock, _transaction() as conn:
+        conn.executemany(
+            'INSERT OR IGNORE INTO jobs (search_term, status, updated_at) VALUES (?, ?, ?)',
+            [(term, JOB_PENDING, now) for term in search_terms]
+        )
+
+def get_runnable_jobs(retry_only: bool = False) -> set:
+    """
+    [新增] 查询当前需要处理的搜索词（经 status 索引查询）：
+    pending；已到重试时间且尝试次数未达 JOB_MAX_ATTEMPTS 的 failed；
+    搜索无结果已超过 NEGATIVE_RESOLUTION_TTL_HOURS 的 not_found（与搜索结果缓存的有效期一致）。
+    :param retry_only: 为 True 时只返回到期的 failed
+    :return: 搜索词集合
+    """
+    now = datetime.datetime.now()
+    not_found_before = now - datetime.timedelta(hours=config.NEGATIVE_RESOLUTION_TTL_HOURS)
+    sql = 'SELECT search_term FROM jobs WHERE status = ? AND attempts < ? AND next_retry_at <= ?'
+    params = [JOB_FAILED, config.JOB_MAX_ATTEMPTS, now.isoformat(sep=' ')]
+    if not retry_only:
+        sql += ' UNION ALL SELECT search_term FROM jobs WHERE status = ?'
+        sql += ' UNION ALL SELECT search_term FROM jobs WHERE status = ? AND updated_at <= ?'
+        params += [JOB_PENDING, JOB_NOT_FOUND, not_found_before.isoformat(sep=' ')]
+    with _reader() as conn:
+        return {row[0] for row in conn.execute(sql, params)}
+
+def next_job_retry_in(search_terms) -> float:
+    """
+    [新增] 给定搜索词中，最早一个可重试的 failed 还需等待的秒数。
+    :return: 秒数（已到期时为 0）；没有可重试的任务时返回 None。
+    """
+    wanted = set(search_terms)
+    with _reader() as conn:
+        # 失败的任务通常很少，直接取出后在内存中筛选
+        rows = conn.execute(
+            'SELECT search_term, next_retry_at FROM jobs WHERE status = ? AND attempts < ?',
+            (JOB_FAILED, config.JOB_MAX_ATTEMPTS)
+        ).fetchall()
+    retry_times = [retry_at for term, retry_at in rows if term in wanted and retry_at]
+    if not retry_times:
+        return None
+    wait = datetime.datetime.fromisoformat(min(retry_times)) - datetime.datetime.now()
+    return max(wait.total_seconds(), 0.0)
+
+def get_job_counts() -> dict:
+    """[新增] 各状态的搜索词数量，如 {"done": 120, "failed": 3}。"""
+    with _reader() as conn:
+        return dict(conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+
+def get_bond_resolution(search_term: str, negative_ttl_seconds: float):
+    """
+    [新增] 查询搜索词的缓存解析结果。找到的结果长期有效；"搜索无结果"只在 negative_ttl_seconds 内有效。
+    :return: {"found", "code", "name"}；没有有效缓存时返回 None。
+    """
+    with _reader() as conn:
+        row = conn.execute(
+            'SELECT bond_code, bond_name, found, resolved_at FROM bond_resolutions WHERE search_term = ?', (search_term,)
+        ).fetchone()
+    if row is None:
+        return None
+    bond_code, bond_name, found, resolved_at = row
+    if not found:
+        age = datetime.datetime.now() - datetime.datetime.fromisoformat(resolved_at)
+        if age.total_seconds() > negative_ttl_seconds:
+            return None
+    return {"found": bool(found), "code": bond_code, "name": bond_name}
+
+def get_setting(key: str):
+    """[新增] 读取 settings 表中保存的参数值，不存在时返回 None。"""
+    with _reader() as conn:
+        row = conn.execute('SELECT value FROM settings WHERE key = ?', (key,)).fetchone()
+    return row[0] if row else None
 
+def save_setting(key: str, value):
+    """[新增] 保存（或覆盖）一个参数值。写入量极小，直接写库，不经过后台写入线程。"""
+    with _write_lock, _transaction() as conn:
+        conn.execute(
+            'INSERT OR REPLACE INTO settings (key, value, updated_at) VALUES (?, ?, ?)',
+            (key, str(value), datetime.datetime.now().isoformat(sep=' '))
+        )
+
+def get_page_cursor(bond_code: str) -> int:
+    """
+    [新增] 查询债券未完成的翻页进度。
+    :return: 上次中断时下一页的 skip；没有记录或上次已完整获取时返回 0。
+    """
+    with _reader() as conn:
+        row = conn.execute(
+            'SELECT next_skip FROM page_cursors WHERE bond_code = ? AND completed = 0', (bond_code,)
+        ).fetchone()
+    return row[0] if row else 0
+
+
+def get_latest_publish_date(bond_code: str):
+    """[新增] 查询某债券已入库公告中最新的发布日期（ISO 格式），没有记录时返回 None。"""
+    with _reader() as conn:
+        row = conn.execute('''
+            SELECT NULLIF(MAX(n.publish_date), '') FROM notices n JOIN bonds b ON b.id = n.bond_id
+            WHERE b.bond_code = ?
+        ''', (bond_code,)).fetchone()
+    return row[0]
+
+def find_known_file_urls(file_urls: list) -> set:
+    """[新增] 返回给定文件链接中已经存在于数据库的那些（利用 file_url 上的唯一索引）。"""
+    if not file_urls:
+        return set()
+    with _reader() as conn:
+        rows = _query_in(conn, 'SELECT file_url FROM files WHERE file_url IN ({placeholders})', list(file_urls))
+    return {row[0] for row in rows}
+
+def find_issuer_code(bond_code: str, file_urls: list, pending_owners: dict = None,
+                     pending_pages: set = frozenset(), pending_completed: set = frozenset()):
+    """
+    [新增] 判断一页公告是否已由同一发行人的另一只债券完整抓取过。
+    条件：这些文件链接全部已在库中，且都属于同一只其他债券，而该债券的翻页已经完成。
+    [修改] 后台写入队列中尚未落盘的数据由调用方以 pending_* 参数传入，无需先等待队列写完。
+    :param bond_code: 当前债券的 code
+    :param file_urls: 当前债券第一页公告中的全部文件链接
+    :param pending_owners: 尚未落盘的文件链接 -> 所属债券 code
+    :param pending_pages: 还有公告页尚未落盘的债券 code
+    :param pending_completed: 已标记翻页完成、但标记尚未落盘的债券 code
+    :return: 已抓取过该发行人公告的债券 code；不满足条件时返回 None。
+    """
+    unique_urls = list(set(file_urls))
+    if not unique_urls:
+        return None
+    pending_owners = pending_owners or {}
+    with _reader() as conn:
+        owners = dict(_query_in(conn, '''
+            SELECT f.file_url, b.bond_code FROM files f
+            JOIN notices n ON n.id = f.notice_id JOIN bonds b ON b.id = n.bond_id
+            WHERE f.file_url IN ({placeholders})
+        ''', unique_urls))
+        # 已落盘的归属优先：同一链接后提交的债券写入时会被忽略
+        codes = {owners.get(url) or pending_owners.get(url) for url in unique_urls}
+        if len(codes) != 1:
+            return None
+        owner_code = codes.pop()
+        if owner_code is None or owner_code == bond_code:
+            return None
+        if owner_code in pending_completed:
+            return owner_code
+        if owner_code in pending_pages:
+            return None
+        unfinished = conn.execute(
+            'SELECT 1 FROM page_cursors WHERE bond_code = ? AND completed = 0', (owner_code,)
+        ).fetchone()
+    return None if unfinished else owner_code
+
+def _ensure_bond(conn, search_term: str, bond_code: str, bond_name: str) -> int:
+    """[新增] 取得债券在 bonds 表中的 id（不存在则创建），并记录搜索词与债券的对应关系。"""
+    conn.execute('''
+        INSERT INTO bonds (bond_code, bond_name) VALUES (?, ?)
+        ON CONFLICT(bond_code) DO UPDATE SET bond_name = COALESCE(excluded.bond_name, bond_name)
+    ''', (bond_code or '', bond_name))
+    bond_id = conn.execute('SELECT id FROM bonds WHERE bond_code = ?', (bond_code or '',)).fetchone()[0]
+    conn.execute('INSERT OR IGNORE INTO search_terms (search_term, bond_id) VALUES (?, ?)', (search_term, bond_id))
+    return bond_id
+
+def _insert_announcements(conn, search_term: str, bond_code: str, bond_name: str, announcements_data: list):
+    """
+    [新增] 批量写入一个债券的公告（不提交事务）。
+    [修改] 写入规范化的 notices / files 表：只有含新文件的公告才会建立公告记录，文件用 executemany 批量插入。
+    :return: (新插入的文件数, 因 file_url 已存在而被忽略的文件数)
+    """
+    file_urls = [f.get('fileUrl') for item in announcements_data for f in item.get('file') or [] if f.get('fileUrl')]
+    if not file_urls:
+        return 0, 0
+    known_urls = {row[0] for row in _query_in(conn, 'SELECT file_url FROM files WHERE file_url IN ({placeholders})', file_urls)}
+
+    bond_id = _ensure_bond(conn, search_term, bond_code, bond_name)
+    scraped_at = datetime.datetime.now().isoformat(sep=' ')
+    file_rows = []
+    for item in announcements_data:
+        new_files = [f for f in item.get('file') or [] if f.get('fileUrl') and f['fileUrl'] not in known_urls]
+        if not new_files:
+            continue
+        notice_key = (bond_id, normalize_date(item.get('date')) or '', item.get('title') or '')
+        conn.execute(
+            'INSERT OR IGNORE INTO notices (bond_id, publish_date, title, scraped_at) VALUES (?, ?, ?, ?)',
+            notice_key + (scraped_at,)
+        )
+        notice_id = conn.execute(
+            'SELECT id FROM notices WHERE bond_id = ? AND publish_date = ? AND title = ?', notice_key
+        ).fetchone()[0]
+        file_rows.extend(
+            (notice_id, f['fileUrl'], parse_file_size(f.get('fileSize')), scraped_at, search_term) for f in new_files
+        )
+
+    changes_before = conn.total_changes
+    conn.executemany(
+        'INSERT OR IGNORE INTO files (notice_id, file_url, file_size, scraped_at, search_term) VALUES (?, ?, ?, ?, ?)',
+        file_rows
+    )
+    inserted = conn.total_changes - changes_before
+    return inserted, len(file_urls) - inserted
+
+def _save_page(conn, search_term: str, bond_code: str, bond_name: str, announcements_data: list, next_skip: int):
+    """[新增] 写入一页公告，并在同一事务中把该债券的翻页进度推进到 next_skip。"""
+    result = _insert_announcements(conn, search_term, bond_code, bond_name, announcements_data)
+    conn.execute('''
+        INSERT INTO page_cursors (bond_code, search_term, next_skip, completed, updated_at)
+        VALUES (?, ?, ?, 0, ?)
+        ON CONFLICT(bond_code) DO UPDATE SET
+            search_term = excluded.search_term, next_skip = excluded.next_skip,
+            completed = 0, updated_at = excluded.updated_at
+    ''', (bond_code, search_term, next_skip, datetime.datetime.now().isoformat(sep=' ')))
+    return result
+
+def _complete_cursor(conn, search_term: str, bond_code: str):
+    """[新增] 标记债券的全部页面均已获取。"""
+    conn.execute('''
+        INSERT INTO page_cursors (bond_code, search_term, next_skip, completed, updated_at)
+        VALUES (?, ?, 0, 1, ?)
+        ON CONFLICT(bond_code) DO UPDATE SET completed = 1, updated_at = excluded.updated_at
+    ''', (bond_code, search_term, datetime.datetime.now().isoformat(sep=' ')))
+    return 0, 0
+
+def _record_issuer(conn, search_term: str, bond_code: str, bond_name: str, issuer_code: str):
+    """[新增] 记录债券（及其搜索词）所属发行人的公告由哪只债券抓取。"""
+    conn.execute('''
+        INSERT OR REPLACE INTO bond_issuers (search_term, bond_code, bond_name, issuer_code, recorded_at)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (search_term, bond_code, bond_name, issuer_code, datetime.datetime.now().isoformat(sep=' ')))
+    return 0, 0
+
+def _record_resolution(conn, search_term: str, bond_details):
+    """[新增] 记录搜索词的解析结果；bond_details 为 None 表示搜索无结果。"""
+    bond_details = bond_details or {}
+    conn.execute('''
+        INSERT OR REPLACE INTO bond_resolutions (search_term, bond_code, bond_name, found, resolved_at)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (search_term, bond_details.get("code"), bond_details.get("name"), 1 if bond_details else 0,
+          datetime.datetime.now().isoformat(sep=' ')))
+    return 0, 0
+
+def _record_job(conn, search_term: str, status: str, error: str = None):
+    """
+    [新增] 记录一次处理结果，尝试次数加一。失败时按 JOB_RETRY_BACKOFF 指数退避
+    （上限 JOB_RETRY_BACKOFF_MAX）计算下次重试时间；其他状态清空错误信息与重试时间。
+    """
+    row = conn.execute('SELECT attempts FROM jobs WHERE search_term = ?', (search_term,)).fetchone()
+    attempts = (row[0] if row else 0) + 1
+    now = datetime.datetime.now()
+    next_retry_at = None
+    if status == JOB_FAILED:
+        delay = min(config.JOB_RETRY_BACKOFF * (2 ** (attempts - 1)), config.JOB_RETRY_BACKOFF_MAX)
+        next_retry_at = (now + datetime.timedelta(seconds=delay)).isoformat(sep=' ')
+    else:
+        error = None
+    conn.execute('''
+        INSERT OR REPLACE INTO jobs (search_term, status, attempts, last_error, next_retry_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (search_term, status, attempts, error, next_retry_at, now.isoformat(sep=' ')))
+    return 0, 0
+
+def _record_rows(inserted: int, duplicates: int):
+    """[新增] 累计入库指标。"""
+    metrics.DB_ROWS.inc(inserted, result='inserted')
+    metrics.DB_ROWS.inc(duplicates, result='duplicate')
+
+def _report_saved(inserted: int, duplicates: int):
+    if inserted > 0:
+        print(f"成功保存 {inserted} 条新的公告信息到数据库（{duplicates} 条已存在）。")
+    else:
+        print("没有新的公告信息被保存（可能所有公告都已存在）。")
 
 def save_announcements(search_term: str, bond_code: str, bond_name: str, announcements_data: list):
     """
@@ -50,39 +636,239 @@ def save_announcements(search_term: str, bond_code: str, bond_name: str, announc
     :param bond_code: 债券的唯一代码
     :param bond_name: 债券名称
     :param announcements_data: 从API获取的公告数据列表
+    :return: [新增] (新插入的行数, 已存在而被忽略的行数)
     """
-    saved_count = 0
-    with sqlite3.connect(config.DATABASE_NAME) as conn:
-        cursor = conn.cursor()
-        for item in announcements_data:
-            title = item.get('title')
-            publish_date = item.get('date')
-            files = item.get('file', [])
-            
-            if not files:
+    with tracing.span('db.save', bond=bond_code, rows=len(announcements_data)), _write_lock, _transaction() as conn:
+        inserted, duplicates = _insert_announcements(conn, search_term, bond_code, bond_name, announcements_data)
+    _record_rows(inserted, duplicates)
+    _report_saved(inserted, duplicates)
+    return inserted, duplicates
+
+
+# [新增] 自定义异常，表示后台写入线程已经退出，无法再接收数据
+class DatabaseWriterError(Exception):
+    pass
+
+class DatabaseWriter:
+    """
+    [新增] 长期持有一个连接的后台写入器。
+    爬取线程只需把结果放入队列即可继续工作，由专用的写入线程批量提交，
+    因此爬取循环不会再等待磁盘 I/O；同时累计新插入与重复的行数。
+    用法：
+        with DatabaseWriter() as writer:
+            writer.submit_page(search_term, bond_code, bond_name, announcements, next_skip)
+            writer.complete_pages(search_term, bond_code)
+    """
+    def __init__(self, db_path: str = None, max_queue_size: int = None):
+        self.db_path = db_path or config.DATABASE_NAME
+        self.inserted_total = 0
+        self.duplicate_total = 0
+        self._queue = queue.Queue(maxsize=max_queue_size or config.DB_WRITER_QUEUE_SIZE)
+        # [新增] 已提交但尚未落盘的数据，供发行人去重查询使用，查询前不必等待整个队列写完。
+        # 每项在所在批次提交（或放弃）后移除，因此任意时刻一条数据要么在这里，要么已在库中
+        self._pending_lock = threading.Lock()
+        self._pending_files = {}  # 文件链接 -> 债券 code
+        self._pending_pages = collections.Counter()  # 债券 code -> 未落盘的页数
+        self._pending_completed = collections.Counter()  # 债券 code -> 未落盘的 "翻页完成" 标记数
+        # [新增] 本次处理中有公告页写入失败的搜索词（只在写入线程中访问）。在该债券的任务状态记录之前：
+        # 之后的页照常写入但不再推进翻页进度，翻页完成标记被忽略，done / empty 改记为 failed，
+        # 这样翻页进度停在丢失的那一页，重试时会从这一页重新获取
+        self._failed_terms = set()
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+        # [新增] 导出指标时读取队列中等待落盘的项数
+        metrics.DB_QUEUE_DEPTH.set_function(self._queue.qsize)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _check_alive(self):
+        if not self._thread.is_alive():
+            raise DatabaseWriterError("后台写入线程已退出，数据无法再写入数据库。")
+
+    def _put(self, item):
+        """放入写入队列；队列已满时阻塞，起到背压作用。写入线程已退出时抛出 DatabaseWriterError，而不是永久阻塞。"""
+        while True:
+            self._check_alive()
+            try:
+                self._queue.put(item, timeout=1)
+                return
+            except queue.Full:
                 continue
 
-            for file_info in files:
-                file_url = file_info.get('fileUrl')
-                file_size = file_info.get('fileSize')
-                
-                if not file_url:
-                    continue
-                
+    def _track(self, func, bond_code, announcements_data, delta):
+        """[新增] 登记（delta=1）或移除（delta=-1）一项尚未落盘的公告页 / 翻页完成标记。"""
+        with self._pending_lock:
+            if func is _complete_cursor:
+                self._pending_completed[bond_code] += delta
+                if self._pending_completed[bond_code] <= 0:
+                    del self._pending_completed[bond_code]
+                return
+            self._pending_pages[bond_code] += delta
+            if self._pending_pages[bond_code] <= 0:
+                del self._pending_pages[bond_code]
+            for item in announcements_data:
+                # 这里不能因为格式异常的公告而出错，否则数据还没进入队列就被丢弃了
+                files = item.get('file') if isinstance(item, dict) else None
+                for f in files if isinstance(files, list) else ():
+                    url = f.get('fileUrl') if isinstance(f, dict) else None
+                    if not url or not isinstance(url, str):
+                        continue
+                    if delta > 0:
+                        self._pending_files.setdefault(url, bond_code)
+                    elif self._pending_files.get(url) == bond_code:
+                        del self._pending_files[url]
+
+    def _submit_tracked(self, func, args):
+        bond_code = args[1]
+        announcements_data = args[3] if func is not _complete_cursor else ()
+        self._track(func, bond_code, announcements_data, 1)
+        try:
+            self._put((func, args))
+        except DatabaseWriterError:
+            self._track(func, bond_code, announcements_data, -1)
+            raise
+
+    def submit_page(self, search_term: str, bond_code: str, bond_name: str, announcements_data: list, next_skip: int):
+        """[新增] 写入一页公告并记录翻页进度（二者在同一事务中提交）。"""
+        self._submit_tracked(_save_page, (search_term, bond_code, bond_name, announcements_data, next_skip))
+
+    def complete_pages(self, search_term: str, bond_code: str):
+        """[新增] 标记债券已完整翻页。"""
+        self._submit_tracked(_complete_cursor, (search_term, bond_code))
+
+    def find_issuer_code(self, bond_code: str, file_urls: list):
+        """
+        [新增] 与 database.find_issuer_code 相同，但把写入队列中尚未落盘的公告页与翻页完成标记也考虑在内，
+        因此不需要先 flush：刚提交的同发行人债券无需等待落盘即可被识别。
+        """
+        # 先取未落盘数据的快照再查库：快照之后才落盘的数据在查库时一定已可见
+        with self._pending_lock:
+            pending_owners = {url: self._pending_files[url] for url in file_urls if url in self._pending_files}
+            pending_pages = set(self._pending_pages)
+            pending_completed = set(self._pending_completed)
+        return find_issuer_code(bond_code, file_urls, pending_owners, pending_pages, pending_completed)
+
+    def record_resolution(self, search_term: str, bond_details):
+        """[新增] 缓存搜索词的解析结果（bond_details 为 None 表示搜索无结果）。"""
+        self._put((_record_resolution, (search_term, bond_details)))
+
+    def record_issuer(self, search_term: str, bond_code: str, bond_name: str, issuer_code: str):
+        """[新增] 记录债券与发行人（实际抓取公告的债券 code）的对应关系。"""
+        self._put((_record_issuer, (search_term, bond_code, bond_name, issuer_code)))
+
+    def record_job(self, search_term: str, status: str, error: str = None):
+        """[新增] 记录搜索词的处理结果（JOB_DONE / JOB_NOT_FOUND / JOB_EMPTY / JOB_FAILED）。"""
+        self._put((_record_job, (search_term, status, error)))
+
+    def flush(self):
+        """等待队列中已提交的数据全部落盘。写入线程已退出时抛出 DatabaseWriterError。"""
+        done = self._queue.all_tasks_done
+        with done:
+            while self._queue.unfinished_tasks:
+                self._check_alive()
+                done.wait(1)
+
+    def close(self):
+        """写完队列中剩余的数据后关闭连接，并输出本次运行的写入统计。"""
+        if not self._thread.is_alive():
+            return
+        self._queue.put(None)
+        self._thread.join()
+        metrics.DB_QUEUE_DEPTH.set_function(None)
+        print(f"[数据库] 本次共新增 {self.inserted_total} 条公告，忽略 {self.duplicate_total} 条重复记录。")
+
+    def _next_batch(self):
+        """阻塞等待一项任务，再顺带取出队列中已积压的任务，合并到同一个事务里提交。
+        队列中的每一项为 (写入函数, 参数)，None 表示结束。"""
+        batch = [self._queue.get()]
+        while batch[-1] is not None and len(batch) < config.DB_WRITER_BATCH_SIZE:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    @staticmethod
+    def _apply(conn, failed_terms: set, func, args):
+        """
+        [新增] 执行一项写入，并按 failed_terms 处理已有公告页写入失败的债券（见 __init__ 中 _failed_terms 的说明）。
+        failed_terms 可能被修改，由调用方在事务提交后才采用。
+        """
+        search_term = args[0]
+        if search_term in failed_terms:
+            if func is _save_page:
+                return _insert_announcements(conn, *args[:4])
+            if func is _complete_cursor:
+                return 0, 0
+            if func is _record_job:
+                failed_terms.discard(search_term)
+                if args[1] in (JOB_DONE, JOB_EMPTY):
+                    print(f"[数据库] '{search_term}' 有公告页写入失败，任务状态记为 failed，稍后从丢失的页重试。")
+                    args = (search_term, JOB_FAILED, "公告页写入数据库失败")
+        return func(conn, *args)
+
+    def _write(self, conn, items):
+        """
+        [新增] 在一个事务中写入整个批次。出错时回滚，再逐项各自提交，
+        只丢弃出错的那一项（如接口返回了格式异常的公告），不连累同批次的其他数据。
+        [修改] 被丢弃的是公告页时，把该债券记入 _failed_terms，不让后续的写入把它标记为已完整爬取。
+        :return: [(新插入的行数, 重复的行数)]
+        """
+        failed_terms = set(self._failed_terms)
+        try:
+            results = [self._apply(conn, failed_terms, func, args) for func, args in items]
+            conn.commit()
+            self._failed_terms = failed_terms
+            return results
+        except Exception as e:
+            conn.rollback()
+            if len(items) > 1:
+                print(f"[数据库] 批量写入 {len(items)} 项数据时出错，已回滚，改为逐项写入: {e!r}")
+        failed_terms = self._failed_terms
+        results = []
+        for func, args in items:
+            attempt = set(failed_terms)
+            try:
+                results.append(self._apply(conn, attempt, func, args))
+                conn.commit()
+                failed_terms = attempt
+            except Exception as e:
+                conn.rollback()
+                print(f"[数据库] {func.__name__} 写入失败，已回滚并跳过该项: {e!r}")
+                if func is _save_page:
+                    failed_terms.add(args[0])
+        self._failed_terms = failed_terms
+        return results
+
+    def _run(self):
+        conn = _connect(self.db_path)
+        try:
+            while True:
+                batch = self._next_batch()
+                items = [item for item in batch if item is not None]
                 try:
-                    cursor.execute('''
-                        INSERT INTO announcements (search_term, bond_name, bond_code, announcement_title, file_url, file_size, publish_date, scraped_at)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (search_term, bond_name, bond_code, title, file_url, file_size, publish_date, datetime.datetime.now()))
-                    saved_count += 1
-                except sqlite3.IntegrityError:
-                    # 如果 file_url 已经存在 (因为设置了 UNIQUE)，则忽略
-                    # print(f"文件链接已存在，跳过: {file_url}") # 在批量模式下，这个日志太频繁，可以注释掉
-                    pass
-
-        conn.commit()
-
-    if saved_count > 0:
-        print(f"成功保存 {saved_count} 条新的公告信息到数据库。")
-    else:
-        print("没有新的公告信息被保存（可能所有公告都已存在）。")
+                    started = time.perf_counter()
+                    with tracing.span('db.commit', items=len(items)):
+                        results = self._write(conn, items)
+                    metrics.DB_COMMIT_SECONDS.observe(time.perf_counter() - started)
+                    for inserted, duplicates in results:
+                        self.inserted_total += inserted
+                        self.duplicate_total += duplicates
+                        _record_rows(inserted, duplicates)
+                except Exception as e:
+                    # [修改] 任何异常都不能让写入线程退出，否则之后的数据会丢失、提交方会永久阻塞
+                    print(f"[数据库] 写入线程出现意外错误，本批次已放弃: {e}")
+                finally:
+                    for func, args in items:
+                        if func in (_save_page, _complete_cursor):
+                            self._track(func, args[1], args[3] if func is not _complete_cursor else (), -1)
+                    for _ in batch:
+                        self._queue.task_done()
+                if len(items) < len(batch):
+                    break
+        finally:
+            conn.close()
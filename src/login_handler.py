@@ -2,19 +2,137 @@
 
 import time
 import json
+import shutil
+import atexit
+import tempfile
+import threading
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service as ChromeService
-from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import TimeoutException, WebDriverException
 
 from . import config
+from . import tracing # [新增] 性能追踪
+
+# --- [新增] 浏览器池 ---
+# ChromeDriverManager().install() 每次调用都会联网检查版本，这里只解析一次并缓存结果
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+def _get_driver_path() -> str:
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            # [修改] webdriver_manager 只在第一次解析驱动路径时导入
+            from webdriver_manager.chrome import ChromeDriverManager
+            _driver_path = ChromeDriverManager().install()
+        return _driver_path
+
+class BrowserPool:
+    """
+    长期存活的 Chrome 浏览器池。每个浏览器使用独立的临时用户目录，
+    每次登录结束后清空 Cookie 和本地存储再放回池中，因此不同账号之间互不影响。
+    池的大小即允许同时进行的登录数。
+    """
+    def __init__(self, size: int):
+        self.size = size
+        self._idle = []
+        self._created = 0
+        # [修改] 用条件变量同时保护空闲列表与已创建数：浏览器被归还或因崩溃被丢弃时都会唤醒等待者，
+        # 丢弃后等待者可以补建一个，不会在所有浏览器都崩溃时永久等待
+        self._cond = threading.Condition()
+        self._profiles = {}  # id(driver) -> 临时用户目录
+
+    def _create_driver(self):
+        options = webdriver.ChromeOptions()
+        if config.BROWSER_HEADLESS:
+            options.add_argument("--headless=new")
+            options.add_argument("--window-size=1920,1080")
+        else:
+            options.add_argument("--start-maximized")
+        options.add_argument("--no-sandbox")
+        options.add_argument("--disable-dev-shm-usage")
+        profile_dir = tempfile.mkdtemp(prefix="qyyjt-browser-")
+        options.add_argument(f"--user-data-dir={profile_dir}")
+        try:
+            driver = webdriver.Chrome(service=ChromeService(_get_driver_path()), options=options)
+        except Exception:
+            shutil.rmtree(profile_dir, ignore_errors=True)
+            raise
+        self._profiles[id(driver)] = profile_dir
+        return driver
+
+    def acquire(self):
+        """取出一个空闲浏览器；没有空闲且未达上限时新建一个，否则等待其他登录归还（或丢弃）浏览器。"""
+        with self._cond:
+            while not self._idle and self._created >= self.size:
+                self._cond.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+        try:
+            return self._create_driver()
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+
+    def _reset(self, driver):
+        """清空浏览器中所有 Cookie 与站点存储，避免上一个账号的登录态泄露给下一个账号。"""
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        driver.execute_cdp_cmd("Storage.clearDataForOrigin", {
+            "origin": "https://www.qyyjt.cn",
+            "storageTypes": "all"
+        })
+        driver.get("about:blank")
+
+    def _discard(self, driver):
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        shutil.rmtree(self._profiles.pop(id(driver), ""), ignore_errors=True)
+        with self._cond:
+            self._created -= 1
+            self._cond.notify()
+
+    def release(self, driver):
+        """归还浏览器；如果浏览器已崩溃或无法清理，则直接关闭，下次按需重建。"""
+        try:
+            self._reset(driver)
+        except WebDriverException as e:
+            print(f"浏览器状态清理失败，将关闭该浏览器: {e}")
+            self._discard(driver)
+            return
+        with self._cond:
+            self._idle.append(driver)
+            self._cond.notify()
+
+    def close(self):
+        """关闭池中所有空闲浏览器。"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for driver in idle:
+            self._discard(driver)
+
+_browser_pool = None
+_browser_pool_lock = threading.Lock()
+
+def get_browser_pool() -> BrowserPool:
+    global _browser_pool
+    with _browser_pool_lock:
+        if _browser_pool is None:
+            _browser_pool = BrowserPool(config.BROWSER_POOL_SIZE)
+            atexit.register(_browser_pool.close)
+        return _browser_pool
 
 # --- [核心改动] ---
 # 函数签名改变，接收 phone 和 password 作为参数
+@tracing.traced('login') # [新增] 浏览器登录的耗时记录为 trace 中的 login 阶段
 def get_authenticated_session(phone: str, password: str, search_term: str):
     """
     [最终版] 模拟登录和搜索，然后正确地从 localStorage 的 'u_info' 中提取用户ID。
@@ -24,11 +142,13 @@ def get_authenticated_session(phone: str, password: str, search_term: str):
     :return: 一个包含完整认证信息的字典，失败则返回 None。
     """
     print(f"[{phone}] 开始模拟登录...")
-    options = webdriver.ChromeOptions()
-    # options.add_argument('--headless') # 如果需要后台运行，可以取消这行注释
-    options.add_argument("--start-maximized")
-    
-    driver = webdriver.Chrome(service=ChromeService(ChromeDriverManager().install()), options=options)
+    # [修改] 从浏览器池中取用长期存活的浏览器，不再每次登录都新建并关闭 Chrome
+    pool = get_browser_pool()
+    try:
+        driver = pool.acquire()
+    except Exception as e:
+        print(f"[{phone}] 启动浏览器失败: {e}")
+        return None
     
     try:
         driver.get(config.LOGIN_URL)
@@ -89,7 +209,8 @@ def get_authenticated_session(phone: str, password: str, search_term: str):
             "token_name": token_header_name, 
             "token_value": token_value, 
             "user_id": user_id,
-            "cookies": cookies
+            "cookies": cookies,
+            "obtained_at": time.time() # [新增] 获取时间，便于排查缓存会话的年龄
         }
 
     except TimeoutException as e:
@@ -101,5 +222,5 @@ def get_authenticated_session(phone: str, password: str, search_term: str):
         driver.save_screenshot("login_error_final.png")
         return None
     finally:
-        driver.quit()
-        print(f"[{phone}] 浏览器已关闭。")
+        pool.release(driver)
+        print(f"[{phone}] 浏览器已清理并归还浏览器池。")
@@ -2,10 +2,17 @@
 
 import json
 import time
+import asyncio # [新增] 异步引擎
+import queue     # [新增] 并行模式下的共享任务队列
+import threading # [新增]
 import random
-import pandas as pd
-from wakepy import keep # [新增] 导入防休眠库
-from . import login_handler, scraper, database, config
+# [修改] selenium / webdriver_manager（经由 login_handler）与 wakepy 只在真正用到时才导入，
+# 复用缓存会话或续跑时启动不再为加载它们付出数秒
+from . import scraper, database, config, session_cache, metrics
+from .bond_list import iter_unique_terms # [新增] 流式读取债券列表
+from . import tracing # [新增] 性能追踪
+from .session_pool import SessionPrefetcher # [新增] 后台预登录
+from .account_scheduler import AccountScheduler # [新增] 账号健康度调度
 
 def load_accounts():
     """从JSON文件中加载账号池。"""
@@ -27,28 +34,702 @@ def load_accounts():
         return None
 
 def load_bonds_list():
-    """从Excel文件中加载待爬取的债券列表。"""
+    """
+    从债券列表文件中加载待爬取的债券列表。
+    [修改] 不再用 pandas 读入整张表，而是只流式读取所需的一列（支持 .xlsx / .csv / .parquet）。
+    """
     try:
         # [改动] 使用 config.BONDS_LIST_PATH 来保持一致性
-        df = pd.read_excel(config.BONDS_LIST_PATH, engine='openpyxl')
-        if config.BONDS_LIST_COLUMN_NAME not in df.columns:
-            print(f"错误: Excel文件中找不到名为 '{config.BONDS_LIST_COLUMN_NAME}' 的列。")
-            return None
-        
-        bonds = df[config.BONDS_LIST_COLUMN_NAME].dropna().unique().tolist()
-        print(f"成功从Excel加载 {len(bonds)} 个唯一的债券简称。")
+        bonds = list(iter_unique_terms(config.BONDS_LIST_PATH, config.BONDS_LIST_COLUMN_NAME))
+        print(f"成功从债券列表加载 {len(bonds)} 个唯一的债券简称。")
         return bonds
     except FileNotFoundError:
         print(f"错误: 债券列表文件未找到 -> {config.BONDS_LIST_PATH}")
         return None
+    except KeyError:
+        print(f"错误: 债券列表文件中找不到名为 '{config.BONDS_LIST_COLUMN_NAME}' 的列。")
+        return None
     except Exception as e:
-        print(f"读取Excel文件时发生错误: {e}")
+        print(f"读取债券列表文件时发生错误: {e}")
+        return None
+
+def get_session_for_account(account: dict, search_term: str):
+    """
+    [新增] 获取账号的认证会话：优先复用本地缓存，没有缓存时才启动浏览器登录，并把新会话写入缓存。
+    缓存会一直复用到收到 TokenExpiredException 为止（届时调用方应使缓存失效）。
+    :return: 认证会话字典，登录失败返回 None。
+    """
+    phone = account['phone']
+    auth_session = session_cache.load_session(phone)
+    if auth_session:
+        print(f"[{phone}] 使用本地缓存的会话，跳过浏览器登录。")
+        metrics.LOGINS.inc(source='cache', result='ok')
+        return auth_session
+
+    from . import login_handler # [修改] 延迟导入：只有需要浏览器登录时才加载 selenium
+    started = time.monotonic()
+    auth_session = login_handler.get_authenticated_session(
+        phone=phone,
+        password=account['password'],
+        search_term=search_term
+    )
+    result = 'ok' if auth_session else 'failed'
+    metrics.LOGINS.inc(source='browser', result=result)
+    metrics.LOGIN_SECONDS.observe(time.monotonic() - started, result=result)
+    if auth_session:
+        session_cache.save_session(phone, auth_session)
+    return auth_session
+
+def get_cached_resolution(current_bond: str):
+    """
+    [新增] 查询搜索词的缓存解析结果，命中时无需再发送搜索请求。
+    :return: 与 Scraper.lookup_bond 相同的 (搜索状态, 债券信息)；没有有效缓存时返回 None。
+    """
+    resolution = database.get_bond_resolution(current_bond, config.NEGATIVE_RESOLUTION_TTL_HOURS * 3600)
+    if resolution is None:
         return None
+    if resolution["found"]:
+        print(f"\n[解析缓存] '{current_bond}' -> '{resolution['name']}'，Code: {resolution['code']}，跳过搜索请求。")
+        return scraper.SEARCH_FOUND, {"code": resolution["code"], "name": resolution["name"]}
+    print(f"\n[解析缓存] '{current_bond}' 近期搜索无结果，跳过搜索请求。")
+    return scraper.SEARCH_NOT_FOUND, None
+
+def remember_resolution(current_bond: str, status: str, bond_details, writer: database.DatabaseWriter):
+    """[新增] 缓存明确的搜索结果（找到 / 无结果）；请求失败不缓存，下次仍会重新搜索。"""
+    if status in (scraper.SEARCH_FOUND, scraper.SEARCH_NOT_FOUND):
+        writer.record_resolution(current_bond, bond_details)
+
+# [新增] 本次运行使用的公告分页大小；探测或从数据库读取一次后，所有账号共用
+_notice_page_size = None
+_notice_page_size_lock = threading.Lock()
+
+def ensure_notice_page_size(auth_session: dict, current_bond: str, writer: database.DatabaseWriter) -> int:
+    """
+    [新增] 确定公告接口的分页大小。开启 NOTICE_PAGE_SIZE_PROBE 时，优先使用数据库中缓存的探测结果；
+    没有缓存时借用当前账号的会话、以待爬的债券探测一次，结论确定时写入数据库，之后的运行直接复用。
+    :param auth_session: 当前账号的认证会话
+    :param current_bond: 当前待爬的债券简称，用作探测对象
+    :return: 本次运行使用的分页大小
+    """
+    global _notice_page_size
+    if not config.NOTICE_PAGE_SIZE_PROBE:
+        return config.NOTICE_PAGE_SIZE
+    with _notice_page_size_lock:
+        if _notice_page_size:
+            return _notice_page_size
+        cached = database.get_setting('notice_page_size')
+        if cached:
+            _notice_page_size = int(cached)
+            print(f"[分页探测] 使用已缓存的分页大小: {_notice_page_size}")
+            return _notice_page_size
+
+    # [修改] 探测要发送网络请求，在锁外进行，避免所有账号都等待同一个较慢或被限流的探测；
+    # 几个账号同时探测时，以最先完成的结果为准
+    probe_scraper = scraper.Scraper(auth_session)
+    lookup = get_cached_resolution(current_bond)
+    if lookup is None:
+        lookup = probe_scraper.lookup_bond(current_bond)
+        remember_resolution(current_bond, *lookup, writer)
+    _, bond_details = lookup
+    if not bond_details:
+        # 换下一个债券（或下一次登录）时再探测
+        return config.NOTICE_PAGE_SIZE
+
+    print(f"[分页探测] 以 '{current_bond}' 探测公告接口可接受的最大分页大小...")
+    page_size, conclusive = probe_scraper.probe_page_size(bond_details["code"])
+    with _notice_page_size_lock:
+        if _notice_page_size:
+            return _notice_page_size
+        _notice_page_size = page_size
+    if conclusive:
+        database.save_setting('notice_page_size', page_size)
+        print(f"[分页探测] 分页大小确定为 {page_size}，已缓存到数据库。")
+    else:
+        print(f"[分页探测] 本次运行使用分页大小 {page_size}（该债券公告较少，结论未缓存，下次运行将重新探测）。")
+    return page_size
+
+def prepare_pagination(current_bond: str, bond_code: str):
+    """
+    [新增] 确定债券从哪一页开始获取。
+    - 普通模式：从上次中断的页继续（没有断点则从第一页开始）。
+    - 增量刷新模式：总是从最新的第一页开始，并返回该债券已入库公告中最新的发布日期，供 store_page 判断何时停止。
+    :return: (起始 skip, 增量刷新的日期基准；非刷新模式为 None)
+    """
+    if config.REFRESH_MODE:
+        latest_date = database.get_latest_publish_date(bond_code)
+        print(f"[增量刷新] '{current_bond}' 已入库的最新公告日期: {latest_date or '无'}，遇到已入库的公告即停止翻页。")
+        return 0, {"latest_date": latest_date}
+
+    start_skip = database.get_page_cursor(bond_code)
+    if start_skip:
+        print(f"[断点续页] '{current_bond}' 上次中断于 skip={start_skip}，从该页继续。")
+    return start_skip, None
+
+def reuse_issuer_announcements(current_bond: str, bond_details: dict, first_page: list,
+                               writer: database.DatabaseWriter) -> bool:
+    """
+    [新增] 公告接口按发行人（type=co）返回，同一发行人的多只债券拿到的是同一份公告列表。
+    如果当前债券第一页的公告已由同一发行人的另一只债券完整抓取过，只记录对应关系，不再重复翻页。
+    :return: 已复用（调用方应停止翻页）返回 True。
+    """
+    if not config.ISSUER_DEDUP:
+        return False
+    file_urls = [f.get('fileUrl') for item in first_page for f in item.get('file') or [] if f.get('fileUrl')]
+    # [修改] 由写入器结合队列中尚未落盘的数据判断，不再等待整个写入队列清空
+    issuer_code = writer.find_issuer_code(bond_details["code"], file_urls)
+    if not issuer_code:
+        return False
+    print(f"[发行人去重] '{current_bond}' 与已抓取的债券 {issuer_code} 属于同一发行人，复用其公告，不再翻页。")
+    writer.record_issuer(current_bond, bond_details["code"], bond_details["name"], issuer_code)
+    writer.record_job(current_bond, database.JOB_DONE)
+    metrics.BONDS.inc(result='done')
+    return True
+
+def finish_bond(current_bond: str, bond_details: dict, writer: database.DatabaseWriter, empty: bool = False):
+    """
+    [新增] 标记债券翻页完成，并记录它是自身所属发行人公告的抓取者。
+    :param empty: [新增] 该债券没有任何公告，任务状态记为 empty
+    """
+    writer.complete_pages(current_bond, bond_details["code"])
+    writer.record_issuer(current_bond, bond_details["code"], bond_details["name"], bond_details["code"])
+    status = database.JOB_EMPTY if empty else database.JOB_DONE
+    writer.record_job(current_bond, status)
+    metrics.BONDS.inc(result=status)
+    if empty:
+        print(f"'{current_bond}' 没有任何公告。")
+    else:
+        print(f"'{current_bond}' 的公告已全部获取并提交入库。")
+
+def skip_unresolved(current_bond: str, status: str, writer: database.DatabaseWriter):
+    """[新增] 搜索没有得到债券时记录任务状态：确定不存在记为 not_found，请求失败记为 failed 以便稍后重试。"""
+    if status == scraper.SEARCH_FAILED:
+        print(f"搜索 '{current_bond}' 失败，跳过此债券，稍后重试。")
+        fail_bond(current_bond, "搜索请求失败", writer)
+        return
+    print(f"未能通过API找到 '{current_bond}' 的信息，跳过此债券。")
+    writer.record_job(current_bond, database.JOB_NOT_FOUND)
+    metrics.BONDS.inc(result='not_found')
+
+def fail_bond(current_bond: str, error: str, writer: database.DatabaseWriter):
+    """[新增] 把债券记为 failed，按 JOB_RETRY_BACKOFF 退避后重试。"""
+    writer.record_job(current_bond, database.JOB_FAILED, error)
+    metrics.BONDS.inc(result='failed')
+
+def store_page(current_bond: str, bond_details: dict, page_announcements: list, next_skip: int,
+               writer: database.DatabaseWriter, refresh=None) -> bool:
+    """
+    [新增] 把一页公告交给写入器。增量刷新模式下只写入排在第一条已入库公告之前的新公告。
+    公告列表按发布时间从新到旧排列，一旦某条公告的文件链接已在库中、或发布日期早于已入库的最新日期，
+    其后的所有公告都已入库，无需继续翻页。
+    :return: 是否应继续获取下一页。
+    """
+    reached_known = False
+    if refresh is not None:
+        file_urls = [f.get('fileUrl') for item in page_announcements for f in item.get('file') or [] if f.get('fileUrl')]
+        known_urls = database.find_known_file_urls(file_urls)
+        latest_date = refresh["latest_date"]
+        for index, item in enumerate(page_announcements):
+            item_urls = [f.get('fileUrl') for f in item.get('file') or []]
+            # [修改] 库中的日期已统一为 ISO 格式，比较前先按同样的规则转换
+            publish_date = database.normalize_date(item.get('date'))
+            is_older = latest_date and publish_date and publish_date < latest_date
+            if is_older or any(url in known_urls for url in item_urls):
+                page_announcements = page_announcements[:index]
+                reached_known = True
+                break
+        print(f"  - [增量刷新] 本页新公告 {len(page_announcements)} 条。")
+
+    writer.submit_page(current_bond, bond_details["code"], bond_details["name"], page_announcements, next_skip)
+    return not reached_known
+
+def scrape_one_bond(current_scraper, current_bond: str, writer: database.DatabaseWriter) -> bool:
+    """
+    [新增] 用同步 Scraper 完成单个债券的搜索与公告获取。
+    [修改] 公告逐页获取、逐页入库，并记录翻页进度；中断的债券下次会从最后一个成功的页继续。
+    RateLimitException / TokenExpiredException 会原样抛出，由调用方决定换号或重新登录。
+    :return: 全部页面均已入库返回 True；未找到债券或某页获取失败（已跳过）返回 False。
+    """
+    # [新增] 优先使用缓存的解析结果，省去一次受限流约束的搜索请求
+    lookup = get_cached_resolution(current_bond)
+    if lookup is None:
+        lookup = current_scraper.lookup_bond(current_bond)
+        remember_resolution(current_bond, *lookup, writer)
+    status, bond_details = lookup
+    if not bond_details:
+        skip_unresolved(current_bond, status, writer)
+        return False
+
+    bond_code = bond_details["code"]
+    start_skip, refresh = prepare_pagination(current_bond, bond_code)
+    print(f"正在为 Code '{bond_code}' 逐页获取公告...")
+
+    pages = 0
+    try:
+        for skip, page_announcements, next_skip in current_scraper.iter_announcement_pages(bond_code, start_skip):
+            pages += 1
+            if skip == 0 and reuse_issuer_announcements(current_bond, bond_details, page_announcements, writer):
+                return True
+            if not store_page(current_bond, bond_details, page_announcements, next_skip, writer, refresh):
+                break
+    except scraper.PageFetchException as e:
+        print(f"获取 '{current_bond}' 的公告失败，已保存的页面保留，下次从断点继续。")
+        fail_bond(current_bond, str(e), writer)
+        return False
+
+    # 从第一页开始却一页公告都没有取到，说明该债券没有公告
+    finish_bond(current_bond, bond_details, writer, empty=(pages == 0 and start_skip == 0))
+    return True
+
+async def scrape_one_bond_async(async_scraper, current_bond: str, writer: database.DatabaseWriter) -> bool:
+    """
+    [新增] scrape_one_bond 的异步版本，约定相同。
+    [修改] 查询数据库、向写入队列提交（队列满时会阻塞）等同步操作放到线程中执行，不阻塞事件循环上的其他债券。
+    """
+    lookup = await asyncio.to_thread(get_cached_resolution, current_bond)
+    if lookup is None:
+        lookup = await async_scraper.lookup_bond(current_bond)
+        await asyncio.to_thread(remember_resolution, current_bond, *lookup, writer)
+    status, bond_details = lookup
+    if not bond_details:
+        await asyncio.to_thread(skip_unresolved, current_bond, status, writer)
+        return False
+
+    bond_code = bond_details["code"]
+    start_skip, refresh = await asyncio.to_thread(prepare_pagination, current_bond, bond_code)
+
+    pages = 0
+    try:
+        async for skip, page_announcements, next_skip in async_scraper.iter_announcement_pages(bond_code, start_skip):
+            pages += 1
+            if skip == 0 and await asyncio.to_thread(
+                    reuse_issuer_announcements, current_bond, bond_details, page_announcements, writer):
+                return True
+            if not await asyncio.to_thread(
+                    store_page, current_bond, bond_details, page_announcements, next_skip, writer, refresh):
+                break
+    except scraper.PageFetchException as e:
+        print(f"获取 '{current_bond}' 的公告失败，已保存的页面保留，下次从断点继续。")
+        await asyncio.to_thread(fail_bond, current_bond, str(e), writer)
+        return False
+
+    # 从第一页开始却一页公告都没有取到，说明该债券没有公告
+    await asyncio.to_thread(finish_bond, current_bond, bond_details, writer, empty=(pages == 0 and start_skip == 0))
+    return True
+
+def run_async_batch(async_scraper, batch: list, finished: list, writer: database.DatabaseWriter,
+                    succeeded: list = None):
+    """
+    [新增] 用 AsyncScraper 并发处理一批债券，并把结果存入数据库。
+    :param async_scraper: 当前账号的 AsyncScraper 实例
+    :param batch: 本批次要处理的债券简称列表
+    :param finished: 调用方传入的空列表，按完成顺序记录已处理完毕（含被跳过）的债券。
+                     即使中途抛出 RateLimitException / TokenExpiredException，其中的记录依然有效。
+    :param writer: 后台数据库写入器
+    :param succeeded: [新增] 可选的空列表，只记录 scrape_one_bond_async 返回 True（全部页面已入库）的债券，
+                      与同步引擎一样，只有这些债券计入账号的请求数与健康度
+    """
+    async def process_bond(current_bond):
+        try:
+            with tracing.span('bond', term=current_bond):
+                saved = await scrape_one_bond_async(async_scraper, current_bond, writer)
+            if saved and succeeded is not None:
+                succeeded.append(current_bond)
+        except (scraper.RateLimitException, scraper.TokenExpiredException):
+            raise
+        except Exception as e:
+            print(f"\n处理 '{current_bond}' 时发生未知错误: {e}，将跳过此债券。")
+            await asyncio.to_thread(fail_bond, current_bond, f"{type(e).__name__}: {e}", writer)
+        finished.append(current_bond)
+
+    async def runner():
+        async with async_scraper:
+            await async_scraper.scrape_bonds(batch, process_bond)
+
+    asyncio.run(runner())
+
+def run_sequential(accounts: list, bonds_to_scrape: list, writer: database.DatabaseWriter,
+                   scheduler: AccountScheduler = None):
+    """
+    逐个账号轮换爬取：同一时间只有一个账号在工作，达到 REQUESTS_PER_ACCOUNT 或被限制后切换到下一个账号。
+    [修改] 账号由 AccountScheduler 分配：每次换号都取当前最健康的可用账号，被限流或登录失败的账号冷却后重新加入。
+    :param scheduler: [新增] 传入时沿用其中记录的账号健康度与冷却状态（如失败重试轮），否则新建
+    """
+    # --- 状态管理变量 ---
+    scheduler = scheduler or AccountScheduler(accounts)
+    current_account = None
+    bond_index = 0
+    requests_this_account = 0
+    total_bonds = len(bonds_to_scrape)
+    current_scraper = None
+    # [新增] 当前账号工作期间，在后台为接下来的几个账号准备好会话
+    prefetcher = SessionPrefetcher(get_session_for_account)
+
+    def prefetch_upcoming_accounts():
+        for next_account in scheduler.peek(config.READY_SESSION_POOL_SIZE):
+            prefetcher.prefetch(next_account, bonds_to_scrape[bond_index])
+
+    def next_session_ready():
+        upcoming = scheduler.peek(1)
+        return bool(upcoming) and prefetcher.is_ready(upcoming[0]['phone'])
+
+    def switch_account():
+        nonlocal current_account, current_scraper
+        scheduler.release(current_account['phone'])
+        current_account = None
+        current_scraper = None
+
+    # 主循环
+    while bond_index < total_bonds and scheduler.has_usable_accounts():
+        # [新增] 本轮正在处理的债券；处理完毕后置为 None，异常处理逻辑据此决定重试或跳过哪个债券，
+        # 而不是读取可能已越界（异步批次结束后 bond_index 可能等于 total_bonds）的 bonds_to_scrape[bond_index]
+        current_bond = bonds_to_scrape[bond_index]
+        try:
+            # --- [新增] 向调度器申请账号；所有账号都在冷却时，等待最早恢复的那个 ---
+            if current_account is None:
+                current_account = scheduler.acquire()
+                if current_account is None:
+                    wait = max(scheduler.next_available_in(), 1)
+                    print(f"\n所有账号均在冷却中，{wait:.0f} 秒后重试。账号状态: {scheduler.summary()}")
+                    tracing.sleep(wait, 'account_cooldown')
+                    continue
+
+            # --- 检查并获取有效会话 ---
+            if current_scraper is None:
+                phone = current_account['phone']
+                print("\n" + "~"*50)
+                print(f"当前无有效会话。正在为账号 {phone} 获取会话...")
+                print(f"账号状态: {scheduler.summary()}")
+                
+                auth_session = prefetcher.get(current_account, current_bond)
+
+                if auth_session:
+                    scheduler.report_login_success(phone)
+                    page_size = ensure_notice_page_size(auth_session, current_bond, writer)
+                    # [新增] 配置了多个在途债券时使用异步引擎
+                    if config.ASYNC_BONDS_IN_FLIGHT > 1:
+                        current_scraper = scraper.AsyncScraper(auth_session, page_size=page_size)
+                    else:
+                        current_scraper = scraper.Scraper(auth_session, page_size=page_size)
+                    requests_this_account = 0
+                    print("登录成功，已创建新的 Scraper 实例。")
+                    print("~"*50 + "\n")
+                    prefetch_upcoming_accounts()
+                else:
+                    # [修改] 登录失败的账号先冷却，连续失败多次才停用
+                    if scheduler.report_login_failure(phone):
+                        print(f"账号 {phone} 连续登录失败 {config.ACCOUNT_MAX_LOGIN_FAILURES} 次，已停用。")
+                    else:
+                        print(f"账号 {phone} 登录失败，冷却 {scheduler.cooldown_remaining(phone):.0f} 秒后再试。")
+                    switch_account()
+                    continue
+
+            phone = current_account['phone']
+            # --- [新增] 异步引擎：把此账号剩余的请求额度作为一批，多个债券同时在途 ---
+            if isinstance(current_scraper, scraper.AsyncScraper):
+                batch_size = min(config.REQUESTS_PER_ACCOUNT - requests_this_account, total_bonds - bond_index)
+                batch = bonds_to_scrape[bond_index:bond_index + batch_size]
+                print("\n" + "="*50)
+                print(f"进度: [{bond_index + 1}-{bond_index + batch_size}/{total_bonds}] | 账号: {phone} | 此账号请求数: {requests_this_account}")
+                print(f"异步批次: {batch_size} 个债券，最多 {config.ASYNC_BONDS_IN_FLIGHT} 个同时在途")
+                print("="*50)
+
+                finished, succeeded = [], []
+                try:
+                    run_async_batch(current_scraper, batch, finished, writer, succeeded)
+                finally:
+                    # 把已完成的债券挪到批次前部，bond_index 只越过真正处理完的部分，
+                    # 这样出现异常时，未完成的债券仍会由下面的异常处理逻辑重试
+                    unfinished = [b for b in batch if b not in finished]
+                    bonds_to_scrape[bond_index:bond_index + batch_size] = finished + unfinished
+                    bond_index += len(finished)
+                    current_bond = unfinished[0] if unfinished else None
+                    # [修改] 与同步引擎一致：未找到或获取失败的债券不计入请求数，也不算作成功
+                    requests_this_account += len(succeeded)
+                    if succeeded:
+                        scheduler.report_success(phone, len(succeeded))
+
+            # --- 使用已有的会话进行爬取 ---
+            else:
+                print("\n" + "="*50)
+                print(f"进度: [{bond_index + 1}/{total_bonds}] | 账号: {phone} | 此账号请求数: {requests_this_account}")
+                print(f"目标: '{current_bond}'")
+                print("="*50)
+
+                with tracing.span('bond', term=current_bond):
+                    saved = scrape_one_bond(current_scraper, current_bond, writer)
+                bond_index += 1
+                current_bond = None
+                if not saved:
+                    continue
+
+                # --- 任务成功后的处理 ---
+                requests_this_account += 1
+                scheduler.report_success(phone)
+
+            if requests_this_account >= config.REQUESTS_PER_ACCOUNT:
+                print(f"\n--- 账号 {phone} 已达到 {config.REQUESTS_PER_ACCOUNT} 次请求上限，准备切换。 ---")
+                switch_account()
+                # [修改] 下一个账号的会话已在后台准备好时直接交接，否则稍作等待
+                if not next_session_ready():
+                    tracing.sleep(5, 'session_handoff')
+            elif not config.ADAPTIVE_RATE_LIMIT:
+                # [修改] 启用自适应限速时，请求节奏已由限速器控制，无需在债券之间额外暂停
+                sleep_duration = random.uniform(*config.DELAY_BETWEEN_BONDS)
+                print(f"任务完成，暂停 {sleep_duration:.2f} 秒...")
+                tracing.sleep(sleep_duration, 'bond_delay')
+
+        # [新增] 捕获 Token 过期异常
+        except scraper.TokenExpiredException as e:
+            print(f"\n!!!!!!!!!! 会话失效 !!!!!!!!!!")
+            print(f"账号 {current_account['phone']} 的 Token 已过期: {e}")
+            if current_bond is not None:
+                print(f"将销毁当前会话，并使用同一账号尝试重新登录，重试任务 '{current_bond}'")
+            else:
+                print("将销毁当前会话，并使用同一账号尝试重新登录。")
+            print(f"!!!!!!!!!!!!!!!!!!!!!!!!!!!!\n")
+            
+            current_scraper = None # 关键：销毁当前 Scraper 实例
+            session_cache.invalidate_session(current_account['phone']) # [新增] 缓存的会话也已失效
+            prefetcher.discard(current_account['phone']) # [新增] 后台预登录得到的该账号会话同样不能再用
+            # 注意：我们不增加 bond_index，以便重试当前债券
+            # 注意：我们不切换账号，因为当前账号本身没问题
+            
+            tracing.sleep(5, 'relogin') # 稍作等待再重新登录
+
+        except scraper.RateLimitException as e:
+            # [修改] 被限流的账号进入冷却而不是被永久移除，冷却结束后由调度器重新分配
+            cooldown = scheduler.report_rate_limited(current_account['phone'])
+            # [新增] 丢弃后台为该账号准备的会话，冷却结束后重新获取，避免把被限流时的会话再交出去
+            prefetcher.discard(current_account['phone'])
+            print(f"\n!!!!!!!!!! 警告 !!!!!!!!!!")
+            print(f"账号 {current_account['phone']} 已被服务器限制: {e}")
+            if current_bond is not None:
+                print(f"此账号冷却 {cooldown:.0f} 秒后重新加入任务池。将用其他账号重试 '{current_bond}'")
+            else:
+                print(f"此账号冷却 {cooldown:.0f} 秒后重新加入任务池。")
+            print(f"!!!!!!!!!!!!!!!!!!!!!!!!!!!!\n")
+            
+            switch_account()
+            if not next_session_ready():
+                tracing.sleep(10, 'session_handoff')
+
+        except Exception as e:
+            current_scraper = None
+            if current_bond is not None:
+                print(f"\n处理 '{current_bond}' 时发生未知严重错误: {e}")
+                print("为防止卡死，将跳过此债券并继续。")
+                fail_bond(current_bond, f"{type(e).__name__}: {e}", writer)
+                # 异步批次中断时，未完成的债券已被挪到 bond_index 处，current_bond 即为其第一个
+                bond_index += 1
+            else:
+                # 债券已处理完毕，异常发生在切换账号或暂停阶段，无需跳过任何债券
+                print(f"\n债券处理完毕后发生未知严重错误: {e}")
+            tracing.sleep(5, 'error_backoff')
+
+    prefetcher.shutdown()
+    # [新增] 归还仍在使用的账号，调度器在之后的重试轮中还会继续使用
+    if current_account is not None:
+        scheduler.release(current_account['phone'])
+
+    print("\n\n" + "#"*60)
+    print("爬取任务结束。")
+    if bond_index == total_bonds:
+        print("恭喜！所有待处理债券已成功处理完毕。")
+    else:
+        print(f"任务中断。已处理 {bond_index} / {total_bonds} 个债券。")
+        if not scheduler.has_usable_accounts():
+            print("原因：所有账号均因连续登录失败而停用。")
+    print("#"*60)
+
+def account_worker(account: dict, bond_queue: queue.Queue, progress: dict, writer: database.DatabaseWriter,
+                   scheduler: AccountScheduler):
+    """
+    [新增] 并行模式下的单账号工作线程：持续从共享队列中领取债券，直到队列为空或账号被停用。
+    每个线程自行登录，并独立处理 Token 过期（重新登录）与速率限制（交回任务，冷却后继续）。
+    :param account: 账号信息 {"phone", "password"}
+    :param bond_queue: 所有工作线程共享的待爬债券队列
+    :param progress: 共享的进度信息 {"done", "total", "lock"}
+    :param writer: 所有工作线程共享的后台数据库写入器
+    :param scheduler: [新增] 所有工作线程共享的账号调度器，记录各账号的健康度与冷却时间
+    """
+    phone = account['phone']
+    current_scraper = None
+    requests_this_account = 0
+
+    def wait_for_cooldown():
+        # 冷却期间其他账号会继续消费队列；队列已空时无需等满冷却时间
+        while not bond_queue.empty():
+            remaining = scheduler.cooldown_remaining(phone)
+            if remaining <= 0:
+                break
+            tracing.sleep(min(remaining, 5), 'account_cooldown')
+
+    # [新增] 调度器沿用自上一轮时，账号可能仍在冷却中
+    wait_for_cooldown()
+    while True:
+        try:
+            current_bond = bond_queue.get_nowait()
+        except queue.Empty:
+            print(f"[{phone}] 队列已空，工作线程结束。")
+            return
+
+        try:
+            if current_scraper is None:
+                print(f"[{phone}] 当前无有效会话，正在获取会话...")
+                auth_session = get_session_for_account(account, current_bond)
+                if not auth_session:
+                    bond_queue.put(current_bond)
+                    # [修改] 登录失败先冷却再重试，连续失败多次才退出
+                    if scheduler.report_login_failure(phone):
+                        print(f"[{phone}] 连续登录失败 {config.ACCOUNT_MAX_LOGIN_FAILURES} 次，交回任务 '{current_bond}' 并退出此工作线程。")
+                        return
+                    print(f"[{phone}] 登录失败，交回任务 '{current_bond}'，冷却 {scheduler.cooldown_remaining(phone):.0f} 秒后重试。")
+                    wait_for_cooldown()
+                    continue
+                scheduler.report_login_success(phone)
+                page_size = ensure_notice_page_size(auth_session, current_bond, writer)
+                current_scraper = scraper.Scraper(auth_session, page_size=page_size)
+                requests_this_account = 0
+
+            with progress['lock']:
+                position = progress['done'] + 1
+            print(f"\n[{phone}] 进度: [~{position}/{progress['total']}] | 此账号请求数: {requests_this_account} | 目标: '{current_bond}'")
+
+            with tracing.span('bond', term=current_bond):
+                saved = scrape_one_bond(current_scraper, current_bond, writer)
+            if saved:
+                requests_this_account += 1
+                scheduler.report_success(phone)
+            with progress['lock']:
+                progress['done'] += 1
+
+            if requests_this_account >= config.REQUESTS_PER_ACCOUNT:
+                # 与逐个轮换模式一样，账号用满额度后先歇一段时间，再以新会话继续
+                print(f"\n[{phone}] 已达到 {config.REQUESTS_PER_ACCOUNT} 次请求上限，休息 {config.PARALLEL_ACCOUNT_REST} 秒后重新登录。")
+                current_scraper = None
+                tracing.sleep(config.PARALLEL_ACCOUNT_REST, 'account_rest')
+            elif not config.ADAPTIVE_RATE_LIMIT:
+                tracing.sleep(random.uniform(*config.DELAY_BETWEEN_BONDS), 'bond_delay')
+
+        except scraper.TokenExpiredException as e:
+            print(f"\n[{phone}] Token 已过期: {e}。交回任务 '{current_bond}'，稍后重新登录。")
+            bond_queue.put(current_bond)
+            session_cache.invalidate_session(phone)
+            current_scraper = None
+            tracing.sleep(5, 'relogin')
+
+        except scraper.RateLimitException as e:
+            # [修改] 被限制后不再退出线程，而是冷却后以新会话继续领取任务
+            bond_queue.put(current_bond)
+            cooldown = scheduler.report_rate_limited(phone)
+            print(f"\n[{phone}] 已被服务器限制: {e}。交回任务 '{current_bond}'，冷却 {cooldown:.0f} 秒后继续。")
+            current_scraper = None
+            wait_for_cooldown()
+
+        except Exception as e:
+            print(f"\n[{phone}] 处理 '{current_bond}' 时发生未知严重错误: {e}")
+            print("为防止卡死，将跳过此债券并继续。")
+            fail_bond(current_bond, f"{type(e).__name__}: {e}", writer)
+            with progress['lock']:
+                progress['done'] += 1
+            current_scraper = None
+            tracing.sleep(5, 'error_backoff')
+
+def run_parallel_workers(accounts: list, bonds_to_scrape: list, writer: database.DatabaseWriter,
+                         scheduler: AccountScheduler = None):
+    """
+    [新增] 并行模式：每个账号一个工作线程，共同消费同一个债券队列，结果写入同一个数据库。
+    各账号仍遵守自己的 REQUESTS_PER_ACCOUNT 额度，N 个账号可获得接近 N 倍的吞吐。
+    :param scheduler: [新增] 传入时沿用其中记录的账号健康度与冷却状态，否则新建
+    """
+    bond_queue = queue.Queue()
+    for bond in bonds_to_scrape:
+        bond_queue.put(bond)
+    progress = {"done": 0, "total": len(bonds_to_scrape), "lock": threading.Lock()}
+    scheduler = scheduler or AccountScheduler(accounts)
+    # [新增] 已因连续登录失败而停用的账号不再启动工作线程
+    accounts = [account for account in accounts if not scheduler.is_disabled(account['phone'])]
+
+    print(f"\n[并行模式] 启动 {len(accounts)} 个账号工作线程，共 {len(bonds_to_scrape)} 个债券待处理。")
+    workers = []
+    for account in accounts:
+        worker = threading.Thread(
+            target=account_worker,
+            args=(account, bond_queue, progress, writer, scheduler),
+            name=f"worker-{account['phone']}",
+            daemon=True
+        )
+        worker.start()
+        workers.append(worker)
+        # 错开各账号的浏览器登录，避免同时拉起多个 Chrome
+        tracing.sleep(config.PARALLEL_LOGIN_STAGGER, 'login_stagger')
+
+    for worker in workers:
+        worker.join()
+
+    remaining = bond_queue.qsize()
+    print("\n\n" + "#"*60)
+    print("爬取任务结束。")
+    if remaining == 0:
+        print("恭喜！所有待处理债券已成功处理完毕。")
+    else:
+        print(f"任务中断。已处理 {progress['done']} / {progress['total']} 个债券，剩余 {remaining} 个。")
+        print("原因：所有账号均因连续登录失败而停用。")
+    print(f"账号状态: {scheduler.summary()}")
+    print("#"*60)
+
+def run_bonds(accounts: list, bonds_to_scrape: list, writer: database.DatabaseWriter, scheduler: AccountScheduler):
+    """[新增] 并行模式下每个账号一个工作线程，否则按原来的方式逐个账号轮换。"""
+    if config.PARALLEL_ACCOUNTS:
+        run_parallel_workers(accounts, bonds_to_scrape, writer, scheduler)
+    else:
+        run_sequential(accounts, bonds_to_scrape, writer, scheduler)
+
+def retry_failed_jobs(accounts: list, bonds_to_scrape: list, writer: database.DatabaseWriter,
+                      scheduler: AccountScheduler):
+    """
+    [新增] 有界的失败重试队列：主任务完成后，本次处理过的债券中有失败且将在 JOB_RETRY_WAIT_MAX 秒内
+    到期重试的，等待到期后再处理一轮。每个债券最多尝试 JOB_MAX_ATTEMPTS 次，等待时间按 JOB_RETRY_BACKOFF 翻倍，
+    更晚到期的留给下次运行。
+    与主任务共用同一个账号调度器，刚被限流的账号继续冷却，已停用的账号不会再被使用。
+    """
+    wanted = set(bonds_to_scrape)
+    round_num = 0
+    while True:
+        writer.flush()  # 确保上一轮的处理结果已写入 jobs 表
+        wait = database.next_job_retry_in(wanted)
+        if wait is None:
+            return
+        if wait > config.JOB_RETRY_WAIT_MAX:
+            print(f"\n[失败重试] 最早的重试在 {wait / 60:.0f} 分钟后到期，留给下次运行。")
+            return
+        if wait > 0:
+            print(f"\n[失败重试] {wait:.0f} 秒后重试失败的债券...")
+            tracing.sleep(wait, 'job_retry')
+        due = database.get_runnable_jobs(retry_only=True)
+        retry_bonds = [b for b in bonds_to_scrape if b in due]
+        if not retry_bonds:
+            return
+        if not scheduler.has_usable_accounts():
+            print("\n[失败重试] 所有账号均已停用，剩余的重试留给下次运行。")
+            return
+        round_num += 1
+        print(f"\n[失败重试] 第 {round_num} 轮，重试 {len(retry_bonds)} 个失败的债券。")
+        run_bonds(accounts, retry_bonds, writer, scheduler)
+
+        # 每处理一次，尝试次数加一、下次重试时间后移；一个都没有处理（如账号全部不可用）时不再空转
+        writer.flush()
+        still_due = database.get_runnable_jobs(retry_only=True)
+        if all(b in still_due for b in retry_bonds):
+            print("[失败重试] 本轮没有债券得到处理，停止重试。")
+            return
 
 def run_scraper_with_account_pool():
     """
     [优化版] 使用账号池执行爬虫，实现会话复用、防系统休眠。
     """
+    from wakepy import keep # [新增] 导入防休眠库（[修改] 延迟到运行时导入）
+
     # [已修正] 使用正确的 wakepy 模式 keep.running()。
     # 这个模式会阻止系统休眠，但允许屏幕关闭，更加节能。
     with keep.running():
@@ -66,14 +747,20 @@ def run_scraper_with_account_pool():
             print("缺少账号或债券列表，程序终止。")
             return
 
-        scraped_bonds_set = database.get_scraped_bonds()
-        if scraped_bonds_set:
-            original_count = len(all_bonds_from_excel)
-            bonds_to_scrape = [b for b in all_bonds_from_excel if b not in scraped_bonds_set]
-            skipped_count = original_count - len(bonds_to_scrape)
-            print(f"\n[断点续传] 已跳过 {skipped_count} 个已爬取过的债券。")
-        else:
+        # [修改] 列表中的债券先登记到 jobs 表，续跑时按任务状态查询待处理的债券，
+        # 已完成、确认无结果、没有公告以及尚未到重试时间的债券都会被跳过
+        database.sync_jobs(all_bonds_from_excel)
+        if config.REFRESH_MODE:
+            # [新增] 增量刷新模式下不跳过已爬取的债券，每个债券只获取比库中更新的公告
+            print("\n[增量刷新] 将检查列表中所有债券的新公告。")
             bonds_to_scrape = all_bonds_from_excel
+        else:
+            runnable = database.get_runnable_jobs()
+            bonds_to_scrape = [b for b in all_bonds_from_excel if b in runnable]
+            skipped_count = len(all_bonds_from_excel) - len(bonds_to_scrape)
+            if skipped_count:
+                counts = ', '.join(f"{status} {count}" for status, count in sorted(database.get_job_counts().items()))
+                print(f"\n[断点续传] 已跳过 {skipped_count} 个无需处理的债券（任务状态: {counts}）。")
 
         if config.TEST_MODE:
             print("\n" + "*"*25)
@@ -86,122 +773,24 @@ def run_scraper_with_account_pool():
             print("所有在列表中的债券均已爬取完毕。程序结束。")
             return
 
-        # --- 状态管理变量 ---
-        active_accounts = list(accounts)
-        bond_index = 0
-        account_index = 0
-        requests_this_account = 0
-        total_bonds = len(bonds_to_scrape)
-        current_scraper = None
-
-        # 主循环
-        while bond_index < total_bonds and active_accounts:
-            try:
-                # --- 检查并获取有效会话 ---
-                if current_scraper is None:
-                    current_account = active_accounts[account_index]
-                    print("\n" + "~"*50)
-                    print(f"当前无有效会话。正在使用账号 {current_account['phone']} ({account_index + 1}/{len(active_accounts)}) 登录...")
-                    
-                    auth_session = login_handler.get_authenticated_session(
-                        phone=current_account['phone'],
-                        password=current_account['password'],
-                        search_term=bonds_to_scrape[bond_index] 
-                    )
-
-                    if auth_session:
-                        current_scraper = scraper.Scraper(auth_session)
-                        requests_this_account = 0
-                        print("登录成功，已创建新的 Scraper 实例。")
-                        print("~"*50 + "\n")
-                    else:
-                        print(f"账号 {current_account['phone']} 登录失败，将从池中移除。")
-                        active_accounts.pop(account_index)
-                        if active_accounts:
-                            account_index %= len(active_accounts)
-                        continue
-
-                # --- 使用已有的会话进行爬取 ---
-                current_bond = bonds_to_scrape[bond_index]
-                print("\n" + "="*50)
-                print(f"进度: [{bond_index + 1}/{total_bonds}] | 账号: {active_accounts[account_index]['phone']} | 此账号请求数: {requests_this_account}")
-                print(f"目标: '{current_bond}'")
-                print("="*50)
-
-                bond_details = current_scraper.search_bond(current_bond)
-                if not bond_details:
-                    print(f"未能通过API找到 '{current_bond}' 的信息，跳过此债券。")
-                    bond_index += 1
-                    continue
-                
-                announcements = current_scraper.get_announcements(bond_details["code"])
-                if announcements is None:
-                    print(f"获取 '{current_bond}' 的公告失败，跳过此债券。")
-                    bond_index += 1
-                    continue
-
-                database.save_announcements(current_bond, bond_details["code"], bond_details["name"], announcements)
-
-                # --- 任务成功后的处理 ---
-                bond_index += 1
-                requests_this_account += 1
-
-                if requests_this_account >= config.REQUESTS_PER_ACCOUNT:
-                    print(f"\n--- 账号 {active_accounts[account_index]['phone']} 已达到 {config.REQUESTS_PER_ACCOUNT} 次请求上限，准备切换。 ---")
-                    current_scraper = None
-                    account_index = (account_index + 1) % len(active_accounts)
-                    time.sleep(5)
-                else:
-                    sleep_duration = random.uniform(*config.DELAY_BETWEEN_BONDS)
-                    print(f"任务完成，暂停 {sleep_duration:.2f} 秒...")
-                    time.sleep(sleep_duration)
-
-            # [新增] 捕获 Token 过期异常
-            except scraper.TokenExpiredException as e:
-                print(f"\n!!!!!!!!!! 会话失效 !!!!!!!!!!")
-                print(f"账号 {active_accounts[account_index]['phone']} 的 Token 已过期: {e}")
-                print(f"将销毁当前会话，并使用同一账号尝试重新登录，重试任务 '{bonds_to_scrape[bond_index]}'")
-                print(f"!!!!!!!!!!!!!!!!!!!!!!!!!!!!\n")
-                
-                current_scraper = None # 关键：销毁当前 Scraper 实例
-                # 注意：我们不增加 bond_index，以便重试当前债券
-                # 注意：我们不切换账号，因为当前账号本身没问题
-                
-                time.sleep(5) # 稍作等待再重新登录
-
-            except scraper.RateLimitException as e:
-                print(f"\n!!!!!!!!!! 警告 !!!!!!!!!!")
-                print(f"账号 {active_accounts[account_index]['phone']} 已被服务器限制: {e}")
-                print(f"将此账号从当前任务池中移除。")
-                print(f"!!!!!!!!!!!!!!!!!!!!!!!!!!!!\n")
-                
-                current_scraper = None
-                active_accounts.pop(account_index)
-                
-                if active_accounts:
-                    account_index %= len(active_accounts)
-                    print(f"剩余 {len(active_accounts)} 个可用账号。将用下一个账号重试 '{bonds_to_scrape[bond_index]}'")
-                else:
-                    print("所有账号均已失效！")
-                
-                time.sleep(10)
-
-            except Exception as e:
-                print(f"\n处理 '{bonds_to_scrape[bond_index]}' 时发生未知严重错误: {e}")
-                print("为防止卡死，将跳过此债券并继续。")
-                current_scraper = None
-                bond_index += 1
-                time.sleep(5)
-
-        print("\n\n" + "#"*60)
-        print("爬取任务结束。")
-        if bond_index == total_bonds:
-            print("恭喜！所有待处理债券已成功处理完毕。")
-        else:
-            print(f"任务中断。已处理 {bond_index} / {total_bonds} 个债券。")
-            if not active_accounts:
-                print("原因：所有账号均已耗尽或被限制。")
-        print("#"*60)
+        # [新增] 按配置开启指标端点 / 定期写入指标文件，结束时写入最终结果
+        metrics.start_exporters()
+        # [新增] 按配置记录各阶段耗时 (Chrome trace) 与采样调用栈 (火焰图)
+        if config.TRACE_ENABLED:
+            tracing.start()
+        profiler = tracing.SamplingProfiler().start() if config.PROFILE_ENABLED else None
+        try:
+            # [新增] 所有结果经由同一个后台写入线程批量落盘
+            with database.DatabaseWriter() as writer:
+                # [修改] 主任务与失败重试共用一个账号调度器，保留账号的健康度、冷却与停用状态
+                scheduler = AccountScheduler(accounts)
+                run_bonds(accounts, list(bonds_to_scrape), writer, scheduler)
+                retry_failed_jobs(accounts, bonds_to_scrape, writer, scheduler)
+        finally:
+            metrics.stop_exporters()
+            tracing.stop()
+            if profiler:
+                profiler.stop()
 
     # with 语句块结束，程序会自动恢复系统的正常休眠策略
     print("\n--- [系统] 防休眠模式已解除 ---")
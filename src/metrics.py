@@ -0,0 +1,246 @@
+# E:\BaiduSyncdisk\数据库\1-城投公司\QYYJTScraper\src\metrics.py
+
+import bisect
+import datetime
+import json
+import os
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from . import config
+
+# 所有指标共用一把锁：每次记录只是几次字典与整数操作，竞争可以忽略
+_lock = threading.Lock()
+_registry = {}
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+def _label_key(labels: dict):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """只增不减的计数器，按标签组合分别计数。"""
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        if not config.METRICS_ENABLED:
+            return
+        key = _label_key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        """:return: [(样本名, 标签 key, 附加标签, 值)]"""
+        return [(self.name, key, (), value) for key, value in self._values.items()]
+
+    def to_json(self):
+        return [{'labels': dict(key), 'value': value} for key, value in self._values.items()]
+
+class Gauge:
+    """
+    可增可减的当前值。除了直接 set，也可以用 set_function 注册一个回调，在导出时才读取（如队列长度）。
+    """
+    kind = 'gauge'
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._functions = {}
+
+    def set(self, value, **labels):
+        if not config.METRICS_ENABLED:
+            return
+        with _lock:
+            self._values[_label_key(labels)] = value
+
+    def set_function(self, function, **labels):
+        """注册一个无参回调作为该标签组合的值；传入 None 取消注册。"""
+        key = _label_key(labels)
+        with _lock:
+            if function is None:
+                self._functions.pop(key, None)
+            else:
+                self._functions[key] = function
+
+    def _current(self):
+        values = dict(self._values)
+        for key, function in self._functions.items():
+            try:
+                values[key] = function()
+            except Exception:
+                continue
+        return values
+
+    def samples(self):
+        return [(self.name, key, (), value) for key, value in self._current().items()]
+
+    def to_json(self):
+        return [{'labels': dict(key), 'value': value} for key, value in self._current().items()]
+
+class Histogram:
+    """分桶统计耗时等数值的分布，导出格式与 Prometheus 的 histogram 相同（累计桶 + _sum + _count）。"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # 标签 key -> [各桶计数（不累计）, 总和, 总数]
+
+    def observe(self, value, **labels):
+        if not config.METRICS_ENABLED:
+            return
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        samples = []
+        for key, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                samples.append((self.name + '_bucket', key, (('le', bound),), cumulative))
+            samples.append((self.name + '_sum', key, (), total))
+            samples.append((self.name + '_count', key, (), count))
+        return samples
+
+    def to_json(self):
+        result = []
+        for key, (counts, total, count) in self._values.items():
+            cumulative, buckets = 0, {}
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                buckets[str(bound)] = cumulative
+            result.append({'labels': dict(key), 'count': count, 'sum': round(total, 6), 'buckets': buckets})
+        return result
+
+def _register(metric):
+    _registry[metric.name] = metric
+    return metric
+
+# --- 爬虫使用的指标 ---
+REQUESTS = _register(Counter(
+    'qyyjt_requests_total', '接口请求数，按接口 (endpoint)、账号 (account) 与结果 (result: ok / rate_limited / token_expired / error) 区分'))
+REQUEST_SECONDS = _register(Histogram(
+    'qyyjt_request_seconds', '接口请求耗时（秒），按接口与账号区分'))
+PAGES = _register(Counter('qyyjt_pages_total', '成功获取的公告页数'))
+NOTICES = _register(Counter('qyyjt_notices_total', '获取到的公告条数'))
+LOGINS = _register(Counter('qyyjt_logins_total', '获取会话的次数，按来源 (source: cache / browser) 与结果区分'))
+LOGIN_SECONDS = _register(Histogram(
+    'qyyjt_login_seconds', '浏览器登录耗时（秒）', buckets=(5, 10, 20, 30, 45, 60, 90, 120, 180)))
+BONDS = _register(Counter('qyyjt_bonds_total', '处理完毕的债券数，按结果 (result: done / not_found / empty / failed) 区分'))
+DB_ROWS = _register(Counter('qyyjt_db_rows_total', '写入的文件记录数，按结果 (result: inserted / duplicate) 区分'))
+DB_COMMIT_SECONDS = _register(Histogram(
+    'qyyjt_db_commit_seconds', '后台写入线程每个批次（一个事务）的耗时（秒）', buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)))
+DB_QUEUE_DEPTH = _register(Gauge('qyyjt_db_queue_depth', '后台写入队列中等待落盘的项数'))
+
+def render_prometheus() -> str:
+    """以 Prometheus 文本格式导出全部指标。"""
+    lines = []
+    with _lock:
+        for metric in _registry.values():
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for sample_name, key, extra, value in metric.samples():
+                lines.append(f'{sample_name}{_format_labels(key, extra)} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+def snapshot() -> dict:
+    """以字典形式导出全部指标，用于写入 JSON 文件。"""
+    with _lock:
+        metrics = {name: {'type': metric.kind, 'help': metric.help, 'samples': metric.to_json()}
+                   for name, metric in _registry.items()}
+    return {'updated_at': datetime.datetime.now().isoformat(sep=' ', timespec='seconds'), 'metrics': metrics}
+
+def flush_json(path: str = None):
+    """把当前指标写入 JSON 文件（先写临时文件再替换，读取方不会读到半个文件）。"""
+    path = path or config.METRICS_JSON_PATH
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(snapshot(), f, ensure_ascii=False, indent=2)
+    os.replace(path + '.tmp', path)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            return self.send_error(404)
+        body = render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+_server = None
+_flusher = None
+_stop_event = threading.Event()
+
+def _flush_periodically():
+    while not _stop_event.wait(config.METRICS_FLUSH_INTERVAL):
+        try:
+            flush_json()
+        except OSError as e:
+            print(f"[指标] 写入 {config.METRICS_JSON_PATH} 失败: {e}")
+
+def start_exporters():
+    """按配置启动 Prometheus 文本格式的 HTTP 端点和/或定期写入的 JSON 文件。"""
+    global _server, _flusher
+    if not config.METRICS_ENABLED:
+        return
+    if config.METRICS_HTTP_PORT and _server is None:
+        try:
+            _server = ThreadingHTTPServer((config.METRICS_HTTP_HOST, config.METRICS_HTTP_PORT), _MetricsHandler)
+        except OSError as e:
+            print(f"[指标] 无法在端口 {config.METRICS_HTTP_PORT} 启动指标端点: {e}")
+        else:
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+            print(f"[指标] Prometheus 指标端点: http://{config.METRICS_HTTP_HOST}:{config.METRICS_HTTP_PORT}/metrics")
+    if config.METRICS_JSON_PATH and _flusher is None:
+        _stop_event.clear()
+        _flusher = threading.Thread(target=_flush_periodically, name="metrics-flush", daemon=True)
+        _flusher.start()
+        print(f"[指标] 每 {config.METRICS_FLUSH_INTERVAL} 秒写入一次: {config.METRICS_JSON_PATH}")
+
+def stop_exporters():
+    """停止导出，并在配置了 JSON 文件时写入最终结果。"""
+    global _server, _flusher
+    if _flusher is not None:
+        _stop_event.set()
+        _flusher.join()
+        _flusher = None
+    if config.METRICS_ENABLED and config.METRICS_JSON_PATH:
+        flush_json()
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+        _server = None
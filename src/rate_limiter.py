@@ -0,0 +1,87 @@
+# E:\BaiduSyncdisk\数据库\1-城投公司\QYYJTScraper\src\rate_limiter.py
+
+import time
+import asyncio
+import threading
+from . import config
+
+class AdaptiveRateLimiter:
+    """
+    按账号的自适应令牌桶限速器 (AIMD)。
+    - 每次请求前取一个令牌，令牌按当前速率 rate（次/秒）补充，桶容量为 burst；
+    - 响应正常且不慢时，速率线性增加 increase_step（加性增）；
+    - 遇到 206 "请求过多" 或响应时间超过 slow_threshold 时，速率乘以 decrease_factor（乘性减）。
+    这样每个账号都会逐渐逼近服务器能容忍的最高速率，而不是使用固定的保守延迟。
+    线程安全；同步代码用 acquire()，协程用 acquire_async()。
+    """
+    def __init__(self, initial_rate: float = None, min_rate: float = None, max_rate: float = None,
+                 burst: float = None, increase_step: float = None, decrease_factor: float = None,
+                 slow_threshold: float = None):
+        self.rate = initial_rate or config.RATE_LIMIT_INITIAL_RATE
+        self.min_rate = min_rate or config.RATE_LIMIT_MIN_RATE
+        self.max_rate = max_rate or config.RATE_LIMIT_MAX_RATE
+        self.burst = burst or config.RATE_LIMIT_BURST
+        self.increase_step = increase_step or config.RATE_LIMIT_INCREASE_STEP
+        self.decrease_factor = decrease_factor or config.RATE_LIMIT_DECREASE_FACTOR
+        self.slow_threshold = slow_threshold or config.RATE_LIMIT_SLOW_RESPONSE
+        self._tokens = self.burst
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def reserve(self) -> float:
+        """预支一个令牌，返回调用方在发出请求前需要等待的秒数。"""
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self):
+        """阻塞直到可以发出下一个请求。"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """acquire 的协程版本。"""
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def _decrease(self):
+        self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+
+    def on_success(self, latency: float):
+        """报告一次正常的响应及其耗时（秒）。"""
+        with self._lock:
+            self._refill()
+            if latency > self.slow_threshold:
+                self._decrease()
+            else:
+                self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def on_rate_limited(self):
+        """报告一次 206 限流：速率减半，并清空桶中积攒的令牌，让后续请求先冷却。"""
+        with self._lock:
+            self._refill()
+            self._decrease()
+            self._tokens = min(self._tokens, 0.0)
+            print(f"    [限速器] 收到限流响应，速率下调至 {self.rate:.2f} 次/秒。")
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def get_limiter(account_key: str) -> AdaptiveRateLimiter:
+    """获取账号对应的限速器；同一账号的所有 Scraper、工作线程和协程共享同一个实例。"""
+    with _limiters_lock:
+        limiter = _limiters.get(account_key)
+        if limiter is None:
+            limiter = _limiters[account_key] = AdaptiveRateLimiter()
+        return limiter
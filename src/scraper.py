@@ -1,11 +1,27 @@
 # E:\BaiduSyncdisk\数据库\1-城投公司\QYYJTScraper\src\scraper.py
 
 import requests
+from requests.adapters import HTTPAdapter # [新增] 连接池与传输层重试
+from urllib3.util import Retry, make_headers
+import asyncio   # [新增]
 import json
 import time   # [新增]
 import random # [新增]
 from urllib.parse import quote
-from . import config
+from . import config, metrics # [新增] 运行指标
+from . import tracing # [新增] 性能追踪
+from .rate_limiter import get_limiter # [新增] 按账号的自适应限速
+
+# [新增] aiohttp 只有异步引擎 (ASYNC_BONDS_IN_FLIGHT > 1) 才用到，在创建 AsyncScraper 时才导入，
+# 默认的同步模式启动时不必为加载它付出约 0.2 秒
+aiohttp = None
+
+def _import_aiohttp():
+    global aiohttp
+    if aiohttp is None:
+        import aiohttp as module
+        aiohttp = module
+    return aiohttp
 
 # [新增] 自定义异常，用于通知主程序账号已被限制
 class RateLimitException(Exception):
@@ -15,8 +31,18 @@ class RateLimitException(Exception):
 class TokenExpiredException(Exception):
     pass
 
-class Scraper:
-    def __init__(self, auth_session: dict):
+# [新增] lookup_bond 返回的搜索状态：找到 / 确定不存在（接口正常但无结果）/ 请求或业务错误
+SEARCH_FOUND = "found"
+SEARCH_NOT_FOUND = "not_found"
+SEARCH_FAILED = "failed"
+
+# [新增] 自定义异常，表示逐页获取公告时某一页失败（网络错误、业务错误或非 JSON 响应）
+class PageFetchException(Exception):
+    pass
+
+class _ScraperBase:
+    """ [新增] 同步 Scraper 与异步 AsyncScraper 共用的部分：认证头、请求参数构造与响应解析。 """
+    def __init__(self, auth_session: dict, page_size: int = None):
         # ... (构造函数不变)
         required_keys = ['token_name', 'token_value', 'user_id', 'cookies']
         if not all(key in auth_session for key in required_keys):
@@ -26,6 +52,10 @@ class Scraper:
         self.token_value = auth_session['token_value']
         self.user_id = auth_session['user_id']
         self.cookies = auth_session['cookies']
+        # [新增] 同一账号（用户ID）的所有 Scraper 共享一个自适应限速器；关闭时沿用固定随机延迟
+        self.rate_limiter = get_limiter(self.user_id) if config.ADAPTIVE_RATE_LIMIT else None
+        # [新增] 每次请求公告列表的条数，默认取 config.NOTICE_PAGE_SIZE（可由探测结果覆盖）
+        self.page_size = page_size or config.NOTICE_PAGE_SIZE
         
         self.base_headers = {
             'accept': 'application/json, text/plain, */*',
@@ -51,10 +81,27 @@ class Scraper:
         if return_code == 206 and "请求过多" in info:
             raise RateLimitException(f"账号被限制 (Code: 206): {info}")
 
-    def search_bond(self, search_term: str):
-        # ... (前半部分不变)
-        print(f"\n正在搜索: '{search_term}'...")
-        
+    def _record_request(self, url: str, latency: float, result: str):
+        """[新增] 记录一次接口请求的结果与耗时，按接口和账号区分。"""
+        endpoint = 'search' if url == config.SEARCH_API_URL else 'notice'
+        metrics.REQUESTS.inc(endpoint=endpoint, account=self.user_id, result=result)
+        metrics.REQUEST_SECONDS.observe(latency, endpoint=endpoint, account=self.user_id)
+
+    def _handle_rate_limited(self, attempt: int):
+        """
+        [新增] 收到 206 后通知限速器降速。返回 True 表示可以在降速后重试本次请求，
+        False 表示不再重试（未启用自适应限速，或已用完 RATE_LIMIT_RETRIES 次重试）。
+        """
+        if self.rate_limiter is None:
+            return False
+        self.rate_limiter.on_rate_limited()
+        if attempt >= config.RATE_LIMIT_RETRIES:
+            return False
+        print(f"    被限流，降速后重试 ({attempt + 1}/{config.RATE_LIMIT_RETRIES})...")
+        return True
+
+    def _build_search_request(self, search_term: str):
+        """ [新增] 构造搜索接口的请求参数，以及需要在 base_headers 之上额外附加的请求头。 """
         params = {
             'pagesize': 10,
             'skip': 0,
@@ -63,113 +110,466 @@ class Scraper:
             'isRelationSearch': 0
         }
         
-        headers = self.base_headers.copy()
         encoded_search_term = quote(search_term)
-        headers['referer'] = f'https://www.qyyjt.cn/search?text={encoded_search_term}'
+        headers = {'referer': f'https://www.qyyjt.cn/search?text={encoded_search_term}'}
+        return params, headers
+
+    def _parse_search_response(self, search_term: str, data: dict, raw_text: str):
+        """
+        [新增] 解析搜索接口的 JSON 响应。
+        :return: (搜索状态, {"code", "name"})，未找到或出错时第二项为 None。
+        """
+        # [修改] 在处理数据前检查是否被限流或Token过期
+        self._check_response_for_errors(data)
+
+        if data.get('returncode') == 0 and data.get('data') and data['data'].get('list'):
+            # ... (后续逻辑不变)
+            bond_info = data['data']['list'][0]
+            bond_code = bond_info.get('code')
+            bond_name = bond_info.get('name')
+            print(f"搜索成功！找到债券 '{bond_name}'，Code: {bond_code}")
+            return SEARCH_FOUND, {"code": bond_code, "name": bond_name}
+        elif data.get('returncode') == 0:
+            print(f"搜索 '{search_term}' 成功，但未返回任何结果。")
+            return SEARCH_NOT_FOUND, None
+        else:
+            error_msg = data.get('info', data.get('message', '未知错误'))
+            print(f"搜索API返回业务错误。Return Code: {data.get('returncode')}, Info: {error_msg}")
+            print(f"搜索API原始响应: {raw_text}")
+            return SEARCH_FAILED, None
+
+    def _build_notice_request(self, bond_code: str, skip: int, size: int):
+        """ [新增] 构造公告列表接口的表单参数，以及需要在 base_headers 之上额外附加的请求头。 """
+        payload = {
+            'code': bond_code,
+            'type': 'co',
+            'skip': skip,
+            'size': size,
+            'oneLevelItemCode': '50',
+            'f9Below': 'true'
+        }
+        
+        headers = {
+            'content-type': 'application/x-www-form-urlencoded;charset=UTF-8',
+            'origin': 'https://www.qyyjt.cn',
+            'referer': f'https://www.qyyjt.cn/bond/f9?code={bond_code}'
+        }
+        return payload, headers
+
+
+class Scraper(_ScraperBase):
+    def __init__(self, auth_session: dict, page_size: int = None):
+        super().__init__(auth_session, page_size)
+        # [新增] 每个 Scraper（即每个账号）持有一个长连接会话：请求头和 Cookie 只绑定一次，
+        # 连接在各页之间复用，不再每次请求都重新建立 TCP+TLS 连接
+        self.session = requests.Session()
+        self.session.headers.update(self.base_headers)
+        # 只声明本机能解压的编码（安装了 brotli 时会自动包含 br）
+        self.session.headers.update(make_headers(accept_encoding=True))
+        self.session.cookies.update(self.cookies)
+
+        # 连接被重置、超时或服务器返回 5xx 时按指数退避自动重试，避免一次抖动就跳过整个债券。
+        # 两个接口都是只读查询，因此 POST 也允许重试。
+        retry = Retry(
+            total=config.HTTP_MAX_RETRIES,
+            backoff_factor=config.HTTP_RETRY_BACKOFF,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=frozenset(['GET', 'POST']),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config.HTTP_POOL_SIZE, max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _request_json(self, method: str, url: str, **kwargs):
+        """
+        [新增] 发送请求并解析 JSON，同时把响应情况反馈给限速器。
+        启用自适应限速时，每次请求前先取令牌；遇到 206 先降速重试，仍被限流才抛出 RateLimitException。
+        :return: (解析后的 JSON, 原始响应文本)
+        """
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                with tracing.span('rate_limit_wait'):
+                    self.rate_limiter.acquire()
+            started = time.monotonic()
+            try:
+                with tracing.span('http', method=method):
+                    response = self.session.request(method, url, timeout=config.REQUEST_TIMEOUT, **kwargs)
+                    response.raise_for_status()
+                with tracing.span('parse_json'):
+                    data = response.json()
+            except requests.RequestException:
+                self._record_request(url, time.monotonic() - started, 'error')
+                raise
+            latency = time.monotonic() - started
+            try:
+                self._check_response_for_errors(data)
+            except RateLimitException:
+                self._record_request(url, latency, 'rate_limited')
+                if not self._handle_rate_limited(attempt):
+                    raise
+                attempt += 1
+                continue
+            except TokenExpiredException:
+                self._record_request(url, latency, 'token_expired')
+                raise
+            self._record_request(url, latency, 'ok' if data.get('returncode') == 0 else 'error')
+            if self.rate_limiter is not None:
+                self.rate_limiter.on_success(latency)
+            return data, response.text
+
+    def search_bond(self, search_term: str):
+        """搜索债券，返回 {"code", "name"}，未找到或失败返回 None。"""
+        return self.lookup_bond(search_term)[1]
+
+    def lookup_bond(self, search_term: str):
+        """
+        [新增] 与 search_bond 相同，但额外区分"确定不存在"与"请求失败"，便于缓存否定结果。
+        :return: (SEARCH_FOUND / SEARCH_NOT_FOUND / SEARCH_FAILED, {"code", "name"} 或 None)
+        """
+        print(f"\n正在搜索: '{search_term}'...")
+        
+        params, headers = self._build_search_request(search_term)
 
         try:
-            response = requests.get(
-                config.SEARCH_API_URL, 
-                headers=headers, 
-                params=params, 
-                cookies=self.cookies
-            )
-            response.raise_for_status()
-            data = response.json()
-
-            # [修改] 在处理数据前检查是否被限流或Token过期
-            self._check_response_for_errors(data)
-
-            if data.get('returncode') == 0 and data.get('data') and data['data'].get('list'):
-                # ... (后续逻辑不变)
-                if not data['data']['list']:
-                    print(f"搜索 '{search_term}' 成功，但未返回任何结果。")
-                    return None
-                
-                bond_info = data['data']['list'][0]
-                bond_code = bond_info.get('code')
-                bond_name = bond_info.get('name')
-                print(f"搜索成功！找到债券 '{bond_name}'，Code: {bond_code}")
-                return {"code": bond_code, "name": bond_name}
-            else:
-                error_msg = data.get('info', data.get('message', '未知错误'))
-                print(f"搜索API返回成功，但未找到结果或有业务错误。Return Code: {data.get('returncode')}, Info: {error_msg}")
-                print(f"搜索API原始响应: {response.text}")
-                return None
+            with tracing.span('search', term=search_term):
+                data, raw_text = self._request_json('GET', config.SEARCH_API_URL, headers=headers, params=params)
+            return self._parse_search_response(search_term, data, raw_text)
         except requests.RequestException as e:
             print(f"搜索请求失败: {e}")
-            return None
+            return SEARCH_FAILED, None
 
-    def get_announcements(self, bond_code: str):
-        # ... (前半部分不变)
-        print(f"正在为 Code '{bond_code}' 获取所有公告列表...")
-        
-        all_announcements = []
-        page_num = 1
-        page_size = 10 
-        current_skip = 0
+    def iter_announcement_pages(self, bond_code: str, start_skip: int = 0):
+        """
+        [新增] 逐页获取公告的生成器：每成功获取一页就立即 yield，调用方可以边取边存，
+        不必把全部公告都攒在内存里。
+        :param bond_code: 债券的唯一代码
+        :param start_skip: 起始偏移量，用于从上次中断的页继续
+        :yield: (本页的 skip, 本页公告列表, 下一页的 skip)
+        :raises PageFetchException: 某一页获取失败时抛出，之前已 yield 的页不受影响
+        """
+        page_size = self.page_size
+        current_skip = start_skip
+        page_num = current_skip // page_size + 1
+        fetched_count = 0
 
         while True:
             print(f"  - 正在获取第 {page_num} 页数据 (skip={current_skip})...")
 
-            payload = {
-                'code': bond_code,
-                'type': 'co',
-                'skip': current_skip,
-                'size': page_size,
-                'oneLevelItemCode': '50',
-                'f9Below': 'true'
-            }
-            
-            headers = self.base_headers.copy()
-            headers['content-type'] = 'application/x-www-form-urlencoded;charset=UTF-8'
-            headers['origin'] = 'https://www.qyyjt.cn'
-            headers['referer'] = f'https://www.qyyjt.cn/bond/f9?code={bond_code}'
+            payload, headers = self._build_notice_request(bond_code, current_skip, page_size)
 
             try:
-                # [新增] 每次请求前随机暂停一下
-                sleep_time = random.uniform(*config.DELAY_BETWEEN_PAGES)
-                # print(f"    (暂停 {sleep_time:.2f} 秒...)") # 如果你想看详细日志可以取消注释
-                time.sleep(sleep_time)
+                # [新增] 每次请求前随机暂停一下（启用自适应限速时由限速器控制节奏）
+                if self.rate_limiter is None:
+                    sleep_time = random.uniform(*config.DELAY_BETWEEN_PAGES)
+                    # print(f"    (暂停 {sleep_time:.2f} 秒...)") # 如果你想看详细日志可以取消注释
+                    tracing.sleep(sleep_time, 'page_delay')
                 
-                response = requests.post(
-                    config.NOTICE_API_URL, 
-                    headers=headers, 
-                    data=payload, 
-                    cookies=self.cookies
-                )
-                response.raise_for_status()
-                data = response.json()
-
-                # [修改] 检查是否被限流或Token过期
-                self._check_response_for_errors(data)
+                # [修改] 限流与 Token 过期的检查在 _request_json 中完成
+                # [新增] span 只包住请求本身，不包含 yield 之后调用方处理本页（如入库）的时间
+                with tracing.span('page', bond=bond_code, skip=current_skip):
+                    data, raw_text = self._request_json('POST', config.NOTICE_API_URL, headers=headers, data=payload)
+            except requests.RequestException as e:
+                # requests 的 JSONDecodeError 也是 RequestException 的子类
+                print(f"获取第 {page_num} 页公告请求失败: {e}")
+                raise PageFetchException(f"第 {page_num} 页 (skip={current_skip}) 请求失败: {e}")
 
-                if data.get('returncode') == 0:
-                    current_page_announcements = data.get('data', [])
-                    
-                    if not current_page_announcements:
-                        print("  - 已获取所有页面，没有更多公告了。")
-                        break 
+            if data.get('returncode') != 0:
+                error_info = data.get('info', '没有具体的错误信息。')
+                print(f"获取第 {page_num} 页公告失败。服务器返回码: {data.get('returncode')}, 信息: {error_info}")
+                print(f"原始响应: {raw_text}")
+                raise PageFetchException(f"第 {page_num} 页 (skip={current_skip}) 返回码 {data.get('returncode')}: {error_info}")
 
-                    all_announcements.extend(current_page_announcements)
-                    print(f"  - 成功获取 {len(current_page_announcements)} 条公告，总数: {len(all_announcements)}。")
+            current_page_announcements = data.get('data', [])
+            if not current_page_announcements:
+                print("  - 已获取所有页面，没有更多公告了。")
+                return
 
-                    current_skip += page_size
-                    page_num += 1
+            fetched_count += len(current_page_announcements)
+            print(f"  - 成功获取 {len(current_page_announcements)} 条公告，本次累计: {fetched_count}。")
+            metrics.PAGES.inc()
+            metrics.NOTICES.inc(len(current_page_announcements))
 
-                else:
-                    error_info = data.get('info', '没有具体的错误信息。')
-                    print(f"获取第 {page_num} 页公告失败。服务器返回码: {data.get('returncode')}, 信息: {error_info}")
-                    print(f"原始响应: {response.text}")
-                    return None 
+            # [修改] 按实际返回的条数前进，服务器返回的条数少于请求的 size 时也不会漏掉公告
+            next_skip = current_skip + len(current_page_announcements)
+            yield current_skip, current_page_announcements, next_skip
+            current_skip = next_skip
+            page_num += 1
 
+    def probe_page_size(self, bond_code: str, candidates=None):
+        """
+        [新增] 探测公告接口可接受的最大分页大小：用一只债券的第一页依次尝试更大的 size，
+        直到服务器报错或返回的条数少于请求的条数。
+        返回条数不足时，再请求紧随其后的一页加以区分：后面还有公告说明服务器对 size 设了上限，
+        否则只是这只债券的公告不够多，无法判断更大的 size 是否可用。
+        :param bond_code: 用于探测的债券 code（公告越多，结论越可靠）
+        :param candidates: 依次尝试的分页大小，默认取 config.NOTICE_PAGE_SIZE_CANDIDATES
+        :return: (可用的最大分页大小, 结论是否确定)；结论不确定时调用方不应缓存结果
+        """
+        accepted = self.page_size
+        for size in sorted(candidates or config.NOTICE_PAGE_SIZE_CANDIDATES):
+            if size <= accepted:
+                continue
+            print(f"  - [分页探测] 尝试 size={size}...")
+            try:
+                payload, headers = self._build_notice_request(bond_code, 0, size)
+                data, _ = self._request_json('POST', config.NOTICE_API_URL, headers=headers, data=payload)
+                if data.get('returncode') != 0:
+                    print(f"  - [分页探测] size={size} 被拒绝 (返回码 {data.get('returncode')})。")
+                    return accepted, True
+                items = data.get('data') or []
+                if len(items) == size:
+                    accepted = size
+                    continue
+                if not items:
+                    return accepted, False
+
+                payload, headers = self._build_notice_request(bond_code, len(items), size)
+                data, _ = self._request_json('POST', config.NOTICE_API_URL, headers=headers, data=payload)
             except requests.RequestException as e:
-                print(f"获取第 {page_num} 页公告请求失败: {e}")
-                return None
-            except json.JSONDecodeError:
-                print(f"服务器在第 {page_num} 页返回的不是有效的JSON格式。")
-                print(f"原始响应内容: {response.text}")
-                return None
+                print(f"  - [分页探测] 请求失败: {e}")
+                return accepted, False
+            if data.get('returncode') == 0 and data.get('data'):
+                print(f"  - [分页探测] 服务器每页最多返回 {len(items)} 条。")
+                return max(accepted, len(items)), True
+            return accepted, False
+        return accepted, True
+
+    def get_announcements(self, bond_code: str):
+        """
+        获取债券的全部公告并一次性返回，失败返回 None。
+        [修改] 基于 iter_announcement_pages 实现；需要边取边存或断点续页时请直接使用后者。
+        """
+        print(f"正在为 Code '{bond_code}' 获取所有公告列表...")
+        
+        all_announcements = []
+        try:
+            for _, page_announcements, _ in self.iter_announcement_pages(bond_code):
+                all_announcements.extend(page_announcements)
+        except PageFetchException:
+            return None
         
         print(f"\n公告获取完成！共获取 {len(all_announcements)} 条公告信息。")
         return all_announcements
+
+
+class AsyncScraper(_ScraperBase):
+    """
+    [新增] 基于 asyncio + aiohttp 的异步爬取引擎。
+    search_bond / get_announcements 与 Scraper 的约定相同（失败返回 None，被限流或 Token 过期时
+    抛出 RateLimitException / TokenExpiredException），只是它们是协程，同一账号下可以有多个债券同时在途。
+    需要在 `async with AsyncScraper(...) as s:` 中使用，以便复用同一个连接池。
+    """
+    def __init__(self, auth_session: dict, max_concurrency: int = None, min_request_interval: float = None,
+                 page_size: int = None):
+        super().__init__(auth_session, page_size)
+        _import_aiohttp()  # 之后的 except 子句会引用模块级的 aiohttp
+        self.max_concurrency = max_concurrency or config.ASYNC_BONDS_IN_FLIGHT
+        if min_request_interval is None:
+            min_request_interval = config.ASYNC_MIN_REQUEST_INTERVAL
+        self.min_request_interval = min_request_interval
+        self._session = None
+        self._pace_lock = None
+        self._next_request_at = 0.0
+
+    async def __aenter__(self):
+        self._session = aiohttp.ClientSession(
+            headers=self.base_headers,
+            cookies=self.cookies,
+            connector=aiohttp.TCPConnector(limit=config.HTTP_POOL_SIZE),
+            timeout=aiohttp.ClientTimeout(total=config.REQUEST_TIMEOUT)
+        )
+        # asyncio.Lock 需要在事件循环内创建
+        self._pace_lock = asyncio.Lock()
+        self._next_request_at = 0.0
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._session.close()
+        self._session = None
+
+    async def _pace(self, jitter: bool = False):
+        """
+        同一账号下所有在途请求共享的节奏控制：任意两次请求之间至少间隔 min_request_interval 秒，
+        这样并发只会填满等待时间，而不会放大账号的请求速率。
+        :param jitter: 为 True 时先按 DELAY_BETWEEN_PAGES 随机暂停（与同步引擎翻页时的行为一致）
+        """
+        if jitter:
+            with tracing.span('sleep.page_delay'):
+                await asyncio.sleep(random.uniform(*config.DELAY_BETWEEN_PAGES))
+        with tracing.span('rate_limit_wait'):
+            async with self._pace_lock:
+                loop = asyncio.get_running_loop()
+                wait = self._next_request_at - loop.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                self._next_request_at = loop.time() + self.min_request_interval
+
+    async def _fetch_text(self, method: str, url: str, **kwargs):
+        """
+        [新增] 发送请求并返回响应文本。与 Scraper 的传输层重试策略一致：
+        连接异常、超时或 5xx 时按 HTTP_RETRY_BACKOFF 指数退避，最多重试 HTTP_MAX_RETRIES 次。
+        """
+        for attempt in range(config.HTTP_MAX_RETRIES + 1):
+            retries_left = attempt < config.HTTP_MAX_RETRIES
+            try:
+                async with self._session.request(method, url, **kwargs) as response:
+                    if response.status >= 500 and retries_left:
+                        print(f"    服务器返回 {response.status}，准备重试 ({attempt + 1}/{config.HTTP_MAX_RETRIES})...")
+                    else:
+                        response.raise_for_status()
+                        return await response.text()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if not retries_left:
+                    raise
+                print(f"    连接异常: {e}，准备重试 ({attempt + 1}/{config.HTTP_MAX_RETRIES})...")
+            await asyncio.sleep(config.HTTP_RETRY_BACKOFF * (2 ** attempt))
+
+    async def _request_json(self, method: str, url: str, jitter: bool = False, **kwargs):
+        """
+        [新增] Scraper._request_json 的异步版本。未启用自适应限速时沿用 _pace 的固定节奏控制。
+        :return: (解析后的 JSON, 原始响应文本)
+        """
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                with tracing.span('rate_limit_wait'):
+                    await self.rate_limiter.acquire_async()
+            else:
+                await self._pace(jitter=jitter)
+            started = loop.time()
+            try:
+                with tracing.span('http', method=method):
+                    raw_text = await self._fetch_text(method, url, **kwargs)
+                with tracing.span('parse_json'):
+                    data = json.loads(raw_text)
+            except (aiohttp.ClientError, asyncio.TimeoutError, json.JSONDecodeError):
+                self._record_request(url, loop.time() - started, 'error')
+                raise
+            latency = loop.time() - started
+            try:
+                self._check_response_for_errors(data)
+            except RateLimitException:
+                self._record_request(url, latency, 'rate_limited')
+                if not self._handle_rate_limited(attempt):
+                    raise
+                attempt += 1
+                continue
+            except TokenExpiredException:
+                self._record_request(url, latency, 'token_expired')
+                raise
+            self._record_request(url, latency, 'ok' if data.get('returncode') == 0 else 'error')
+            if self.rate_limiter is not None:
+                self.rate_limiter.on_success(latency)
+            return data, raw_text
+
+    async def search_bond(self, search_term: str):
+        return (await self.lookup_bond(search_term))[1]
+
+    async def lookup_bond(self, search_term: str):
+        """[新增] Scraper.lookup_bond 的异步版本。"""
+        print(f"\n正在搜索: '{search_term}'...")
+
+        params, headers = self._build_search_request(search_term)
+
+        try:
+            with tracing.span('search', term=search_term):
+                data, raw_text = await self._request_json('GET', config.SEARCH_API_URL, headers=headers, params=params)
+            return self._parse_search_response(search_term, data, raw_text)
+        except (aiohttp.ClientError, asyncio.TimeoutError, json.JSONDecodeError) as e:
+            print(f"搜索请求失败: {e}")
+            return SEARCH_FAILED, None
+
+    async def iter_announcement_pages(self, bond_code: str, start_skip: int = 0):
+        """
+        [新增] Scraper.iter_announcement_pages 的异步版本（异步生成器），约定相同。
+        :yield: (本页的 skip, 本页公告列表, 下一页的 skip)
+        :raises PageFetchException: 某一页获取失败时抛出
+        """
+        page_size = self.page_size
+        current_skip = start_skip
+        page_num = current_skip // page_size + 1
+        fetched_count = 0
+
+        while True:
+            print(f"  - [{bond_code}] 正在获取第 {page_num} 页数据 (skip={current_skip})...")
+
+            payload, headers = self._build_notice_request(bond_code, current_skip, page_size)
+
+            try:
+                with tracing.span('page', bond=bond_code, skip=current_skip):
+                    data, raw_text = await self._request_json('POST', config.NOTICE_API_URL, jitter=True, headers=headers, data=payload)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"[{bond_code}] 获取第 {page_num} 页公告请求失败: {e}")
+                raise PageFetchException(f"第 {page_num} 页 (skip={current_skip}) 请求失败: {e}")
+            except json.JSONDecodeError as e:
+                print(f"[{bond_code}] 服务器在第 {page_num} 页返回的不是有效的JSON格式。")
+                print(f"原始响应内容: {e.doc}")
+                raise PageFetchException(f"第 {page_num} 页 (skip={current_skip}) 返回的不是有效的JSON")
+
+            if data.get('returncode') != 0:
+                error_info = data.get('info', '没有具体的错误信息。')
+                print(f"[{bond_code}] 获取第 {page_num} 页公告失败。服务器返回码: {data.get('returncode')}, 信息: {error_info}")
+                print(f"原始响应: {raw_text}")
+                raise PageFetchException(f"第 {page_num} 页 (skip={current_skip}) 返回码 {data.get('returncode')}: {error_info}")
+
+            current_page_announcements = data.get('data', [])
+            if not current_page_announcements:
+                print(f"  - [{bond_code}] 已获取所有页面，没有更多公告了。")
+                return
+
+            fetched_count += len(current_page_announcements)
+            print(f"  - [{bond_code}] 成功获取 {len(current_page_announcements)} 条公告，本次累计: {fetched_count}。")
+            metrics.PAGES.inc()
+            metrics.NOTICES.inc(len(current_page_announcements))
+
+            # [修改] 按实际返回的条数前进，服务器返回的条数少于请求的 size 时也不会漏掉公告
+            next_skip = current_skip + len(current_page_announcements)
+            yield current_skip, current_page_announcements, next_skip
+            current_skip = next_skip
+            page_num += 1
+
+    async def get_announcements(self, bond_code: str):
+        print(f"正在为 Code '{bond_code}' 获取所有公告列表...")
+
+        all_announcements = []
+        try:
+            async for _, page_announcements, _ in self.iter_announcement_pages(bond_code):
+                all_announcements.extend(page_announcements)
+        except PageFetchException:
+            return None
+
+        print(f"\n[{bond_code}] 公告获取完成！共获取 {len(all_announcements)} 条公告信息。")
+        return all_announcements
+
+    async def scrape_bonds(self, search_terms: list, process_bond):
+        """
+        并发处理一批债券，同时在途的债券数不超过 max_concurrency。
+        [修改] 每个债券的具体处理（搜索、逐页获取、入库）由调用方提供的协程 process_bond(search_term) 完成。
+        一旦某个债券触发 RateLimitException / TokenExpiredException，其余任务会被取消，
+        异常原样抛给调用方，由调用方按与同步引擎相同的方式处理。
+        :param search_terms: 待处理的债券简称列表
+        :param process_bond: 处理单个债券的协程函数
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def process(search_term):
+            async with semaphore:
+                await process_bond(search_term)
+                # 占着并发槽位歇一会儿，相当于同步引擎中债券之间的延迟（启用自适应限速时无需额外等待）
+                if self.rate_limiter is None:
+                    await asyncio.sleep(random.uniform(*config.DELAY_BETWEEN_BONDS))
+
+        tasks = [asyncio.ensure_future(process(term)) for term in search_terms]
+        if not tasks:
+            return
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        for task in done:
+            if not task.cancelled() and task.exception() is not None:
+                raise task.exception()
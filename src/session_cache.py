@@ -0,0 +1,64 @@
+# E:\BaiduSyncdisk\数据库\1-城投公司\QYYJTScraper\src\session_cache.py
+
+import json
+import os
+import threading
+from . import config
+
+# 同一进程内的多个工作线程可能同时读写缓存文件
+_lock = threading.Lock()
+
+def _read_cache() -> dict:
+    """读取整个缓存文件，文件不存在或已损坏时返回空字典。"""
+    try:
+        with open(config.SESSION_CACHE_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (json.JSONDecodeError, OSError) as e:
+        print(f"会话缓存文件 {config.SESSION_CACHE_PATH} 无法读取，将忽略: {e}")
+        return {}
+
+def _write_cache(cache: dict):
+    """
+    原子地写回缓存文件，并将权限限制为仅当前用户可读写 (0600)。
+    先写临时文件再替换，避免中途退出留下半个 JSON。
+    """
+    directory = os.path.dirname(config.SESSION_CACHE_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = config.SESSION_CACHE_PATH + '.tmp'
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, config.SESSION_CACHE_PATH)
+    os.chmod(config.SESSION_CACHE_PATH, 0o600)
+
+def load_session(phone: str):
+    """
+    读取某个账号缓存的认证会话。
+    :param phone: 账号手机号
+    :return: 与 login_handler.get_authenticated_session 返回值结构相同的字典，没有缓存则返回 None。
+    """
+    if not config.SESSION_CACHE_ENABLED:
+        return None
+    with _lock:
+        return _read_cache().get(phone)
+
+def save_session(phone: str, auth_session: dict):
+    """将登录得到的认证会话（token、用户ID、cookies、获取时间）写入缓存。"""
+    if not config.SESSION_CACHE_ENABLED:
+        return
+    with _lock:
+        cache = _read_cache()
+        cache[phone] = auth_session
+        _write_cache(cache)
+
+def invalidate_session(phone: str):
+    """删除某个账号的缓存会话，通常在收到 TokenExpiredException 后调用。"""
+    if not config.SESSION_CACHE_ENABLED:
+        return
+    with _lock:
+        cache = _read_cache()
+        if cache.pop(phone, None) is not None:
+            _write_cache(cache)
@@ -0,0 +1,75 @@
+# E:\BaiduSyncdisk\数据库\1-城投公司\QYYJTScraper\src\session_pool.py
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from . import config
+
+class SessionPrefetcher:
+    """
+    在后台为接下来要用到的账号提前准备会话，使账号轮换时无需再阻塞等待浏览器登录。
+    会话的实际获取（读缓存或浏览器登录）由构造时传入的 session_factory 完成。
+    """
+    def __init__(self, session_factory, max_workers: int = None):
+        """
+        :param session_factory: 形如 f(account, search_term) 的函数，返回认证会话字典或 None
+        :param max_workers: 同时进行的后台登录数，默认取 config.PRELOGIN_WORKERS
+        """
+        self._session_factory = session_factory
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or config.PRELOGIN_WORKERS,
+            thread_name_prefix="prelogin"
+        )
+        self._futures = {}  # phone -> Future
+        self._lock = threading.Lock()
+
+    def _login(self, account: dict, search_term: str):
+        try:
+            return self._session_factory(account, search_term)
+        except Exception as e:
+            print(f"[{account['phone']}] 后台预登录时发生错误: {e}")
+            return None
+
+    def prefetch(self, account: dict, search_term: str):
+        """为账号提交一个后台登录任务；已在准备中或已就绪的账号不会重复提交。"""
+        phone = account['phone']
+        with self._lock:
+            if phone in self._futures:
+                return
+            print(f"[{phone}] 已提交后台预登录任务。")
+            self._futures[phone] = self._executor.submit(self._login, account, search_term)
+
+    def is_ready(self, phone: str) -> bool:
+        """账号的会话是否已在后台准备完毕（无论成功与否）。"""
+        with self._lock:
+            future = self._futures.get(phone)
+        return future is not None and future.done()
+
+    def get(self, account: dict, search_term: str):
+        """
+        取出账号的会话：已预登录的直接返回结果（仍在进行中则等待其完成），
+        否则在当前线程同步登录。
+        :return: 认证会话字典，登录失败返回 None。
+        """
+        with self._lock:
+            future = self._futures.pop(account['phone'], None)
+        if future is None:
+            return self._login(account, search_term)
+        if not future.done():
+            print(f"[{account['phone']}] 正在等待后台预登录完成...")
+        return future.result()
+
+    def discard(self, phone: str):
+        """丢弃账号已准备好的会话（账号被限流进入冷却、或其 Token 已失效时调用）。"""
+        with self._lock:
+            future = self._futures.pop(phone, None)
+        if future is not None:
+            future.cancel()
+
+    def shutdown(self):
+        """取消尚未开始的预登录任务，不等待正在进行的登录。"""
+        with self._lock:
+            futures = list(self._futures.values())
+            self._futures.clear()
+        for future in futures:
+            future.cancel()
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,241 @@
+# E:\BaiduSyncdisk\数据库\1-城投公司\QYYJTScraper\src\tracing.py
+
+import asyncio
+import collections
+import functools
+import heapq
+import json
+import os
+import sys
+import threading
+import time
+import weakref
+from . import config
+
+# 事件边记录边追加写入文件（Chrome trace 的 JSON 数组格式允许省略结尾的 "]"），
+# 长时间运行时内存占用不随事件数增长，程序中途退出留下的文件也能直接打开
+_FLUSH_EVERY = 1000
+
+_lock = threading.Lock()
+_file = None
+_buffer = []
+_totals = collections.defaultdict(lambda: [0, 0.0])  # 名称 -> [次数, 总秒数]
+# 时间线编号在线程或协程任务结束后归还，由之后的线程或任务复用，运行多少个任务都不会积累记录
+_free_lanes = []  # 已归还的时间线编号（最小堆，优先复用编号小的）
+_lane_count = 0
+_task_lanes = {}  # 运行中的协程任务 -> 时间线编号，任务结束时移除
+_thread_lane = threading.local()  # 当前线程的 _LaneHandle，线程结束时随线程局部数据一起释放
+_pid = os.getpid()
+_origin = time.perf_counter()
+
+def is_enabled() -> bool:
+    return _file is not None
+
+class _LaneHandle:
+    """线程占用的时间线。线程结束后对象被回收，编号随之归还。"""
+    __slots__ = ('lane', '__weakref__')
+
+    def __init__(self, lane):
+        self.lane = lane
+
+def _acquire_lane(label):
+    """取一个空闲的时间线编号（没有则新建），并写入显示名称的元数据事件。调用方须持有 _lock。"""
+    global _lane_count
+    if _free_lanes:
+        lane = heapq.heappop(_free_lanes)
+    else:
+        _lane_count += 1
+        lane = _lane_count
+    # 复用的编号沿用同一 tid，Chrome 显示最后一次设置的名称
+    _buffer.append({'name': 'thread_name', 'ph': 'M', 'pid': _pid, 'tid': lane, 'args': {'name': label}})
+    return lane
+
+def _release_lane(lane):
+    with _lock:
+        heapq.heappush(_free_lanes, lane)
+
+def _release_task_lane(task):
+    with _lock:
+        lane = _task_lanes.pop(task, None)
+        if lane is not None:
+            heapq.heappush(_free_lanes, lane)
+
+def _lane():
+    """
+    当前代码所在的时间线。协程任务各自占一条时间线：同一线程中并发的协程交错执行，
+    若共用线程的时间线，Chrome 会因为区间互相交叉而无法正确嵌套显示。
+    同时在途的任务数有上限，时间线也就只有这么多条，各任务依次复用。
+    """
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    if task is None:
+        handle = getattr(_thread_lane, 'handle', None)
+        if handle is None:
+            with _lock:
+                handle = _thread_lane.handle = _LaneHandle(_acquire_lane(threading.current_thread().name))
+            weakref.finalize(handle, _release_lane, handle.lane)
+        return handle.lane
+    lane = _task_lanes.get(task)
+    if lane is None:
+        with _lock:
+            lane = _task_lanes[task] = _acquire_lane(f"task {task.get_name()}")
+        task.add_done_callback(_release_task_lane)
+    return lane
+
+def _record(name, started, duration, args):
+    event = {'name': name, 'ph': 'X', 'pid': _pid, 'tid': _lane(),
+             'ts': round((started - _origin) * 1e6, 1), 'dur': round(duration * 1e6, 1)}
+    if args:
+        event['args'] = args
+    with _lock:
+        total = _totals[name]
+        total[0] += 1
+        total[1] += duration
+        if _file is None:
+            return
+        _buffer.append(event)
+        if len(_buffer) >= _FLUSH_EVERY:
+            _flush_locked()
+
+def _flush_locked():
+    for event in _buffer:
+        _file.write(json.dumps(event, ensure_ascii=False) + ',\n')
+    _buffer.clear()
+    _file.flush()
+
+class _Span:
+    __slots__ = ('name', 'args', 'started')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.started
+        if exc_type is not None:
+            self.args = dict(self.args or {}, error=exc_type.__name__)
+        _record(self.name, self.started, duration, self.args)
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+def span(name: str, **args):
+    """
+    记录一段耗时，用法：`with tracing.span('page', skip=0): ...`。未开启追踪时返回空操作对象，几乎没有开销。
+    :param name: 阶段名称，汇总与 Chrome trace 中按此分组
+    :param args: 附加在事件上的参数（如债券代码、skip），显示在 Chrome trace 的详情中
+    """
+    if _file is None:
+        return _NULL_SPAN
+    return _Span(name, args or None)
+
+def traced(name: str):
+    """把整个函数调用记录为一个 span 的装饰器（用于同步函数）。"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def sleep(seconds: float, reason: str):
+    """带 span 的 time.sleep，让刻意的等待在 trace 中与实际工作区分开（记录为 sleep.<reason>）。"""
+    with span('sleep.' + reason, seconds=round(seconds, 3)):
+        time.sleep(seconds)
+
+def start(path: str = None):
+    """开始记录 span，并把事件写入 Chrome trace 文件（可在 chrome://tracing 或 https://ui.perfetto.dev 打开）。"""
+    global _file
+    path = path or config.TRACE_OUTPUT_PATH
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with _lock:
+        if _file is not None:
+            return
+        _totals.clear()
+        _file = open(path, 'w', encoding='utf-8')
+        _file.write('[\n')
+    print(f"[追踪] 各阶段耗时将写入: {path}")
+
+def stop():
+    """写完剩余事件并关闭 trace 文件，然后输出各阶段累计耗时的汇总。"""
+    global _file
+    with _lock:
+        if _file is None:
+            return
+        _flush_locked()
+        # 收尾用一个元数据事件，使文件成为合法的 JSON 数组
+        _file.write(json.dumps({'name': 'process_name', 'ph': 'M', 'pid': _pid, 'args': {'name': 'QYYJTScraper'}}) + '\n]\n')
+        _file.close()
+        _file = None
+        totals = sorted(_totals.items(), key=lambda item: item[1][1], reverse=True)
+    print("\n[追踪] 各阶段累计耗时（同一时刻多个线程/协程的耗时会叠加计算）:")
+    for name, (count, seconds) in totals:
+        print(f"  {name:<20} {seconds:>10.1f} 秒  {count:>8} 次")
+    idle = sum(seconds for name, (_, seconds) in totals if name.startswith('sleep.') or name == 'rate_limit_wait')
+    print(f"  其中刻意等待（sleep.* 与 rate_limit_wait）合计 {idle:.1f} 秒")
+
+class SamplingProfiler:
+    """
+    采样分析器：后台线程每隔 interval 秒记录一次所有线程的调用栈，结束时按 "折叠栈" 格式写出
+    （每行 "线程;函数;函数... 次数"，可直接交给 flamegraph.pl、speedscope 等工具生成火焰图）。
+    与 span 互补：span 回答 "时间花在了哪个阶段"，采样回答 "这个阶段里具体在执行哪段代码"。
+    """
+    def __init__(self, interval: float = None, path: str = None):
+        self.interval = interval or config.PROFILE_INTERVAL
+        self.path = path or config.PROFILE_OUTPUT_PATH
+        self.samples = collections.Counter()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        print(f"[采样分析] 每 {self.interval * 1000:.0f} 毫秒采样一次调用栈，结束时写入: {self.path}")
+        return self
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        """停止采样并写出折叠栈文件。"""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        print(f"[采样分析] 共采集 {sum(self.samples.values())} 个样本，已写入: {self.path}")
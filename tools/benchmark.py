@@ -0,0 +1,285 @@
+# 文件名: benchmark.py
+
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+# 基准需要直接驱动爬虫本身，因此把项目根目录加入导入路径（其余工具脚本不依赖 src）
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_server import MockQyyjtServer
+from src import config, database, scraper, rate_limiter, login_handler, tracing
+from src import main as scraper_main
+
+SCENARIOS = ('scraper', 'database', 'sequential', 'parallel', 'async')
+# 与基线比较时，这些指标越大越好，延迟类指标越小越好
+HIGHER_IS_BETTER = ('bonds_per_s', 'pages_per_s', 'rows_per_s')
+LOWER_IS_BETTER = ('latency_p50_ms', 'latency_p99_ms')
+
+def percentile(values, pct):
+    """最近秩法计算百分位数；values 为空时返回 None。"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def latency_metrics(latencies):
+    return {
+        'latency_p50_ms': round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        'latency_p99_ms': round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+    }
+
+class FakeLogin:
+    """代替浏览器登录：每次"登录"签发一个新的 Token，模拟接口据此统计 Token 的使用次数。"""
+    def __init__(self):
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, phone, password, search_term):
+        with self._lock:
+            self._count += 1
+            token = f"bench-{phone}-{self._count}"
+        return {'token_name': 'pcuss', 'token_value': token, 'user_id': phone, 'cookies': {}}
+
+def configure(mock, db_path, keep_pacing):
+    """
+    把爬虫指向模拟接口与临时数据库，并关闭浏览器登录与会话缓存。
+    :param keep_pacing: 为 False 时去掉所有人为延迟与限速，测量的是爬虫自身的开销；为 True 时保留 config 中的节奏设置
+    """
+    config.SEARCH_API_URL = mock.search_url
+    config.NOTICE_API_URL = mock.notice_url
+    config.DATABASE_NAME = db_path
+    config.SESSION_CACHE_ENABLED = False
+    config.PARALLEL_LOGIN_STAGGER = 0
+    config.PARALLEL_ACCOUNT_REST = 0
+    # 注入 206 时账号会进入冷却，基准中缩短为 1 秒，避免整轮测试都在等待
+    config.ACCOUNT_COOLDOWN_BASE = 1
+    config.ACCOUNT_COOLDOWN_MAX = 1
+    if not keep_pacing:
+        config.ADAPTIVE_RATE_LIMIT = False
+        config.DELAY_BETWEEN_PAGES = (0, 0)
+        config.DELAY_BETWEEN_BONDS = (0, 0)
+        config.ASYNC_MIN_REQUEST_INTERVAL = 0
+    login_handler.get_authenticated_session = FakeLogin()
+    # 各场景之间不共享探测得到的分页大小与账号限速器
+    scraper_main._notice_page_size = None
+    rate_limiter._limiters.clear()
+    database.init_db()
+
+def bench_scraper(mock, bonds, args):
+    """只测 Scraper：逐个债券搜索并翻完所有页面，不写数据库。"""
+    auth = FakeLogin()('13800000000', None, None)
+    current_scraper = scraper.Scraper(auth, page_size=args.page_size)
+    latencies, pages, found = [], 0, 0
+    started = time.perf_counter()
+    for bond in bonds:
+        bond_details = current_scraper.search_bond(bond)
+        if not bond_details:
+            continue
+        found += 1
+        pages_iter = current_scraper.iter_announcement_pages(bond_details['code'])
+        while True:
+            page_started = time.perf_counter()
+            try:
+                next(pages_iter)
+            except StopIteration:
+                break
+            latencies.append(time.perf_counter() - page_started)
+            pages += 1
+    elapsed = time.perf_counter() - started
+    return dict({'bonds': found, 'pages': pages, 'elapsed_s': round(elapsed, 3),
+                 'bonds_per_s': round(found / elapsed, 2), 'pages_per_s': round(pages / elapsed, 2)},
+                **latency_metrics(latencies))
+
+def synthetic_pages(bonds, pages_per_bond, page_size):
+    """生成与接口返回格式相同的公告页，用于单独测试入库速度。"""
+    for b, bond in enumerate(bonds):
+        for p in range(pages_per_bond):
+            items = []
+            for i in range(page_size):
+                number = p * page_size + i
+                items.append({
+                    'title': f'{bond} 第{number}号公告',
+                    'date': f'2023{(number % 12) + 1:02d}{(number % 28) + 1:02d}',
+                    'file': [{'fileUrl': f'http://bench/{b}/{number}.pdf', 'fileSize': '1.2MB'}]
+                })
+            yield bond, f'{b:010d}.IB', items, (p + 1) * page_size
+
+def bench_database(mock, bonds, args):
+    """
+    只测入库：分别用 save_announcements（每页一个连接与事务）和 DatabaseWriter（后台线程合并事务）写入同样的数据。
+    :return: 两种方式的写入速度
+    """
+    results = {}
+    pages_per_bond = max(1, args.notices // args.page_size)
+
+    started = time.perf_counter()
+    rows = 0
+    for bond, code, items, _ in synthetic_pages(bonds, pages_per_bond, args.page_size):
+        rows += database.save_announcements(bond, code, bond, items)[0]
+    elapsed = time.perf_counter() - started
+    results['save_announcements_rows_per_s'] = round(rows / elapsed, 1)
+
+    db_path = config.DATABASE_NAME + '.writer'
+    config.DATABASE_NAME = db_path
+    database.init_db()
+    started = time.perf_counter()
+    with database.DatabaseWriter(db_path) as writer:
+        for bond, code, items, next_skip in synthetic_pages(bonds, pages_per_bond, args.page_size):
+            writer.submit_page(bond, code, bond, items, next_skip)
+    elapsed = time.perf_counter() - started
+    results['rows'] = writer.inserted_total
+    results['rows_per_s'] = round(writer.inserted_total / elapsed, 1)
+    return results
+
+def bench_main_loop(mock, bonds, args, parallel=False, in_flight=1):
+    """驱动主循环（逐个轮换 / 多账号并行 / 异步引擎），统计整体吞吐与每个债券的处理耗时。"""
+    accounts = [{'phone': f'1380000{i:04d}', 'password': 'x'} for i in range(args.accounts)]
+    config.ASYNC_BONDS_IN_FLIGHT = in_flight
+    config.HTTP_POOL_SIZE = max(config.HTTP_POOL_SIZE, in_flight)
+    latencies = []
+    latencies_lock = threading.Lock()
+
+    # 给每个债券的处理过程计时（主循环按模块内的名称调用这两个函数）
+    original_sync, original_async = scraper_main.scrape_one_bond, scraper_main.scrape_one_bond_async
+
+    def timed_sync(*a, **kw):
+        started = time.perf_counter()
+        try:
+            return original_sync(*a, **kw)
+        finally:
+            with latencies_lock:
+                latencies.append(time.perf_counter() - started)
+
+    async def timed_async(*a, **kw):
+        started = time.perf_counter()
+        try:
+            return await original_async(*a, **kw)
+        finally:
+            with latencies_lock:
+                latencies.append(time.perf_counter() - started)
+
+    scraper_main.scrape_one_bond, scraper_main.scrape_one_bond_async = timed_sync, timed_async
+    try:
+        started = time.perf_counter()
+        with database.DatabaseWriter() as writer:
+            if parallel:
+                scraper_main.run_parallel_workers(accounts, list(bonds), writer)
+            else:
+                scraper_main.run_sequential(accounts, list(bonds), writer)
+        elapsed = time.perf_counter() - started
+    finally:
+        scraper_main.scrape_one_bond, scraper_main.scrape_one_bond_async = original_sync, original_async
+
+    completed = database.get_job_counts().get(database.JOB_DONE, 0)
+    result = {'bonds': completed, 'pages': mock.stats['pages'], 'elapsed_s': round(elapsed, 3),
+              'bonds_per_s': round(completed / elapsed, 2), 'pages_per_s': round(mock.stats['pages'] / elapsed, 2),
+              'rows': writer.inserted_total, 'rows_per_s': round(writer.inserted_total / elapsed, 1),
+              'rate_limited': mock.stats['rate_limited'], 'token_expired': mock.stats['token_expired']}
+    result.update(latency_metrics(latencies))
+    return result
+
+def run_scenario(name, mock, bonds, args, work_dir):
+    db_path = os.path.join(work_dir, f'{name}.db')
+    mock.reset_stats()
+    with open(os.devnull, 'w', encoding='utf-8') as devnull:
+        output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull)
+        with output:
+            configure(mock, db_path, args.keep_pacing)
+            if name == 'scraper':
+                return bench_scraper(mock, bonds, args)
+            if name == 'database':
+                return bench_database(mock, bonds, args)
+            if name == 'parallel':
+                return bench_main_loop(mock, bonds, args, parallel=True)
+            if name == 'async':
+                return bench_main_loop(mock, bonds, args, in_flight=args.in_flight)
+            return bench_main_loop(mock, bonds, args)
+
+def compare_with_baseline(results, baseline, tolerance):
+    """
+    与基线结果逐项比较，吞吐下降或延迟上升超过 tolerance（比例）即视为退化。
+    :return: 退化项的说明列表
+    """
+    regressions = []
+    for scenario, metrics in results.items():
+        for metric, value in metrics.items():
+            base = baseline.get(scenario, {}).get(metric)
+            if not base or value is None:
+                continue
+            if metric in HIGHER_IS_BETTER and value < base * (1 - tolerance):
+                regressions.append(f"{scenario}.{metric}: {value} < 基线 {base}")
+            elif metric in LOWER_IS_BETTER and value > base * (1 + tolerance):
+                regressions.append(f"{scenario}.{metric}: {value} > 基线 {base}")
+    return regressions
+
+def print_results(results):
+    print("\n" + "=" * 60)
+    for scenario, metrics in results.items():
+        print(f"[{scenario}]")
+        for metric, value in metrics.items():
+            print(f"  {metric:<32} {value}")
+    print("=" * 60)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="在本地模拟接口上运行爬虫的端到端性能基准（不消耗真实账号额度）。")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=['scraper', 'database', 'sequential'],
+                        help="要运行的场景。")
+    parser.add_argument("--bonds", type=int, default=50, help="待爬取的债券数。")
+    parser.add_argument("--notices", type=int, default=100, help="每只债券的公告数（决定分页深度）。")
+    parser.add_argument("--page-size", type=int, default=config.NOTICE_PAGE_SIZE, help="scraper / database 场景的分页大小。")
+    parser.add_argument("--latency", type=float, default=0.01, help="模拟接口每个请求的延迟（秒）。")
+    parser.add_argument("--jitter", type=float, default=0.0, help="在延迟上随机增加的最大值（秒）。")
+    parser.add_argument("--page-cap", type=int, help="模拟接口每页最多返回的条数。")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="每 N 个请求注入一次 206 限流。")
+    parser.add_argument("--token-ttl", type=int, default=0, help="每个 Token 可用的请求数，之后注入 104 过期。")
+    parser.add_argument("--accounts", type=int, default=3, help="主循环场景使用的虚拟账号数。")
+    parser.add_argument("--in-flight", type=int, default=4, help="async 场景每个账号同时在途的债券数。")
+    parser.add_argument("--keep-pacing", action="store_true", help="保留 config 中的延迟与自适应限速设置（默认全部关闭）。")
+    parser.add_argument("--json", type=str, help="把结果写入该 JSON 文件，可作为之后比较的基线。")
+    parser.add_argument("--baseline", type=str, help="与该基线 JSON 比较，出现退化时以非零状态退出。")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的性能波动比例。")
+    parser.add_argument("--verbose", action="store_true", help="显示爬虫自身的输出。")
+    parser.add_argument("--trace", type=str, help="把各阶段的耗时写入该 Chrome trace 文件（开启后吞吐会略有下降）。")
+
+    args = parser.parse_args()
+
+    bond_names = [f'基准债{i:05d}' for i in range(args.bonds)]
+    work_dir = tempfile.mkdtemp(prefix='qyyjt-bench-')
+    results = {}
+    if args.trace:
+        tracing.start(args.trace)
+    try:
+        with MockQyyjtServer(port=0, latency=args.latency, jitter=args.jitter,
+                             notices_min=args.notices, notices_max=args.notices, page_cap=args.page_cap,
+                             rate_limit_every=args.rate_limit_every, token_ttl=args.token_ttl) as mock:
+            for name in args.scenarios:
+                print(f"正在运行场景: {name} ...")
+                results[name] = run_scenario(name, mock, bond_names, args, work_dir)
+    finally:
+        tracing.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_results(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=4)
+        print(f"结果已写入: {args.json}")
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare_with_baseline(results, json.load(f), args.tolerance)
+        if regressions:
+            print("性能退化:")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print(f"与基线相比没有超过 {args.tolerance:.0%} 的退化。")
@@ -1,21 +1,304 @@
 # 文件名: db_to_excel.py
 
 import sqlite3
-import pandas as pd
 import argparse
+import csv
+import datetime
+import glob
+import json
 import os
 
-def export_db_to_excel(db_path, output_excel_path):
+# Excel 单个工作表最多 1,048,576 行（含表头），超出部分自动写入下一个工作表
+EXCEL_MAX_ROWS = 1048576
+EXCEL_MAX_SHEET_NAME = 31
+DEFAULT_CHUNK_SIZE = 10000
+FORMATS = ('xlsx', 'csv', 'parquet')
+# 增量导出的水位记录文件，保存在输出目录中，按 格式 -> 表名 记录（同一目录下的 CSV 与 Parquet 数据集各自独立）
+WATERMARK_FILE = '_watermark.json'
+
+def list_tables(cursor):
+    """
+    获取数据库中所有的表与视图名称。
+    [修改] 同时导出视图（如兼容旧格式的 announcements），跳过 SQLite 内部表以及全文索引的虚拟表和影子表。
+    """
+    cursor.execute("SELECT name, type, sql FROM sqlite_master WHERE type IN ('table', 'view') ORDER BY type, name")
+    rows = cursor.fetchall()
+    virtual_tables = [name for name, _, sql in rows if sql and sql.upper().startswith('CREATE VIRTUAL TABLE')]
+    names = []
+    for name, _, _ in rows:
+        if name.startswith('sqlite_') or name in virtual_tables:
+            continue
+        if any(name.startswith(v + '_') for v in virtual_tables):
+            continue
+        names.append(name)
+    return names
+
+def iter_chunks(cursor, chunk_size):
+    """以 fetchmany 分批读取查询结果，内存中任何时候最多只有一批数据。"""
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield rows
+
+def query_table(conn, table_name, where='', params=()):
+    """
+    执行对一个表的查询。
+    :return: (游标, 列名列表)
+    """
+    cursor = conn.cursor()
+    cursor.execute(f'SELECT * FROM "{table_name}" {where}', params)
+    columns = [d[0] for d in cursor.description]
+    return cursor, columns
+
+def sheet_name_for(table_name, part):
+    """生成工作表名称：第一部分为表名，之后依次为 表名_2、表名_3...（不超过 Excel 的 31 个字符限制）。"""
+    suffix = '' if part == 1 else f'_{part}'
+    return table_name[:EXCEL_MAX_SHEET_NAME - len(suffix)] + suffix
+
+def write_xlsx_table(workbook, table_name, columns, chunks):
+    """
+    以 openpyxl 只写模式把一个表写入工作簿，行数超过单个工作表上限时自动拆分。
+    :return: 写入的数据行数
+    """
+    rows_per_sheet = EXCEL_MAX_ROWS - 1
+    total, part, sheet, in_sheet = 0, 0, None, rows_per_sheet
+    for chunk in chunks:
+        for row in chunk:
+            if in_sheet >= rows_per_sheet:
+                part += 1
+                sheet = workbook.create_sheet(title=sheet_name_for(table_name, part))
+                sheet.append(columns)
+                in_sheet = 0
+            sheet.append(row)
+            in_sheet += 1
+        total += len(chunk)
+    if sheet is None:
+        # 空表也保留一个只有表头的工作表
+        workbook.create_sheet(title=sheet_name_for(table_name, 1)).append(columns)
+    return total
+
+def write_csv_table(path, columns, chunks, append=False):
+    """
+    把查询结果逐批写入 CSV 文件（UTF-8 带 BOM，便于 Excel 直接打开中文）。
+    :param append: 为 True 且文件已存在时追加到末尾，不再重复写表头
+    :return: 写入的数据行数
+    """
+    exists = append and os.path.exists(path) and os.path.getsize(path) > 0
+    total = 0
+    with open(path, 'a' if exists else 'w', newline='', encoding='utf-8' if exists else 'utf-8-sig') as f:
+        writer = csv.writer(f)
+        if not exists:
+            writer.writerow(columns)
+        for chunk in chunks:
+            writer.writerows(chunk)
+            total += len(chunk)
+    return total
+
+def parquet_schema(conn, table_name, columns):
+    """根据 SQLite 声明的列类型构造 Parquet 表结构（INTEGER -> int64，REAL -> float64，BLOB -> binary，其余为字符串）。"""
+    import pyarrow as pa
+
+    declared = {row[1]: (row[2] or '').upper() for row in conn.execute(f'PRAGMA table_info("{table_name}")')}
+    fields = []
+    for column in columns:
+        decl = declared.get(column, '')
+        if 'INT' in decl:
+            arrow_type = pa.int64()
+        elif any(t in decl for t in ('REAL', 'FLOA', 'DOUB')):
+            arrow_type = pa.float64()
+        elif 'BLOB' in decl:
+            arrow_type = pa.binary()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column, arrow_type))
+    return pa.schema(fields)
+
+def _coerce(value, arrow_type):
+    """SQLite 的列不强制类型，写入前把与声明类型不符的值转换过来，无法转换的记为空值。"""
+    import pyarrow as pa
+
+    if value is None:
+        return None
+    if pa.types.is_string(arrow_type):
+        return value if isinstance(value, str) else str(value)
+    if pa.types.is_int64(arrow_type):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+    if pa.types.is_float64(arrow_type):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+    return value
+
+def write_parquet_table(path, schema, chunks):
+    """
+    把查询结果逐批写入 Parquet 文件，每一批数据是一个 row group。
+    [修改] 先写入临时文件，完整写完后再重命名，中断时不会留下残缺的文件。
+    :return: 写入的数据行数
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    total = 0
+    tmp_path = path + '.tmp'
+    with pq.ParquetWriter(tmp_path, schema, compression='zstd') as writer:
+        for chunk in chunks:
+            arrays = [
+                pa.array([_coerce(row[i], field.type) for row in chunk], type=field.type)
+                for i, field in enumerate(schema)
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            total += len(chunk)
+        if total == 0:
+            writer.write_table(schema.empty_table())
+    os.replace(tmp_path, path)
+    return total
+
+def check_format_dependency(fmt):
+    """在开始导出之前检查所需的可选依赖，缺失时给出安装提示。"""
+    module = {'xlsx': 'openpyxl', 'parquet': 'pyarrow'}.get(fmt)
+    if module is None:
+        return True
+    try:
+        __import__(module)
+    except ImportError:
+        print(f"错误: 导出 {fmt} 格式需要安装 {module}（pip install {module}）。")
+        return False
+    return True
+
+def load_watermarks(output_dir):
+    path = os.path.join(output_dir, WATERMARK_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_watermarks(output_dir, watermarks):
+    """先写临时文件再替换，保证水位文件始终完整。"""
+    path = os.path.join(output_dir, WATERMARK_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(watermarks, f, ensure_ascii=False, indent=4)
+    os.replace(path + '.tmp', path)
+
+def export_table_incremental(conn, table_name, output_dir, fmt, column, state, chunk_size):
+    """
+    [新增] 只导出 column 大于上次水位的行，追加到已有的 CSV 文件，或作为新的分片写入 Parquet 数据集目录。
+    本次导出的上界在开始时确定，导出期间新写入的行留到下一次。
+    水位在数据写完之后才更新；若上次在两者之间中断，CSV 会先截断到上次记录的长度，多出的 Parquet 分片会被删除，不会重复导出。
+    :param state: 该表上一次的水位记录（首次导出为 None）
+    :return: (导出的行数, 新的水位记录)
+    """
+    if state and state.get('column') != column:
+        raise ValueError(f"表 '{table_name}' 此前按 {state.get('column')} 增量导出，不能改用 {column}")
+    last_value = state.get('value') if state else None
+
+    upper = conn.execute(f'SELECT MAX("{column}") FROM "{table_name}"').fetchone()[0]
+    if upper is None or (last_value is not None and upper <= last_value):
+        return 0, state
+
+    where = f'WHERE "{column}" <= ?'
+    params = [upper]
+    if last_value is not None:
+        where += f' AND "{column}" > ?'
+        params.append(last_value)
+    table_cursor, columns = query_table(conn, table_name, f'{where} ORDER BY "{column}"', params)
+    chunks = iter_chunks(table_cursor, chunk_size)
+
+    new_state = {'column': column, 'value': upper}
+    if fmt == 'csv':
+        path = os.path.join(output_dir, f'{table_name}.csv')
+        if state is None and os.path.exists(path):
+            raise ValueError(f"'{path}' 已存在但没有增量导出记录，请删除该文件或换一个输出目录")
+        if state and os.path.exists(path) and os.path.getsize(path) > state['size']:
+            with open(path, 'r+b') as f:
+                f.truncate(state['size'])
+        count = write_csv_table(path, columns, chunks, append=state is not None)
+        new_state['size'] = os.path.getsize(path)
+    else:
+        dataset_dir = os.path.join(output_dir, table_name)
+        os.makedirs(dataset_dir, exist_ok=True)
+        parts = state['parts'] if state else 0
+        for leftover in glob.glob(os.path.join(dataset_dir, 'part-*.parquet')):
+            if int(os.path.basename(leftover)[5:-8]) >= parts:
+                os.remove(leftover)
+        schema = parquet_schema(conn, table_name, columns)
+        count = write_parquet_table(os.path.join(dataset_dir, f'part-{parts:05d}.parquet'), schema, chunks)
+        new_state['parts'] = parts + 1
+    new_state['rows'] = (state.get('rows', 0) if state else 0) + count
+    new_state['updated_at'] = datetime.datetime.now().isoformat(sep=' ', timespec='seconds')
+    return count, new_state
+
+def export_incremental(db_path, output_dir, fmt='parquet', tables=None, column='id', chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    [新增] 增量导出：每个表记录一个水位，每次只导出新增的行。
+    announcements 视图的 id 是文件记录的 AUTOINCREMENT 主键，只增不减、删除后也不会复用，是默认且推荐的水位；
+    scraped_at 是每个文件的入库时间，同样可用，但要求写入数据库的机器时钟不回拨。
+    其他表请选择随写入单调递增且不会复用的列（如 jobs.updated_at 会被反复改写，不适合作为水位）。
+    CSV 追加到 output_dir/表名.csv；Parquet 以 part-00000.parquet、part-00001.parquet... 分片写入 output_dir/表名/ 数据集目录。
+
+    :param db_path: SQLite数据库文件路径。
+    :param output_dir: 输出目录，水位记录保存在其中的 _watermark.json。
+    :param fmt: csv 或 parquet。
+    :param tables: 要导出的表或视图，默认只导出 announcements。
+    :param column: 水位列，必须随写入单调递增且不会复用。
+    :param chunk_size: 每批读取与写入的行数。
+    """
+    if not os.path.exists(db_path):
+        print(f"错误: 数据库文件 '{db_path}' 未找到。")
+        return
+    if fmt not in ('csv', 'parquet'):
+        print("错误: 增量导出只支持 csv 与 parquet 格式。")
+        return
+    if not check_format_dependency(fmt):
+        return
+
+    tables = tables or ['announcements']
+    os.makedirs(output_dir, exist_ok=True)
+    watermarks = load_watermarks(output_dir)
+    format_watermarks = watermarks.setdefault(fmt, {})
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        for table_name in tables:
+            state = format_watermarks.get(table_name)
+            since = f"{column} > {state['value']}" if state else "全部数据"
+            print(f"  - 正在增量导出表 '{table_name}'（{since}）...")
+            count, new_state = export_table_incremental(conn, table_name, output_dir, fmt, column, state, chunk_size)
+            if count == 0:
+                print(f"    '{table_name}' 没有新增数据。")
+                continue
+            format_watermarks[table_name] = new_state
+            save_watermarks(output_dir, watermarks)
+            print(f"    '{table_name}' 新增 {count} 行，水位更新为 {column} = {new_state['value']}。")
+        print(f"\n增量导出完成，输出目录: {output_dir}")
+    except (sqlite3.Error, ValueError) as e:
+        print(f"增量导出失败: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+def export_db_to_excel(db_path, output_excel_path, fmt='xlsx', tables=None, chunk_size=DEFAULT_CHUNK_SIZE):
     """
     读取一个SQLite数据库，并将其所有表导出到一个Excel文件的不同工作表中。
+    [修改] 逐批流式读取与写入，内存占用与数据库大小无关：
+    xlsx 使用 openpyxl 只写模式并在超过 Excel 行数上限时拆分工作表；csv / parquet 每个表输出一个文件到 output_excel_path 目录。
 
     :param db_path: SQLite数据库文件路径。
-    :param output_excel_path: 输出的Excel文件名。
+    :param output_excel_path: 输出的Excel文件名（csv / parquet 格式时为输出目录）。
+    :param fmt: 导出格式，xlsx / csv / parquet。
+    :param tables: 只导出这些表或视图；为 None 时导出全部。
+    :param chunk_size: 每批读取与写入的行数。
     """
     # 检查数据库文件是否存在
     if not os.path.exists(db_path):
         print(f"错误: 数据库文件 '{db_path}' 未找到。")
         return
+    if not check_format_dependency(fmt):
+        return
 
     print(f"正在连接数据库: {db_path}")
     conn = None
@@ -25,8 +308,13 @@ def export_db_to_excel(db_path, output_excel_path):
         cursor = conn.cursor()
 
         # 2. 获取数据库中所有表的名称
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        table_names = [table[0] for table in cursor.fetchall()]
+        table_names = list_tables(cursor)
+        if tables:
+            missing = [t for t in tables if t not in table_names]
+            if missing:
+                print(f"错误: 数据库中没有这些表: {', '.join(missing)}")
+                return
+            table_names = list(tables)
 
         if not table_names:
             print("数据库中没有找到任何数据表。")
@@ -34,24 +322,34 @@ def export_db_to_excel(db_path, output_excel_path):
 
         print(f"在数据库中找到以下数据表: {', '.join(table_names)}")
 
-        # 3. 创建一个Excel写入器
-        with pd.ExcelWriter(output_excel_path, engine='openpyxl') as writer:
-            print(f"准备将数据写入到: {output_excel_path}")
-            
-            # 4. 遍历每个表，读取数据并写入到Excel的不同工作表
-            for table_name in table_names:
-                print(f"  - 正在导出表 '{table_name}'...")
-                # 构建查询语句以选择表中的所有数据
-                query = f"SELECT * FROM {table_name}"
-                
-                # 使用pandas直接从SQL查询结果创建DataFrame
-                df = pd.read_sql_query(query, conn)
-                
-                # 将DataFrame写入到Excel的一个工作表（sheet）中
-                # sheet_name被设置为表名
-                # index=False表示不将pandas的行索引写入Excel文件
-                df.to_excel(writer, sheet_name=table_name, index=False)
-                print(f"    '{table_name}' 表成功导出，包含 {len(df)} 行数据。")
+        # 3. 准备输出位置
+        if fmt == 'xlsx':
+            output_dir = os.path.dirname(output_excel_path)
+            from openpyxl import Workbook
+            workbook = Workbook(write_only=True)
+        else:
+            output_dir = output_excel_path
+            workbook = None
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        print(f"准备将数据写入到: {output_excel_path}")
+
+        # 4. 遍历每个表，分批读取数据并写入
+        for table_name in table_names:
+            print(f"  - 正在导出表 '{table_name}'...")
+            table_cursor, columns = query_table(conn, table_name)
+            chunks = iter_chunks(table_cursor, chunk_size)
+            if fmt == 'xlsx':
+                count = write_xlsx_table(workbook, table_name, columns, chunks)
+            elif fmt == 'csv':
+                count = write_csv_table(os.path.join(output_dir, f'{table_name}.csv'), columns, chunks)
+            else:
+                schema = parquet_schema(conn, table_name, columns)
+                count = write_parquet_table(os.path.join(output_dir, f'{table_name}.parquet'), schema, chunks)
+            print(f"    '{table_name}' 表成功导出，包含 {count} 行数据。")
+
+        if workbook is not None:
+            workbook.save(output_excel_path)
 
         print(f"\n操作完成！所有数据已成功导出到: {output_excel_path}")
 
@@ -65,22 +363,44 @@ def export_db_to_excel(db_path, output_excel_path):
             # print("数据库连接已关闭。")
 
 if __name__ == '__main__':
-    parser = argparse.ArgumentParser(description="将SQLite数据库中的所有表导出到一个Excel文件中。")
-    
+    parser = argparse.ArgumentParser(description="将SQLite数据库中的所有表导出到一个Excel文件中（也支持 CSV / Parquet）。")
+
     # 必填参数：数据库文件路径
     parser.add_argument("db_path", type=str, help="要转换的SQLite数据库文件路径。例如: qyyjt_data.db")
-    
+
     # 可选参数：输出的Excel文件名
-    parser.add_argument("-o", "--output", type=str, help="输出的Excel文件名。如果未提供，将自动根据数据库名生成。")
-    
+    parser.add_argument("-o", "--output", type=str,
+                        help="输出的Excel文件名（csv / parquet 格式时为输出目录）。如果未提供，将自动根据数据库名生成。")
+    parser.add_argument("-f", "--format", choices=FORMATS,
+                        help="导出格式。未指定时根据输出文件的扩展名判断，默认 xlsx。")
+    parser.add_argument("--tables", nargs="+", help="只导出指定的表或视图，例如 --tables announcements。")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="每批读取与写入的行数。")
+    parser.add_argument("--incremental", action="store_true",
+                        help="增量导出：只导出上次导出之后新增的行并追加到输出目录（仅 csv / parquet，默认 parquet，默认表为 announcements）。")
+    parser.add_argument("--watermark-column", type=str, default="id",
+                        help="增量导出使用的水位列，需随写入单调递增且不会复用。默认 id（announcements 中为文件记录的自增主键），"
+                             "也可用 scraped_at（每个文件的入库时间，要求时钟不回拨）。")
+
     args = parser.parse_args()
-    
+
+    fmt = args.format
+    if fmt is None:
+        extension = os.path.splitext(args.output)[1].lstrip('.').lower() if args.output else ''
+        fmt = extension if extension in FORMATS else ('parquet' if args.incremental else 'xlsx')
+
     # 如果用户没有指定输出文件名，我们就自动生成一个
     if args.output:
         output_file = args.output
     else:
-        # 获取数据库文件名（不含扩展名），并添加 .xlsx 后缀
+        # 获取数据库文件名（不含扩展名），xlsx 添加 .xlsx 后缀，csv / parquet 输出到同名目录
         base_name = os.path.splitext(os.path.basename(args.db_path))[0]
-        output_file = f"output/{base_name}_export.xlsx"
-        
-    export_db_to_excel(args.db_path, output_file)
+        if args.incremental:
+            output_file = f"output/{base_name}_incremental"
+        else:
+            output_file = f"output/{base_name}_export.xlsx" if fmt == 'xlsx' else f"output/{base_name}_export"
+
+    if args.incremental:
+        export_incremental(args.db_path, output_file, fmt=fmt, tables=args.tables,
+                           column=args.watermark_column, chunk_size=args.chunk_size)
+    else:
+        export_db_to_excel(args.db_path, output_file, fmt=fmt, tables=args.tables, chunk_size=args.chunk_size)
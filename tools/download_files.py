@@ -1,10 +1,24 @@
 # 文件名: download_files.py
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 import os
 import argparse
 import json
 import re
+import sqlite3
+import datetime
+import hashlib
+import shutil
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+# 每个下载记录的状态
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
 
 def sanitize_filename(filename):
     """移除文件名中的非法字符，并将多个空格替换为单个，使其更整洁"""
@@ -14,9 +28,297 @@ def sanitize_filename(filename):
     sanitized = re.sub(r'\s+', ' ', sanitized)
     return sanitized.strip()
 
-def download_from_task_file(task_file, save_dir):
+def open_state_db(db_path):
+    """
+    [新增] 打开记录下载状态的数据库（默认与爬虫共用 qyyjt_data.db），并创建 downloads 表。
+    已成功下载并校验过的文件在这里有记录，重跑时无需逐个检查磁盘即可跳过。
+    """
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS downloads (
+            file_url TEXT PRIMARY KEY,
+            save_path TEXT NOT NULL,
+            status TEXT NOT NULL,
+            size INTEGER,
+            error TEXT,
+            updated_at TIMESTAMP NOT NULL
+        )
+    ''')
+    # [新增] 文件链接 -> 内容哈希。记录过的链接不会再次下载，直接从内容仓库链接出来
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS file_hashes (
+            file_url TEXT PRIMARY KEY,
+            sha256 TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            recorded_at TIMESTAMP NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_file_hashes_sha256 ON file_hashes (sha256)')
+    conn.commit()
+    return conn
+
+def record_hash(conn, url, digest, size):
+    conn.execute(
+        'INSERT OR REPLACE INTO file_hashes (file_url, sha256, size, recorded_at) VALUES (?, ?, ?, ?)',
+        (url, digest, size, datetime.datetime.now().isoformat(sep=' '))
+    )
+    conn.commit()
+
+def record_download(conn, url, save_path, status, size=None, error=None):
+    conn.execute('''
+        INSERT OR REPLACE INTO downloads (file_url, save_path, status, size, error, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (url, save_path, status, size, error, datetime.datetime.now().isoformat(sep=' ')))
+    conn.commit()
+
+class ContentStore:
+    """
+    [新增] 按内容寻址的文件仓库：每份文件只以其 sha256 为名保存一次（objects/ab/cd/<sha256>），
+    按 "[年份]-[标题].pdf" 组织的可读目录中只放指向仓库文件的硬链接（不支持时退回符号链接，再不行才复制）。
+    同一份 PDF 出现在多个公告或债券下时，磁盘上只占一份空间。
+    """
+    def __init__(self, root, link_mode="hardlink"):
+        self.root = root
+        self.link_mode = link_mode
+        os.makedirs(os.path.join(root, 'tmp'), exist_ok=True)
+
+    def blob_path(self, digest):
+        return os.path.join(self.root, 'objects', digest[:2], digest[2:4], digest)
+
+    def part_path(self, url):
+        """下载中的文件放在仓库内的 tmp 目录，完成后可以直接重命名进仓库（同一文件系统）。"""
+        return os.path.join(self.root, 'tmp', hashlib.sha1(url.encode('utf-8')).hexdigest() + '.part')
+
+    @staticmethod
+    def hash_file(path, chunk_size=1024 * 1024):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def add(self, path):
+        """
+        把一个完整的文件移入仓库；仓库中已有相同内容时直接删除该文件。
+        :return: (sha256, 文件大小)
+        """
+        digest = self.hash_file(path)
+        size = os.path.getsize(path)
+        blob = self.blob_path(digest)
+        if os.path.exists(blob):
+            os.remove(path)
+        else:
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            os.replace(path, blob)
+        return digest, size
+
+    def link(self, digest, target):
+        """在 target 处创建指向仓库文件的链接（先建临时链接再原子替换，已有的同名文件会被替换）。"""
+        blob = self.blob_path(digest)
+        os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+        tmp_target = target + '.link'
+        if os.path.lexists(tmp_target):
+            os.remove(tmp_target)
+        try:
+            if self.link_mode == "hardlink":
+                os.link(blob, tmp_target)
+            else:
+                os.symlink(os.path.abspath(blob), tmp_target)
+        except OSError:
+            try:
+                os.symlink(os.path.abspath(blob), tmp_target)
+            except OSError:
+                shutil.copyfile(blob, tmp_target)
+        os.replace(tmp_target, target)
+
+    def verify(self):
+        """
+        重新计算仓库中每个文件的 sha256，删除与文件名不符（已损坏）的文件。
+        :return: 被删除的文件的哈希列表
+        """
+        corrupted = []
+        objects_dir = os.path.join(self.root, 'objects')
+        for directory, _, filenames in os.walk(objects_dir):
+            for name in filenames:
+                path = os.path.join(directory, name)
+                if self.hash_file(path) != name:
+                    print(f"  - 校验失败，已删除: {path}")
+                    # 先清空再删除：可读目录中的硬链接与它共用同一份数据，清空后大小对不上，下次运行会重新下载
+                    os.truncate(path, 0)
+                    os.remove(path)
+                    corrupted.append(name)
+        return corrupted
+
+class HostLimiter:
+    """[新增] 限制对同一主机同时进行的下载数，避免线程数较多时集中压在一台文件服务器上。"""
+    def __init__(self, per_host):
+        self._per_host = per_host
+        self._semaphores = defaultdict(lambda: threading.BoundedSemaphore(self._per_host))
+        self._lock = threading.Lock()
+
+    def slot(self, url):
+        with self._lock:
+            return self._semaphores[urlparse(url).netloc]
+
+_thread_local = threading.local()
+
+def get_session(pool_size):
+    """[新增] 每个下载线程一个长连接会话，连接在该线程处理的所有文件之间复用；遇到 5xx 或连接错误自动重试。"""
+    session = getattr(_thread_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        # [新增] 要求服务器不压缩响应：iter_content 返回的是解压后的数据，而 Content-Length 是传输的字节数，
+        # 压缩时二者对不上，完整性检查会每次失败；断点续传的 Range 偏移也必须按原始字节计算
+        session.headers['Accept-Encoding'] = 'identity'
+        retry = Retry(total=3, backoff_factor=1.0, status_forcelist=(500, 502, 503, 504),
+                      allowed_methods=frozenset(['GET', 'HEAD']), raise_on_status=False)
+        adapter = HTTPAdapter(pool_maxsize=pool_size, max_retries=retry)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        _thread_local.session = session
+    return session
+
+def _validator_path(part_path):
+    """[新增] 与 .part 文件一起保存的服务器文件版本标识（ETag 或 Last-Modified），续传时用于 If-Range。"""
+    return part_path + '.validator'
+
+def _response_validator(response):
+    """强 ETag 优先（弱 ETag 不能用于 If-Range），否则用 Last-Modified；都没有时返回 None。"""
+    etag = response.headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return response.headers.get('Last-Modified')
+
+def fetch_to_part(session, url, part_path, chunk_size, timeout):
+    """
+    [新增] 把文件下载到 .part 文件；.part 已存在时用 HTTP Range 从断点继续，服务器不支持 Range 时从头下载。
+    [修改] 续传时带上 If-Range：服务器上的文件在上次下载之后变了的话，服务器返回完整的新文件（200），
+    而不是把新文件的后半部分接在旧文件前半部分之后。没有保存版本标识的 .part 无法安全续传，直接重新下载。
+    :return: 完整文件应有的字节数，服务器未给出 Content-Length 时为 None
+    """
+    validator_path = _validator_path(part_path)
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    validator = None
+    if offset and os.path.exists(validator_path):
+        with open(validator_path, 'r', encoding='utf-8') as f:
+            validator = f.read().strip() or None
+    headers = {'Range': f'bytes={offset}-', 'If-Range': validator} if offset and validator else {}
+    with session.get(url, stream=True, headers=headers, timeout=timeout) as response:
+        if headers and response.status_code == 416:
+            # .part 已经是完整文件（或服务器上的文件变了），丢弃后重新下载
+            os.remove(part_path)
+            return fetch_to_part(session, url, part_path, chunk_size, timeout)
+        response.raise_for_status()
+        if response.status_code != 206:
+            # 服务器忽略了 Range 或文件已变化，返回的是完整文件；记下新文件的版本标识，供之后续传
+            offset = 0
+            new_validator = _response_validator(response)
+            if new_validator:
+                with open(validator_path, 'w', encoding='utf-8') as f:
+                    f.write(new_validator)
+            elif os.path.exists(validator_path):
+                os.remove(validator_path)
+        content_length = response.headers.get('Content-Length')
+
+        with open(part_path, 'ab' if offset else 'wb') as f_out:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                f_out.write(chunk)
+    return offset + int(content_length) if content_length is not None else None
+
+def download_file(url, save_path, store, host_limiter, chunk_size, timeout, pool_size):
+    """
+    [新增] 下载单个文件：先写入仓库 tmp 目录下的 .part 文件，下载完整并核对长度后按 sha256 移入内容仓库，
+    再在 save_path 处建立链接。
+    磁盘上已有同名的普通文件但数据库中没有记录时（旧版本下载的文件），用 HEAD 请求核对大小，一致则直接收入仓库。
+    :return: (是否实际下载了数据, sha256, 文件大小)
+    """
+    session = get_session(pool_size)
+    part_path = store.part_path(url)
+
+    with host_limiter.slot(url):
+        if os.path.isfile(save_path) and not os.path.islink(save_path) and not os.path.exists(part_path):
+            # [修改] 服务器不支持 HEAD 或连接出错时不算下载失败，照常下载即可
+            try:
+                response = session.head(url, allow_redirects=True, timeout=timeout)
+            except requests.RequestException:
+                response = None
+            expected = response.headers.get('Content-Length') if response is not None and response.ok else None
+            if expected is not None and expected.isdigit() and int(expected) == os.path.getsize(save_path):
+                digest, size = store.add(save_path)
+                store.link(digest, save_path)
+                return False, digest, size
+
+        expected = fetch_to_part(session, url, part_path, chunk_size, timeout)
+
+    size = os.path.getsize(part_path)
+    if expected is not None and size != expected:
+        raise IOError(f"文件不完整: 已下载 {size} 字节，应为 {expected} 字节（.part 已保留，下次继续）")
+    digest, size = store.add(part_path)
+    if os.path.exists(_validator_path(part_path)):
+        os.remove(_validator_path(part_path))
+    store.link(digest, save_path)
+    return True, digest, size
+
+def plan_downloads(tasks, save_dir, done):
+    """
+    [新增] 为每个任务确定保存路径，并跳过数据库中已记录为下载到 save_dir 的文件。
+    同一链接只下载一次；不同链接生成了相同文件名时，后者追加序号，避免互相覆盖。
+    :param done: 数据库中已完成的 {file_url: save_path}
+    :return: (待下载的 [(url, save_path, title)], 跳过的数量)
+    """
+    done = {url: path for url, path in done.items()
+            if os.path.normpath(os.path.dirname(path)) == os.path.normpath(save_dir)}
+    taken = {path: url for url, path in done.items()}
+    planned, seen_urls, skipped = [], set(), 0
+    for task in tasks:
+        url = task['file_url']
+        if url in seen_urls:
+            continue
+        seen_urls.add(url)
+        if url in done:
+            skipped += 1
+            continue
+
+        title = task['announcement_title']
+        # --- 核心逻辑：创建结构化文件名 ---
+        # 格式: [年份]-[清理后的公告标题].pdf
+        year = (task.get('publish_date') or '')[:4] or '未知年份'
+        base_name = f"{year}-{sanitize_filename(title)}"
+        save_path = os.path.join(save_dir, f"{base_name}.pdf")
+        suffix = 2
+        while taken.get(save_path, url) != url:
+            save_path = os.path.join(save_dir, f"{base_name}-{suffix}.pdf")
+            suffix += 1
+        taken[save_path] = url
+        planned.append((url, save_path, title))
+    return planned, skipped
+
+def link_known_files(conn, planned, store):
+    """
+    [新增] 链接此前已下载过（记录在 file_hashes 中）且仓库文件仍在的任务，无需再次请求。
+    :return: 仍需下载的任务列表
+    """
+    hashes = dict(conn.execute('SELECT file_url, sha256 FROM file_hashes'))
+    remaining, linked = [], 0
+    for url, save_path, title in planned:
+        digest = hashes.get(url)
+        if digest and os.path.exists(store.blob_path(digest)):
+            store.link(digest, save_path)
+            record_download(conn, url, save_path, STATUS_DONE, size=os.path.getsize(store.blob_path(digest)))
+            linked += 1
+        else:
+            remaining.append((url, save_path, title))
+    if linked:
+        print(f"已从内容仓库直接链接 {linked} 个此前下载过的文件。")
+    return remaining
+
+def download_from_task_file(task_file, save_dir, db_path="qyyjt_data.db", workers=8, per_host=4,
+                            chunk_size=64 * 1024, timeout=60, store_dir="output/store", link_mode="hardlink"):
     """
     从一个JSON任务文件中读取任务列表，并下载文件，同时生成结构化的文件名。
+    [修改] 使用线程池并发下载（每个主机同时最多 per_host 个），支持断点续传，下载状态记录在数据库中。
+    [修改] 文件按内容保存在 store_dir 仓库中，save_dir 下只是指向仓库的链接；下载过的链接不会再次下载。
     """
     if not os.path.exists(save_dir):
         os.makedirs(save_dir)
@@ -33,53 +335,84 @@ def download_from_task_file(task_file, save_dir):
         print(f"任务文件 '{task_file}' 为空，无需下载。")
         return
 
-    print(f"准备从 '{task_file}' 下载 {len(tasks)} 个文件到 '{save_dir}' 目录...")
+    conn = open_state_db(db_path)
+    try:
+        done = dict(conn.execute('SELECT file_url, save_path FROM downloads WHERE status = ?', (STATUS_DONE,)))
+        planned, skipped = plan_downloads(tasks, save_dir, done)
+        if skipped:
+            print(f"已跳过 {skipped} 个此前已下载完成的文件。")
+        store = ContentStore(store_dir, link_mode)
+        planned = link_known_files(conn, planned, store)
+        if not planned:
+            print("所有文件均已下载，无需继续。")
+            return
 
-    for i, task in enumerate(tasks, 1):
-        try:
-            url = task['file_url']
-            title = task['announcement_title']
-            date_str = task['publish_date']
-            
-            # --- 核心逻辑：创建结构化文件名 ---
-            # 1. 提取年份
-            year = date_str[:4]
-            
-            # 2. 清理标题，并构建最终文件名
-            # 格式: [年份]-[清理后的公告标题].pdf
-            clean_title = sanitize_filename(title)
-            new_filename = f"{year}-{clean_title}.pdf"
-            
-            save_path = os.path.join(save_dir, new_filename)
-
-            if os.path.exists(save_path):
-                print(f"({i}/{len(tasks)}) 文件已存在，跳过: {new_filename}")
-                continue
-            
-            print(f"({i}/{len(tasks)}) 正在下载: {title}")
-            print(f"    保存为: {new_filename}")
-
-            response = requests.get(url, stream=True, timeout=60)
-            response.raise_for_status()
-
-            with open(save_path, 'wb') as f_out:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f_out.write(chunk)
-            
-            print(f"    成功保存到: {save_path}\n")
-
-        except requests.exceptions.RequestException as e:
-            print(f"    下载失败: {task.get('announcement_title', '未知任务')}, 错误: {e}\n")
-        except Exception as e:
-            print(f"    发生未知错误: {e}\n")
-            
-    print("所有下载任务完成。")
+        print(f"准备从 '{task_file}' 下载 {len(planned)} 个文件到 '{save_dir}' 目录"
+              f"（{workers} 个线程，每个主机最多 {per_host} 个并发）...")
+
+        host_limiter = HostLimiter(per_host)
+        failed = 0
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="download") as pool:
+            futures = {
+                pool.submit(download_file, url, save_path, store, host_limiter, chunk_size, timeout, workers): (url, save_path, title)
+                for url, save_path, title in planned
+            }
+            # 下载状态只在主线程中写入数据库，无需为连接加锁
+            for i, future in enumerate(as_completed(futures), 1):
+                url, save_path, title = futures[future]
+                try:
+                    downloaded, digest, size = future.result()
+                    record_hash(conn, url, digest, size)
+                    record_download(conn, url, save_path, STATUS_DONE, size=size)
+                    action = "下载完成" if downloaded else "文件已存在且完整，跳过"
+                    print(f"({i}/{len(planned)}) {action}: {os.path.basename(save_path)} ({size / 1024:.0f} KB)")
+                except (requests.exceptions.RequestException, IOError) as e:
+                    failed += 1
+                    record_download(conn, url, save_path, STATUS_FAILED, error=str(e))
+                    print(f"({i}/{len(planned)}) 下载失败: {title}, 错误: {e}")
+                except Exception as e:
+                    failed += 1
+                    record_download(conn, url, save_path, STATUS_FAILED, error=str(e))
+                    print(f"({i}/{len(planned)}) 发生未知错误: {title}, 错误: {e}")
+
+        print(f"所有下载任务完成。成功 {len(planned) - failed} 个，失败 {failed} 个（重新运行即可从断点继续）。")
+    finally:
+        conn.close()
+
+def verify_store(store_dir, db_path="qyyjt_data.db"):
+    """[新增] 校验内容仓库，并清除损坏文件对应的哈希与下载记录，使其在下次运行时重新下载。"""
+    print(f"正在校验内容仓库: {store_dir}")
+    corrupted = ContentStore(store_dir).verify()
+    conn = open_state_db(db_path)
+    try:
+        for digest in corrupted:
+            urls = [row[0] for row in conn.execute('SELECT file_url FROM file_hashes WHERE sha256 = ?', (digest,))]
+            conn.executemany('DELETE FROM downloads WHERE file_url = ?', [(url,) for url in urls])
+            conn.execute('DELETE FROM file_hashes WHERE sha256 = ?', (digest,))
+        conn.commit()
+    finally:
+        conn.close()
+    print(f"校验完成，发现 {len(corrupted)} 个损坏的文件。")
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="根据JSON任务文件下载文件，并生成结构化文件名。")
-    parser.add_argument("task_file", type=str, help="包含下载任务的JSON文件路径, 例如 'download_tasks.json'。")
+    parser.add_argument("task_file", type=str, nargs="?", help="包含下载任务的JSON文件路径, 例如 'download_tasks.json'。")
     parser.add_argument("--save_dir", type=str, default="output/downloaded_reports", help="保存下载文件的目录。")
+    parser.add_argument("--db", type=str, default="qyyjt_data.db", help="记录下载状态的SQLite数据库文件路径。")
+    parser.add_argument("--workers", type=int, default=8, help="同时下载的线程数。")
+    parser.add_argument("--per-host", type=int, default=4, help="对同一主机同时进行的最大下载数。")
+    parser.add_argument("--store_dir", type=str, default="output/store", help="按内容哈希保存文件的仓库目录。")
+    parser.add_argument("--link-mode", choices=["hardlink", "symlink"], default="hardlink",
+                        help="可读目录中指向仓库文件的链接方式（硬链接失败时自动退回符号链接）。")
+    parser.add_argument("--verify-store", action="store_true",
+                        help="重新校验仓库中所有文件的 sha256，删除损坏的文件及其链接记录，之后重新运行即可重新下载。")
 
     args = parser.parse_args()
 
-    download_from_task_file(args.task_file, args.save_dir)
+    if args.verify_store:
+        verify_store(args.store_dir, args.db)
+    elif not args.task_file:
+        parser.error("请指定下载任务文件。")
+    else:
+        download_from_task_file(args.task_file, args.save_dir, db_path=args.db, workers=args.workers,
+                                per_host=args.per_host, store_dir=args.store_dir, link_mode=args.link_mode)
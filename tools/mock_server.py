@@ -0,0 +1,216 @@
+# 文件名: mock_server.py
+
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# 与 src/config.py 中两个接口地址的路径保持一致，把 SEARCH_API_URL / NOTICE_API_URL 的主机换成本服务即可
+SEARCH_PATH = "/finchinaAPP/v1/finchina-search/v1/multipleSearch"
+NOTICE_PATH = "/finchinaAPP/v1/finchina-search/v1/webNotice/getF9NoticeList"
+
+class MockQyyjtServer:
+    """
+    本地模拟的企业预警通接口，实现搜索 (multipleSearch) 与公告列表 (getF9NoticeList) 两个接口，用于离线测试与性能基准。
+    每个搜索词都会解析为一只确定的债券，每只债券的公告数量由搜索词的哈希决定（在 notices_min 与 notices_max 之间），
+    因此同样的参数每次运行得到的数据完全相同。
+
+    :param port: 监听端口，0 表示由系统分配
+    :param latency: 每个请求的基础延迟（秒）
+    :param jitter: 在基础延迟上随机增加的最大延迟（秒）
+    :param notices_min: 每只债券的最少公告数（决定分页深度）
+    :param notices_max: 每只债券的最多公告数
+    :param page_cap: 每页最多返回的条数，模拟服务器对 size 的上限（None 表示不限制）
+    :param rate_limit_every: 每 N 个请求返回一次 206 "请求过多"（0 表示不注入）
+    :param token_ttl: 每个 Token 可用的请求数，用完后返回 104 "token过时"（0 表示不注入）
+    :param missing_every: 约每 N 个搜索词中有一个搜索无结果（0 表示全部能找到）
+    :param token_header: 携带 Token 的请求头名称
+    :param seed: 延迟抖动所用随机数的种子
+    """
+    def __init__(self, port=8765, latency=0.0, jitter=0.0, notices_min=25, notices_max=25, page_cap=None,
+                 rate_limit_every=0, token_ttl=0, missing_every=0, token_header="pcuss", seed=0):
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.notices_min = notices_min
+        self.notices_max = max(notices_min, notices_max)
+        self.page_cap = page_cap
+        self.rate_limit_every = rate_limit_every
+        self.token_ttl = token_ttl
+        self.missing_every = missing_every
+        self.token_header = token_header
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._token_uses = {}
+        self._server = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        """清零请求计数（不影响各 Token 已用的次数）。"""
+        with self._lock:
+            # search / notice 为收到的请求数（含注入的错误），pages / items 为成功返回的公告页数与条数
+            self.stats = {'search': 0, 'notice': 0, 'rate_limited': 0, 'token_expired': 0, 'pages': 0, 'items': 0}
+            self._request_count = 0
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def search_url(self):
+        return self.base_url + SEARCH_PATH
+
+    @property
+    def notice_url(self):
+        return self.base_url + NOTICE_PATH
+
+    def start(self):
+        """在后台线程中启动服务，返回自身以便链式调用。"""
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # 响应头与响应体合并发送，避免长连接上的 Nagle / 延迟确认给每个请求额外增加约 40 毫秒
+            wbufsize = -1
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, payload):
+                body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json;charset=UTF-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path != SEARCH_PATH:
+                    return self.send_error(404)
+                text = parse_qs(url.query).get('text', [''])[0]
+                self._send(server.handle_search(text, self.headers.get(server.token_header)))
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                form = parse_qs(self.rfile.read(length).decode('utf-8'))
+                if urlparse(self.path).path != NOTICE_PATH:
+                    return self.send_error(404)
+                self._send(server.handle_notices(
+                    form.get('code', [''])[0],
+                    int(form.get('skip', ['0'])[0]),
+                    int(form.get('size', ['10'])[0]),
+                    self.headers.get(server.token_header)
+                ))
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name="mock-qyyjt", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def notice_count(self, bond_code):
+        """每只债券的公告总数，由 code 的哈希确定。"""
+        span = self.notices_max - self.notices_min + 1
+        return self.notices_min + zlib.crc32(bond_code.encode('utf-8')) % span
+
+    def _check_request(self, kind, token):
+        """
+        计数并按配置注入错误。
+        :return: 需要返回的错误响应；正常处理时返回 None
+        """
+        with self._lock:
+            self.stats[kind] += 1
+            self._request_count += 1
+            count = self._request_count
+            uses = self._token_uses[token] = self._token_uses.get(token, 0) + 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        if self.token_ttl and uses > self.token_ttl:
+            with self._lock:
+                self.stats['token_expired'] += 1
+            return {'returncode': 104, 'info': 'token过时，请重新登录'}
+        if self.rate_limit_every and count % self.rate_limit_every == 0:
+            with self._lock:
+                self.stats['rate_limited'] += 1
+            return {'returncode': 206, 'info': '请求过多，请稍后再试'}
+        return None
+
+    def handle_search(self, text, token):
+        error = self._check_request('search', token)
+        if error:
+            return error
+        digest = zlib.crc32(text.encode('utf-8'))
+        if self.missing_every and digest % self.missing_every == 0:
+            return {'returncode': 0, 'data': {'list': []}}
+        return {'returncode': 0, 'data': {'list': [{'code': f'{digest:010d}.IB', 'name': f'{text}(模拟)'}]}}
+
+    def handle_notices(self, bond_code, skip, size, token):
+        error = self._check_request('notice', token)
+        if error:
+            return error
+        if self.page_cap:
+            size = min(size, self.page_cap)
+        total = self.notice_count(bond_code)
+        items = []
+        # 公告按发布时间从新到旧排列，序号越大越新
+        for index in range(skip, min(skip + size, total)):
+            number = total - 1 - index
+            day = time.gmtime(1577836800 + number * 86400)
+            items.append({
+                'title': f'{bond_code} 第{number}号公告',
+                'date': time.strftime('%Y%m%d', day),
+                'file': [{'fileUrl': f'{self.base_url}/files/{bond_code}/{number}.pdf', 'fileSize': '1.2MB'}]
+            })
+        with self._lock:
+            self.stats['pages'] += 1
+            self.stats['items'] += len(items)
+        return {'returncode': 0, 'data': items}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="启动本地模拟的企业预警通搜索与公告接口，用于离线测试与性能基准。")
+    parser.add_argument("--port", type=int, default=8765, help="监听端口。")
+    parser.add_argument("--latency", type=float, default=0.05, help="每个请求的基础延迟（秒）。")
+    parser.add_argument("--jitter", type=float, default=0.0, help="在基础延迟上随机增加的最大延迟（秒）。")
+    parser.add_argument("--notices", type=str, default="25",
+                        help="每只债券的公告数，可以是固定值或范围，例如 100 或 20-300。")
+    parser.add_argument("--page-cap", type=int, help="每页最多返回的条数（模拟服务器对分页大小的限制）。")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="每 N 个请求返回一次 206 限流（0 表示不注入）。")
+    parser.add_argument("--token-ttl", type=int, default=0, help="每个 Token 可用的请求数，之后返回 104（0 表示不注入）。")
+    parser.add_argument("--missing-every", type=int, default=0, help="约每 N 个搜索词中有一个搜索无结果。")
+
+    args = parser.parse_args()
+
+    low, _, high = args.notices.partition('-')
+    mock = MockQyyjtServer(
+        port=args.port, latency=args.latency, jitter=args.jitter,
+        notices_min=int(low), notices_max=int(high or low), page_cap=args.page_cap,
+        rate_limit_every=args.rate_limit_every, token_ttl=args.token_ttl, missing_every=args.missing_every
+    ).start()
+    print(f"模拟接口已启动: {mock.base_url}")
+    print(f"  SEARCH_API_URL = \"{mock.search_url}\"")
+    print(f"  NOTICE_API_URL = \"{mock.notice_url}\"")
+    print("按 Ctrl+C 停止。")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        mock.stop()
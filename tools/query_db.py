@@ -3,10 +3,118 @@
 import sqlite3
 import argparse
 import json
+import os
+import re
 
-def search_database(db_path, table_name, keyword, output_file):
+# 查询语法: 空格分隔的词默认为 AND；支持 OR / NOT、"带引号的短语"、括号，以及 -词 表示排除
+_TOKEN_PATTERN = re.compile(r'"([^"]*)"|([()])|([^\s()"]+)')
+_OPERATORS = ('AND', 'OR', 'NOT')
+# trigram 全文索引只能匹配至少 3 个字符的词，更短的词需要退回 LIKE 查询
+_MIN_FTS_TERM_LENGTH = 3
+
+def parse_query(query):
+    """
+    把查询字符串拆分为 (类型, 值) 列表，类型为 term / op / paren，并在相邻的词之间补上隐含的 AND。
+    例如 '年度报告 -摘要' -> [('term', '年度报告'), ('op', 'NOT'), ('term', '摘要')]
+    """
+    raw_tokens = []
+    for match in _TOKEN_PATTERN.finditer(query):
+        phrase, paren, word = match.groups()
+        if paren:
+            raw_tokens.append(('paren', paren))
+        elif word is None:
+            if phrase.strip():
+                raw_tokens.append(('term', phrase))
+        elif word.upper() in _OPERATORS:
+            raw_tokens.append(('op', word.upper()))
+        elif word == '-':
+            raw_tokens.append(('op', 'NOT'))
+        elif word.startswith('-'):
+            raw_tokens.extend([('op', 'NOT'), ('term', word[1:])])
+        else:
+            raw_tokens.append(('term', word))
+
+    tokens = []
+    for token in raw_tokens:
+        starts_operand = token[0] == 'term' or token == ('paren', '(')
+        follows_operand = bool(tokens) and (tokens[-1][0] == 'term' or tokens[-1] == ('paren', ')'))
+        if starts_operand and follows_operand:
+            tokens.append(('op', 'AND'))
+        tokens.append(token)
+    return tokens
+
+def build_fts_match(tokens):
+    """把查询转换为 FTS5 的 MATCH 表达式，每个词都作为带引号的字符串，避免被解释为 FTS5 语法。"""
+    parts = []
+    for kind, value in tokens:
+        if kind == 'term':
+            parts.append('"' + value.replace('"', '""') + '"')
+        else:
+            parts.append(value)
+    return ' '.join(parts)
+
+def build_like_condition(tokens, column):
+    """把查询转换为等价的 LIKE 条件（FTS5 中二元的 "a NOT b" 对应 SQL 的 "a AND NOT b"）。"""
+    parts, params = [], []
+    for kind, value in tokens:
+        if kind == 'term':
+            escaped = value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            parts.append(f"{column} LIKE ? ESCAPE '\\'")
+            params.append(f'%{escaped}%')
+        elif value == 'NOT':
+            parts.append('AND NOT')
+        else:
+            parts.append(value)
+    return '(' + ' '.join(parts) + ')', params
+
+def split_for_fts(tokens):
+    """
+    对只由 AND / NOT 连接的查询（没有 OR 和括号），把不少于 3 个字符的肯定词交给全文索引缩小范围，
+    其余的短词与排除词再用 LIKE 在这个小范围内过滤。
+    :return: (交给全文索引的 token 列表, 其余的 [(是否排除, 词)])；查询含 OR 或括号、或没有可用的长词时返回 (None, None)
+    """
+    if any(kind == 'paren' or value == 'OR' for kind, value in tokens):
+        return None, None
+    indexed, rest = [], []
+    negated = False
+    for kind, value in tokens:
+        if kind == 'op':
+            negated = value == 'NOT'
+            continue
+        if not negated and len(value) >= _MIN_FTS_TERM_LENGTH:
+            if indexed:
+                indexed.append(('op', 'AND'))
+            indexed.append(('term', value))
+        else:
+            rest.append((negated, value))
+    return (indexed, rest) if indexed else (None, None)
+
+def build_filters(date_column, bond_condition, start_date, end_date, bond):
+    """
+    构造发布日期范围与债券过滤条件。日期按 ISO 格式比较，结束日期当天的公告也包含在内。
+    :param bond_condition: 依次匹配债券代码、债券名称、搜索简称的条件模板，含 3 个占位符
+    """
+    conditions, params = [], []
+    if start_date:
+        conditions.append(f"{date_column} >= ?")
+        params.append(start_date)
+    if end_date:
+        conditions.append(f"{date_column} < date(?, '+1 day')")
+        params.append(end_date)
+    if bond:
+        conditions.append(bond_condition)
+        params.extend([bond, f'%{bond}%', f'%{bond}%'])
+    return conditions, params
+
+def has_table(cursor, name):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,))
+    return cursor.fetchone() is not None
+
+def search_database(db_path, table_name, keyword, output_file, start_date=None, end_date=None, bond=None, limit=None):
     """
     在SQLite数据库中搜索公告，并将匹配的记录（URL、标题、日期）写入一个JSON文件。
+    [修改] 支持 AND / OR / NOT / 短语查询，以及发布日期范围与债券过滤。
+    数据库建有标题全文索引 (notices_fts) 且所有关键词都不少于 3 个字符时走全文索引，否则退回 LIKE 全表扫描。
     """
     conn = None
     tasks_to_export = []
@@ -14,13 +122,59 @@ def search_database(db_path, table_name, keyword, output_file):
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
 
-        # 我们需要 title 和 publish_date 来构建文件名，所以一并查询出来
-        query = f"SELECT announcement_title, file_url, publish_date FROM {table_name} WHERE announcement_title LIKE ?"
-        
-        print(f"数据库: {db_path}, 数据表: {table_name}")
-        print(f"正在查询标题包含 '{keyword}' 的公告...")
+        tokens = parse_query(keyword)
+        terms = [value for kind, value in tokens if kind == 'term']
+        if not terms:
+            print("查询中没有任何关键词。")
+            return
+
+        use_fts = False
+        if has_table(cursor, 'notices_fts'):
+            if all(len(t) >= _MIN_FTS_TERM_LENGTH for t in terms):
+                fts_tokens, like_terms = tokens, []
+            else:
+                fts_tokens, like_terms = split_for_fts(tokens)
+            use_fts = fts_tokens is not None
+        if use_fts:
+            # 全文索引挂在规范化后的 notices 表上，按需关联债券与文件
+            bond_condition = (
+                "(b.bond_code = ? OR b.bond_name LIKE ? OR EXISTS "
+                "(SELECT 1 FROM search_terms st WHERE st.bond_id = b.id AND st.search_term LIKE ?))"
+            )
+            conditions, params = build_filters('n.publish_date', bond_condition, start_date, end_date, bond)
+            for negated, term in reversed(like_terms):
+                like_condition, like_params = build_like_condition([('term', term)], 'n.title')
+                conditions.insert(0, ('NOT ' if negated else '') + like_condition)
+                params = like_params + params
+            query = f'''
+                SELECT n.title, f.file_url, NULLIF(n.publish_date, '')
+                FROM notices_fts
+                JOIN notices n ON n.id = notices_fts.rowid
+                JOIN bonds b ON b.id = n.bond_id
+                JOIN files f ON f.notice_id = n.id
+                WHERE {' AND '.join(['notices_fts MATCH ?'] + conditions)}
+                ORDER BY n.publish_date DESC
+            '''
+            params = [build_fts_match(fts_tokens)] + params
+        else:
+            # 旧版单表数据库，或关键词太短无法使用 trigram 索引
+            like_condition, params = build_like_condition(tokens, 'announcement_title')
+            conditions, filter_params = build_filters(
+                'publish_date', "(bond_code = ? OR bond_name LIKE ? OR search_term LIKE ?)", start_date, end_date, bond
+            )
+            query = f'''
+                SELECT announcement_title, file_url, publish_date FROM {table_name}
+                WHERE {' AND '.join([like_condition] + conditions)}
+                ORDER BY publish_date DESC
+            '''
+            params += filter_params
+        if limit:
+            query += f' LIMIT {int(limit)}'
+
+        print(f"数据库: {db_path}, 查询方式: {'全文索引' if use_fts else f'LIKE 扫描 ({table_name})'}")
+        print(f"正在查询标题匹配 '{keyword}' 的公告...")
 
-        cursor.execute(query, (f'%{keyword}%',))
+        cursor.execute(query, params)
         results = cursor.fetchall()
 
         if not results:
@@ -37,15 +191,20 @@ def search_database(db_path, table_name, keyword, output_file):
                 "publish_date": pub_date
             }
             tasks_to_export.append(task_item)
-            print(f"  - 待导出: {title}")
-        
+            print(f"  - 待导出: [{pub_date}] {title}")
+
+        output_dir = os.path.dirname(output_file)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
         # 将包含所有任务的列表写入JSON文件
         with open(output_file, 'w', encoding='utf-8') as f:
             # indent=4 让JSON文件格式更美观，易于阅读
             json.dump(tasks_to_export, f, ensure_ascii=False, indent=4)
-        
+
         print(f"\n成功将 {len(tasks_to_export)} 个下载任务导出到文件: {output_file}")
 
+    except sqlite3.OperationalError as e:
+        print(f"查询失败（请检查查询语法，例如 NOT 不能出现在开头、括号是否配对）: {e}")
     except sqlite3.Error as e:
         print(f"数据库操作失败: {e}")
     finally:
@@ -54,12 +213,18 @@ def search_database(db_path, table_name, keyword, output_file):
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="从SQLite数据库查询公告信息并导出为JSON任务文件。")
-    parser.add_argument("keyword", type=str, help="要搜索的公告标题关键字, 例如 '年度报告'。")
+    parser.add_argument("keyword", type=str,
+                        help="标题查询，例如 '年度报告'、'年度报告 -摘要'、'审计报告 OR 评级报告'、'\"2023年年度报告\"'。")
     parser.add_argument("--db", type=str, default="qyyjt_data.db", help="SQLite数据库文件路径。")
-    parser.add_argument("--table", type=str, default="announcements", help="数据表名称。")
+    parser.add_argument("--table", type=str, default="announcements", help="不使用全文索引时查询的数据表（或视图）名称。")
+    parser.add_argument("--start-date", type=str, help="只查询该日期（含）之后发布的公告，格式 YYYY-MM-DD。")
+    parser.add_argument("--end-date", type=str, help="只查询该日期（含）之前发布的公告，格式 YYYY-MM-DD。")
+    parser.add_argument("--bond", type=str, help="只查询指定债券：债券代码，或债券名称/简称中包含的文字。")
+    parser.add_argument("--limit", type=int, help="最多导出的记录数。")
     # 输出文件名默认为 .json 后缀
     parser.add_argument("--output", type=str, default="output/download_tasks.json", help="输出JSON任务文件的文件名。")
-    
+
     args = parser.parse_args()
 
-    search_database(args.db, args.table, args.keyword, args.output)
+    search_database(args.db, args.table, args.keyword, args.output,
+                    start_date=args.start_date, end_date=args.end_date, bond=args.bond, limit=args.limit)